@@ -29,8 +29,16 @@ sys.path.append(ROOT_DIR)
 # 导入工具模块
 from utils.logging_utils import setup_logger
 from utils.file_utils import ensure_dir_exists
-from utils.config_utils import load_config, get_domain_extract_config, get_paths_config, get_httpx_config, get_filter_config
-from utils.httpx_utils import build_httpx_command, run_httpx
+from utils.config_utils import load_config, get_domain_extract_config, get_paths_config, get_httpx_config, get_filter_config, get_scope_config, get_history_config, get_dns_config, get_priority_config, get_probe_config
+from utils.httpx_utils import (build_httpx_command, run_httpx, run_httpx_sharded, run_httpx_streaming,
+                               compute_remaining_hosts, trim_incomplete_line, append_file, run_httpx_pipe,
+                               with_probe_output, input_fingerprint, read_checkpoint, write_checkpoint)
+from utils.history_utils import HostHistory
+from utils.rate_utils import run_httpx_adaptive
+from utils.probe_engine import run_probe
+from utils.dns_utils import resolve_hosts_file
+from utils.priority_utils import build_scorer, prioritize_hosts_file
+from utils.port_utils import PortExpander, parse_ports, expand_hosts_file
 
 def load_script(script_name):
     """
@@ -84,6 +92,252 @@ def parse_args():
     
     return parser.parse_args()
 
+def run_httpx_stream_filter(config, stream_runner):
+    """
+    流式运行httpx：逐行解析httpx的输出并立即筛选，命中的结果追加到筛选结果文件中
+    
+    参数:
+        config: 配置对象
+        stream_runner: 以单行处理函数为参数运行httpx的函数，返回(exitcode, stdout, stderr)
+    
+    返回:
+        (exitcode, stdout, stderr)
+    """
+    process_script = load_script("2_httpx_process")
+    filter_script = load_script("3_filter_targets")
+    if not process_script or not filter_script:
+        print("警告: 无法加载结果处理或筛选脚本，探活过程中不进行筛选")
+        return stream_runner(lambda line: None)
+    
+    filter_config = get_filter_config(config)
+    filtered_file = os.path.join(ROOT_DIR, filter_config.get("output_file", "result/filtered_results.csv"))
+    streaming_filter = filter_script.StreamingFilter(filtered_file, filter_config)
+    
+    def handle_line(line):
+        record = process_script.parse_result_line(line)
+        if record is not None and streaming_filter.add(record):
+            print(f"[命中] {record[0]}")
+    
+    try:
+        result = stream_runner(handle_line)
+    finally:
+        streaming_filter.close()
+    
+    print(f"流式筛选: 已处理 {streaming_filter.total_count} 条结果，命中 {streaming_filter.match_count} 条")
+    return result
+
+def dispatch_httpx(config, httpx_config, input_file, output_file, no_process=False):
+    """
+    按配置选择内置引擎，或以自适应速率、流式、分片、普通模式运行httpx
+    
+    返回:
+        (exitcode, stdout, stderr)
+    """
+    shards = httpx_config.get("shards") or 1
+    if httpx_config.get("engine", "").lower() == "builtin":
+        if shards > 1 or httpx_config.get("adaptive_rate"):
+            print("提示: 内置引擎不使用分片和自适应速率，并发数和速率取自threads和additional_args中的-rl")
+        
+        psl_file = get_domain_extract_config(config).get("psl_file")
+        
+        def run_builtin(line_handler=None):
+            return run_probe(httpx_config, input_file, output_file, line_handler=line_handler,
+                             no_process=no_process,
+                             psl_file=os.path.join(ROOT_DIR, psl_file) if psl_file else None)
+        
+        print("正在使用内置引擎进行探活...")
+        if httpx_config.get("streaming"):
+            return run_httpx_stream_filter(config, run_builtin)
+        return run_builtin()
+    
+    if httpx_config.get("adaptive_rate"):
+        if shards > 1:
+            print("提示: 自适应速率模式下不使用分片，由控制器统一调整速率")
+        
+        def run_adaptive(line_handler=None):
+            return run_httpx_adaptive(httpx_config, input_file, output_file, ROOT_DIR,
+                                      os.path.dirname(output_file), line_handler=line_handler,
+                                      no_process=no_process)
+        
+        print("正在以自适应速率分批运行httpx...")
+        if httpx_config.get("streaming"):
+            return run_httpx_stream_filter(config, run_adaptive)
+        return run_adaptive()
+    
+    # 构建httpx命令
+    cmd = build_httpx_command(httpx_config, input_file, output_file, ROOT_DIR)
+    
+    if httpx_config.get("streaming") and shards > 1:
+        print("提示: 分片模式下不支持流式处理，将在所有分片完成后处理结果")
+    
+    if httpx_config.get("streaming") and shards <= 1:
+        print("正在以流式模式运行httpx，命中筛选条件的结果会立即写入筛选结果文件...")
+        return run_httpx_stream_filter(
+            config, lambda line_handler: run_httpx_streaming(cmd, line_handler, no_process=no_process))
+    elif shards > 1:
+        print(f"正在以 {shards} 个分片并行运行httpx...")
+        return run_httpx_sharded(httpx_config, input_file, output_file, ROOT_DIR, shards, no_process=no_process)
+    elif no_process:
+        print("直接调用httpx程序而不捕获输出...")
+        # 执行httpx命令，不捕获输出
+        return run_httpx(cmd, no_process=True)
+    else:
+        print("正在运行httpx，输出显示在控制台...")
+        # 执行httpx命令，捕获输出
+        return run_httpx(cmd)
+
+def finish_checkpoint(checkpoint_file, fingerprint, input_file, output_file, temp_dir, process_script):
+    """
+    探活结束后检查是否每个输入主机都有结果（-probe时失败的主机也有记录），都有时将检查点标记为完成
+    
+    httpx被中断或崩溃时返回码不可靠（结果文件存在时视为成功），因此按结果是否完整判断。
+    """
+    if not process_script:
+        return
+    trim_incomplete_line(output_file)
+    remaining_file = os.path.join(temp_dir, "resume_remaining.txt")
+    _, remaining_count = compute_remaining_hosts(
+        input_file, output_file, remaining_file, temp_dir, process_script.parse_result_host)
+    os.remove(remaining_file)
+    if remaining_count == 0:
+        write_checkpoint(checkpoint_file, fingerprint, True)
+    else:
+        print(f"断点续探: 还有 {remaining_count} 个主机没有结果，下次运行时继续探测")
+
+def execute_httpx(config, httpx_config, input_file, output_file, temp_dir, no_process=False):
+    """
+    运行httpx探活，启用断点续探时，如果上次对同一输入的探活被中断，只探测尚未完成的主机并将结果追加到原结果文件
+    
+    断点续探时使用-json -probe输出，无响应的主机也会留下一条failed记录；开始探活时在结果文件旁写入检查点，
+    正常完成后标记为完成。只有检查点属于同一份输入且未完成时才续探，否则清空旧结果重新探测。
+    
+    参数:
+        config: 配置对象
+        httpx_config: httpx配置字典
+        input_file: 输入主机列表文件
+        output_file: httpx结果文件
+        temp_dir: 临时目录
+        no_process: 是否隐藏httpx的输出
+    
+    返回:
+        (exitcode, stdout, stderr)
+    """
+    if not httpx_config.get("resume"):
+        return dispatch_httpx(config, httpx_config, input_file, output_file, no_process)
+    
+    httpx_config = with_probe_output(httpx_config)
+    checkpoint_file = output_file + ".checkpoint"
+    fingerprint = input_fingerprint(input_file)
+    checkpoint = read_checkpoint(checkpoint_file)
+    
+    process_script = load_script("2_httpx_process")
+    interrupted = (checkpoint is not None and not checkpoint.get("complete") and
+                   checkpoint.get("input") == fingerprint and
+                   os.path.exists(output_file) and os.path.getsize(output_file) > 0)
+    if interrupted and not process_script:
+        print("警告: 无法加载结果处理脚本，不能断点续探，将重新探测所有主机")
+        interrupted = False
+    
+    if not interrupted:
+        if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+            print("断点续探: 没有对同一输入未完成的探活，清空上次的结果重新探测")
+            open(output_file, 'w').close()
+        write_checkpoint(checkpoint_file, fingerprint, False)
+        result = dispatch_httpx(config, httpx_config, input_file, output_file, no_process)
+        finish_checkpoint(checkpoint_file, fingerprint, input_file, output_file, temp_dir, process_script)
+        return result
+    
+    # 中断时最后一行可能只写出了一半，先删除
+    trim_incomplete_line(output_file)
+    remaining_file = os.path.join(temp_dir, "resume_remaining.txt")
+    done_count, remaining_count = compute_remaining_hosts(
+        input_file, output_file, remaining_file, temp_dir, process_script.parse_result_host)
+    print(f"断点续探: 已有 {done_count} 个主机的结果，剩余 {remaining_count} 个主机待探测")
+    if remaining_count == 0:
+        write_checkpoint(checkpoint_file, fingerprint, True)
+        return 0, "", ""
+    
+    # 剩余主机的结果先写入单独的文件，httpx结束（包括被中断）后追加到原结果文件
+    part_file = os.path.join(temp_dir, "resume_part_" + os.path.basename(output_file))
+    if os.path.exists(part_file):
+        os.remove(part_file)
+    try:
+        result = dispatch_httpx(config, httpx_config, remaining_file, part_file, no_process)
+    finally:
+        if os.path.exists(part_file):
+            trim_incomplete_line(part_file)
+            append_file(part_file, output_file)
+            os.remove(part_file)
+    finish_checkpoint(checkpoint_file, fingerprint, input_file, output_file, temp_dir, process_script)
+    return result
+
+def build_port_expander(config, httpx_config, domain_extract_config):
+    """
+    根据[probe]中的端口列表创建PortExpander，未配置端口时返回None
+    """
+    ports = parse_ports(get_probe_config(config).get("ports"))
+    if not ports:
+        return None
+    if any(arg.strip().split(None, 1)[0] in ("-p", "-ports")
+           for arg in httpx_config.get("additional_args", "").split(",") if arg.strip()):
+        print("提示: additional_args中的-p参数会让httpx对展开后的每个主机再探测这些端口，建议只使用[probe] ports")
+    return PortExpander(ports, domain_extract_config.get("strip_443"), domain_extract_config.get("canonicalize"))
+
+def pipeline_conflicts(config, httpx_config, domain_extract_config):
+    """
+    返回已启用的、需要完整主机列表而不能与流水线模式同时使用的功能
+    """
+    conflicts = []
+    if httpx_config.get("engine", "").lower() == "builtin":
+        conflicts.append("engine = builtin")
+    if (httpx_config.get("shards") or 1) > 1:
+        conflicts.append("shards")
+    for key in ("adaptive_rate", "resume"):
+        if httpx_config.get(key):
+            conflicts.append(key)
+    if domain_extract_config.get("incremental"):
+        conflicts.append("incremental")
+    if domain_extract_config.get("order") == "interleave":
+        conflicts.append("order = interleave")
+    for section, get_section_config in (("dns", get_dns_config), ("history", get_history_config),
+                                        ("priority", get_priority_config)):
+        if get_section_config(config).get("enabled"):
+            conflicts.append(f"[{section}]")
+    return conflicts
+
+def run_httpx_pipeline(config, httpx_config, extract_script, domain_extract_config, paths_config,
+                       domains_file, output_file, no_process=False):
+    """
+    流水线模式：提取出的主机去重后立即通过标准输入交给httpx，提取和探活同时进行
+    
+    参数:
+        extract_script: 提取子域名脚本模块
+        domains_file: 同时写入的主机列表文件，pipeline_save_domains为false时不写入
+        output_file: httpx的输出文件
+    
+    返回:
+        (exitcode, stdout, stderr)
+    """
+    hosts = extract_script.stream_domains(
+        dir_path=paths_config.get("domain_dir"),
+        output_file=domains_file if httpx_config.get("pipeline_save_domains") else None,
+        strip_443=domain_extract_config.get("strip_443"),
+        workers=domain_extract_config.get("workers"),
+        chunk_size_mb=domain_extract_config.get("chunk_size_mb"),
+        scope_config=get_scope_config(config),
+        canonicalize=domain_extract_config.get("canonicalize")
+    )
+    port_expander = build_port_expander(config, httpx_config, domain_extract_config)
+    if port_expander:
+        hosts = port_expander.expand(hosts)
+    cmd = build_httpx_command(httpx_config, None, output_file, ROOT_DIR)
+    
+    if httpx_config.get("streaming"):
+        print("正在以流式模式运行httpx，命中筛选条件的结果会立即写入筛选结果文件...")
+        return run_httpx_stream_filter(
+            config, lambda line_handler: run_httpx_pipe(cmd, hosts, line_handler, no_process=no_process))
+    return run_httpx_pipe(cmd, hosts, no_process=no_process)
+
 def run_workflow(config_path, skip_httpx=False, output_file=None, no_process=False):
     """
     运行完整工作流程
@@ -112,6 +366,16 @@ def run_workflow(config_path, skip_httpx=False, output_file=None, no_process=Fal
     if output_file is None:
         output_file = default_output_file
     
+    # 流水线模式：提取和探活同时进行，httpx可执行文件不存在时仍先提取，再报告错误
+    pipeline = False
+    pipeline_httpx_config = get_httpx_config(config)
+    if not skip_httpx and pipeline_httpx_config.get("pipeline"):
+        conflicts = pipeline_conflicts(config, pipeline_httpx_config, domain_extract_config)
+        if conflicts:
+            print(f"提示: 流水线模式不能与 {', '.join(conflicts)} 同时使用，将先提取再探活")
+        elif os.path.exists(pipeline_httpx_config.get("httpx_path")):
+            pipeline = True
+    
     # 步骤1: 提取子域名
     extract_script = load_script("1_extract_subdomains")
     if extract_script:
@@ -123,15 +387,33 @@ def run_workflow(config_path, skip_httpx=False, output_file=None, no_process=Fal
             os.makedirs(os.path.dirname(os.path.join(ROOT_DIR, output_file)), exist_ok=True)
         
         domains_file = os.path.join(ROOT_DIR, output_file)
-        extract_script.main(
-            dir_path=default_domain_dir,
-            output_file=domains_file,
-            strip_443=default_strip_443
-        )
+        if pipeline:
+            print("流水线模式: 提取出的主机将在探活步骤中直接交给httpx")
+        else:
+            extract_script.main(
+                dir_path=default_domain_dir,
+                output_file=domains_file,
+                strip_443=default_strip_443,
+                workers=domain_extract_config.get("workers"),
+                chunk_size_mb=domain_extract_config.get("chunk_size_mb"),
+                temp_dir=paths_config.get("temp_dir"),
+                max_memory_mb=domain_extract_config.get("max_memory_mb"),
+                incremental=domain_extract_config.get("incremental"),
+                scope_config=get_scope_config(config),
+                canonicalize=domain_extract_config.get("canonicalize"),
+                order=domain_extract_config.get("order"),
+                psl_file=domain_extract_config.get("psl_file")
+            )
     else:
         print("错误: 无法加载提取子域名脚本")
         return
     
+    # 探活历史：只探测新增或已过期的主机
+    history_config = get_history_config(config)
+    history_file = None
+    probed_file = None
+    reused_file = None
+    
     # 步骤2: 使用httpx进行子域名探活
     if skip_httpx:
         print("\n[2/3] 跳过子域名探活步骤...")
@@ -142,11 +424,11 @@ def run_workflow(config_path, skip_httpx=False, output_file=None, no_process=Fal
         # 获取httpx配置
         httpx_config = get_httpx_config(config)
         
-        # 验证httpx路径是否有效
+        # 验证httpx路径是否有效，内置引擎不需要httpx程序
         httpx_path = httpx_config.get("httpx_path")
-        if not os.path.exists(httpx_path):
+        if httpx_config.get("engine", "").lower() != "builtin" and not os.path.exists(httpx_path):
             print(f"\n错误: httpx可执行文件不存在: {httpx_path}")
-            print("请在config.ini中设置正确的httpx_path")
+            print("请在config.ini中设置正确的httpx_path，或设置engine = builtin使用内置探活引擎")
             skip_httpx = True
         else:
             # 使用域名提取过程中生成的文件作为httpx输入
@@ -158,34 +440,92 @@ def run_workflow(config_path, skip_httpx=False, output_file=None, no_process=Fal
             # 生成httpx的输出文件路径
             output_file = os.path.join(temp_dir, httpx_config.get("output_file"))
             
-            # 检查输入文件是否存在
-            if not os.path.exists(input_file) or os.path.getsize(input_file) == 0:
+            # 检查输入文件是否存在，流水线模式下不需要输入文件
+            if pipeline:
+                probe_count = None
+            elif not os.path.exists(input_file) or os.path.getsize(input_file) == 0:
                 print(f"\n错误: 输入文件不存在或为空: {input_file}")
                 skip_httpx = True
             else:
+                dns_config = get_dns_config(config)
+                if dns_config.get("enabled"):
+                    resolved_file = os.path.join(temp_dir, "dns_resolved.txt")
+                    records_file = os.path.join(temp_dir, dns_config.get("records_file"))
+                    wildcard_file = None
+                    if dns_config.get("wildcard"):
+                        wildcard_file = os.path.join(temp_dir, dns_config.get("wildcard_file"))
+                    counts = resolve_hosts_file(dns_config, input_file, resolved_file, records_file, wildcard_file)
+                    print(f"DNS预解析: 去掉 {counts['nxdomain']} 个域名不存在、{counts['nodata']} 个无地址记录的主机，"
+                          f"保留 {counts['resolved'] + counts['failed'] - counts['wildcard']} 个"
+                          f"（其中 {counts['failed']} 个无法确定）")
+                    if wildcard_file:
+                        print(f"泛解析检测: 合并了 {counts['wildcard']} 个命中泛解析的主机，记录保存在 {wildcard_file}")
+                    input_file = resolved_file
+                
+                port_expander = build_port_expander(config, httpx_config, domain_extract_config)
+                if port_expander:
+                    expanded_file = os.path.join(temp_dir, "ports_expanded.txt")
+                    host_count, expanded_count = expand_hosts_file(input_file, expanded_file, port_expander)
+                    print(f"多端口探测: {host_count} 个主机按端口展开后共 {expanded_count} 个探测目标")
+                    input_file = expanded_file
+                
+                probe_count = None
+                if history_config.get("enabled"):
+                    history_file = os.path.join(temp_dir, history_config.get("db_file"))
+                    probed_file = os.path.join(temp_dir, "history_probe.txt")
+                    reused_file = os.path.join(temp_dir, "history_reused.txt")
+                    with HostHistory(history_file) as history:
+                        evicted = history.evict(history_config.get("evict_after"))
+                        probe_count, reused_count = history.partition_hosts(
+                            input_file, probed_file, reused_file, history_config.get("reprobe_after"))
+                    print(f"探活历史: 删除 {evicted} 条过期记录，需要探测 {probe_count} 个主机，"
+                          f"复用 {reused_count} 个主机的历史结果")
+                    input_file = probed_file
+                    # 只有httpx明确报告探测失败的主机才记为未存活，需要输出失败记录
+                    httpx_config = with_probe_output(httpx_config)
+                
+                priority_config = get_priority_config(config)
+                if priority_config.get("enabled") and probe_count != 0:
+                    priority_file = os.path.join(temp_dir, "priority_hosts.txt")
+                    scorer = build_scorer(priority_config, get_filter_config(config).get("title_keywords"))
+                    total, scored = prioritize_hosts_file(input_file, priority_file, scorer, temp_dir,
+                                                          domain_extract_config.get("max_memory_mb"))
+                    print(f"探活优先级: {total} 个主机中有 {scored} 个命中关键词或使用非标准端口，优先探测")
+                    input_file = priority_file
+            
+            if not skip_httpx and probe_count == 0:
+                # 所有主机都可以复用历史结果，无需运行httpx
+                print("所有主机都在历史结果有效期内，跳过httpx探活")
+                open(output_file, 'w').close()
+            elif not skip_httpx:
                 # 确保输出目录存在
                 output_dir = os.path.dirname(output_file)
                 if output_dir and not os.path.exists(output_dir):
                     os.makedirs(output_dir, exist_ok=True)
                 
-                # 构建httpx命令
-                cmd = build_httpx_command(httpx_config, input_file, output_file, ROOT_DIR)
-                
                 print(f"\n正在构建探活命令...")
                 print("正在进行探活，这可能需要一些时间...")
                 
-                if no_process:
-                    print("直接调用httpx程序而不捕获输出...")
-                    # 执行httpx命令，不捕获输出
-                    exitcode, stdout, stderr = run_httpx(cmd, no_process=True)
+                if pipeline:
+                    exitcode, stdout, stderr = run_httpx_pipeline(
+                        config, httpx_config, extract_script, domain_extract_config, paths_config,
+                        domains_file, output_file, no_process)
                 else:
-                    print("正在运行httpx，输出显示在控制台...")
-                    # 执行httpx命令，捕获输出
-                    exitcode, stdout, stderr = run_httpx(cmd)
+                    exitcode, stdout, stderr = execute_httpx(config, httpx_config, input_file, output_file,
+                                                             temp_dir, no_process)
                 
                 # 检查输出文件并确定是否成功
-                if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+                if pipeline and exitcode != 0:
+                    # 流水线模式下提取出错时httpx只收到了部分主机，已有的输出不完整
+                    print(f"流水线探活失败: {stderr or f'httpx退出码 {exitcode}'}")
+                    print("将跳过探活结果处理步骤")
+                    skip_httpx = True
+                elif os.path.exists(output_file) and os.path.getsize(output_file) > 0:
                     print(f"httpx探活完成，原始结果保存在 {output_file}")
+                elif exitcode == 0 and history_file:
+                    # 本次没有探测结果，仍需补充复用的历史结果
+                    print(f"httpx命令返回成功，但未生成输出文件或文件为空")
+                    open(output_file, 'w').close()
                 elif exitcode == 0:
                     print(f"httpx命令返回成功，但未生成输出文件或文件为空")
                     print("可能没有可探活的域名或所有探活都失败")
@@ -212,7 +552,9 @@ def run_workflow(config_path, skip_httpx=False, output_file=None, no_process=Fal
             if os.path.exists(result_file):
                 process_script.main(
                     input_file=result_file,
-                    output_file=processed_result_file
+                    output_file=processed_result_file,
+                    history_file=history_file,
+                    reused_file=reused_file
                 )
             else:
                 print(f"警告: 找不到结果文件 {result_file}，跳过处理步骤")
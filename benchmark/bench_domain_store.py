@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+域名存储内存测试
+
+对比Python集合与DomainStore保存同一批主机名时的内存占用和耗时，并校验遍历结果一致。
+
+用法:
+    python benchmark/bench_domain_store.py [主机名数量]
+"""
+
+import os
+import sys
+import time
+import random
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from utils.domain_store import DomainStore
+
+def generate_hosts(count):
+    """
+    生成模拟的子域名，少量根域名下挂大量子域名
+    """
+    random.seed(0)
+    roots = [f"target{i}.example.com.cn" for i in range(50)] + [f"corp{i}.com" for i in range(50)]
+    words = ["www", "api", "admin", "oa", "vpn", "mail", "test", "dev", "static", "cdn", "portal", "sso"]
+    for _ in range(count):
+        label = random.choice(words) + str(random.randint(0, 99999))
+        if random.random() < 0.5:
+            label += "." + random.choice(words)
+        host = label + "." + random.choice(roots)
+        if random.random() < 0.1:
+            host += random.choice([":8080", ":8443"])
+        yield host
+
+def fill(factory, count):
+    """
+    创建容器并加入全部主机名
+    """
+    container = factory()
+    for host in generate_hosts(count):
+        container.add(host)
+    if isinstance(container, DomainStore):
+        container.flush()
+    return container
+
+def measure(factory, count):
+    """
+    返回(容器, 内存占用字节数, 峰值字节数, 耗时秒数)
+
+    tracemalloc会明显拖慢分配，耗时单独在不跟踪内存时测量
+    """
+    start = time.perf_counter()
+    fill(factory, count)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    container = fill(factory, count)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return container, current, peak, elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    domain_set, set_memory, set_peak, set_time = measure(set, count)
+    size = len(domain_set)
+    sorted_hosts = sorted(domain_set)
+    del domain_set
+
+    store, store_memory, store_peak, store_time = measure(DomainStore, count)
+
+    print(f"主机名数量: {count}（去重后 {size}）")
+    print(f"set:         {set_memory / size:6.1f} 字节/条，峰值 {set_peak / 1024 / 1024:7.1f} MB，耗时 {set_time:.2f} 秒")
+    print(f"DomainStore: {store_memory / size:6.1f} 字节/条，峰值 {store_peak / 1024 / 1024:7.1f} MB，耗时 {store_time:.2f} 秒")
+    print(f"内存占比: {store_memory / set_memory:.1%}")
+    print(f"遍历结果一致: {list(store) == sorted_hosts and len(store) == size}")
+
+if __name__ == "__main__":
+    main()
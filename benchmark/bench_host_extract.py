@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+主机名提取性能测试
+
+对比快速匹配路径与原urlparse路径每秒处理的行数，并校验两者结果一致。
+
+用法:
+    python benchmark/bench_host_extract.py [行数]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from utils.process_utils import load_script_module
+
+def generate_lines(count):
+    """
+    生成模拟的子域名数据，以裸主机名和host:port为主，夹杂少量URL
+    """
+    random.seed(0)
+    labels = ["www", "api", "admin", "oa", "vpn", "mail", "test", "dev", "static", "cdn"]
+    suffixes = ["example.com", "example.com.cn", "corp.net", "edu.cn"]
+    ports = ["", "", "", "", ":443", ":8080", ":8443", ":80"]
+    lines = []
+    for _ in range(count):
+        host = ".".join(random.sample(labels, random.randint(1, 3))) + "." + random.choice(suffixes)
+        line = host + random.choice(ports)
+        if random.random() < 0.1:
+            line = random.choice(["http://", "https://"]) + line + "/index.html"
+        lines.append(line)
+    return lines
+
+def measure(func, lines, strip_443=True):
+    """
+    返回(每秒行数, 结果列表)
+    """
+    start = time.perf_counter()
+    results = [func(line, strip_443) for line in lines]
+    elapsed = time.perf_counter() - start
+    return len(lines) / elapsed, results
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    logging.disable(logging.CRITICAL)
+
+    extract_script = load_script_module(os.path.join(ROOT_DIR, "script", "1_extract_subdomains.py"))
+    lines = generate_lines(count)
+
+    slow_rate, slow_results = measure(extract_script.extract_domain_with_urlparse, lines)
+    fast_rate, fast_results = measure(extract_script.extract_domain_from_url, lines)
+
+    print(f"测试行数: {count}")
+    print(f"urlparse路径: {slow_rate:,.0f} 行/秒")
+    print(f"快速匹配路径: {fast_rate:,.0f} 行/秒")
+    print(f"提升倍数: {fast_rate / slow_rate:.2f}x")
+    print(f"结果一致: {slow_results == fast_results}")
+
+if __name__ == "__main__":
+    main()
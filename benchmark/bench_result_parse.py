@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+探活结果解析性能测试
+
+对比解析httpx文本输出（正则去除颜色、按方括号猜测字段）与-json输出每秒处理的行数，
+并校验两种输出解析出的url、状态码、标题和重定向URL一致。
+
+用法:
+    python benchmark/bench_result_parse.py [行数]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from utils.process_utils import load_script_module
+
+def generate_results(count):
+    """
+    生成同一批探活结果的文本输出行和JSON输出行
+    """
+    random.seed(0)
+    labels = ["www", "api", "admin", "oa", "vpn", "mail", "test", "dev"]
+    titles = ["", "登录", "Welcome to nginx!", "管理后台 - 统一认证", "404 Not Found", "Dashboard"]
+    text_lines = []
+    json_lines = []
+    for i in range(count):
+        host = f"{random.choice(labels)}{i}.example.com"
+        url = random.choice(["http://", "https://"]) + host
+        title = random.choice(titles)
+        if random.random() < 0.2:
+            chain = [302, 200]
+            final_url = url + "/login"
+        else:
+            chain = []
+            final_url = url
+        status = chain[-1] if chain else random.choice([200, 403, 404])
+
+        # 文本输出带有颜色代码
+        status_text = ",".join(str(code) for code in chain) if chain else str(status)
+        line = f"{url} [\x1b[32m{status_text}\x1b[0m]"
+        if title:
+            line += f" [\x1b[36m{title}\x1b[0m]"
+        else:
+            line += " []"
+        if chain:
+            line += f" [{final_url}]"
+        text_lines.append(line + "\n")
+
+        record = {
+            "timestamp": "2025-01-01T00:00:00.000000000+08:00",
+            "url": url,
+            "input": host,
+            "title": title,
+            "webserver": "nginx",
+            "content_type": "text/html",
+            "host": "10.0.0.1",
+            "a": ["10.0.0.1"],
+            "status_code": status,
+            "content_length": random.randint(100, 50000),
+            "time": "123.4ms",
+            "failed": False,
+        }
+        if chain:
+            record["chain_status_codes"] = chain
+            record["final_url"] = final_url
+        json_lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+    return text_lines, json_lines
+
+def measure(func, lines):
+    """
+    返回(每秒行数, 结果列表)
+    """
+    start = time.perf_counter()
+    results = [func(line) for line in lines]
+    elapsed = time.perf_counter() - start
+    return len(lines) / elapsed, results
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    logging.disable(logging.CRITICAL)
+
+    process_script = load_script_module(os.path.join(ROOT_DIR, "script", "2_httpx_process.py"))
+    text_lines, json_lines = generate_results(count)
+
+    text_rate, text_results = measure(process_script.parse_result_line, text_lines)
+    json_rate, json_results = measure(process_script.parse_result_line, json_lines)
+
+    # 文本输出没有重定向时记录只有3列，统一补齐后比较前4列
+    def basic(record):
+        return (record + [""])[:4]
+
+    same = all(basic(a) == basic(b) for a, b in zip(text_results, json_results))
+
+    print(f"测试行数: {count}")
+    print(f"文本输出解析: {text_rate:,.0f} 行/秒")
+    print(f"JSON输出解析: {json_rate:,.0f} 行/秒")
+    print(f"提升倍数: {json_rate / text_rate:.2f}x")
+    print(f"结果一致: {same}")
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,97 @@
 """
 
 import os
+import re
+import io
+import sys
 import csv
+import mmap
 import logging
+from functools import lru_cache
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import urlparse
 from pathlib import Path
 
+# 将项目根目录加入Python路径，以便导入utils模块
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from utils.process_utils import call_script_function, resolve_worker_count
+from utils.sort_utils import ExternalSorter, read_run
+from utils.cache_utils import ExtractCache
+from utils.domain_store import DomainStore
+from utils.compress_utils import detect_compression, open_compressed_members
+from utils.xlsx_utils import is_xlsx_file, iter_xlsx_sheets
+from utils.scope_utils import ScopeFilter
+from utils.host_utils import HOST_PATTERN, fast_extract_host, join_host_port, canonicalize_host
+from utils.order_utils import interleave_hosts, load_public_suffix_list
+
+# 优先使用更快的orjson解析JSON Lines，未安装时使用标准库
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 # 获取logger
 logger = logging.getLogger("subdatarefine.extract")
 
+# 内存映射读取文本文件时每次扫描的字节数
+SCAN_CHUNK_SIZE = 8 * 1024 * 1024
+
+# 行结束符，与文本模式的通用换行一致（\n、\r、\r\n）
+NEWLINE_PATTERN = re.compile(rb'[\r\n]')
+
+# CSV文件每批处理的行数
+CSV_BATCH_SIZE = 10000
+
+# 回退到urlparse的解析结果的缓存条目数
+URLPARSE_CACHE_SIZE = 65536
+
+# 文本文件表头的UTF-8字节形式，用于在解码前跳过
+TXT_HEADER_BYTES = "子域名".encode('utf-8')
+
+# 字节层面strip不会去除、但str.strip会去除的ASCII字符
+STR_ONLY_WHITESPACE_BYTES = (b'\x1c', b'\x1d', b'\x1e', b'\x1f')
+
+# 识别文件格式时读取的文件头字节数
+SNIFF_BYTES = 4096
+
+# JSON Lines中可能保存主机名的字段，按顺序取第一个存在的字段
+# （subfinder为host，amass为name，其中amass的domain字段是根域名，优先级较低）
+JSONL_HOST_FIELDS = ("host", "name", "hostname", "subdomain", "domain", "url")
+
+# 并行提取时每个进程最多同时提交的任务数
+MAX_PENDING_TASKS_PER_WORKER = 2
+
+# JSON Lines文件的常见扩展名
+JSONL_SUFFIXES = (".jsonl", ".ndjson", ".json")
+
 def extract_domain_from_url(url, strip_443=True):
     """
     从URL中提取裸主机名（保留端口号，可选是否去除443端口）
     
+    参数:
+        url: 要处理的URL
+        strip_443: 是否去除443端口，默认为True
+    
+    返回:
+        提取的域名，如果解析失败则返回None
+    """
+    if not url:
+        return None
+    
+    # 常见形式直接匹配，其余情况回退到urlparse
+    domain = fast_extract_host(url, strip_443)
+    if domain is not None:
+        return domain
+    return extract_domain_with_urlparse(url, strip_443)
+
+def extract_domain_with_urlparse(url, strip_443=True):
+    """
+    使用urlparse从URL中提取裸主机名，处理快速匹配无法识别的输入
+    
     参数:
         url: 要处理的URL
         strip_443: 是否去除443端口，默认为True
@@ -46,37 +125,317 @@ def extract_domain_from_url(url, strip_443=True):
         logger.error(f"解析URL错误: {url}, 错误信息: {e}")
         return None
 
-def process_txt_file(file_path, strip_443=True):
+@lru_cache(maxsize=URLPARSE_CACHE_SIZE)
+def extract_domain_cached(url, strip_443=True):
     """
-    处理纯文本文件，提取域名
+    带缓存的extract_domain_with_urlparse，不常见形式的URL往往在数据中重复出现
+    """
+    return extract_domain_with_urlparse(url, strip_443)
+
+def add_txt_line(domains, line, strip_443=True):
+    """
+    处理文本文件中的一行，将提取的域名加入集合
+    
+    参数:
+        domains: 域名集合
+        line: 已解码的行内容
+        strip_443: 是否去除443端口，默认为True
+    """
+    line = line.strip()
+    if not line or line == "子域名":  # 跳过空行和表头
+        return
+    
+    # 提取域名（处理可能存在的URL）
+    domain = extract_domain_from_url(line, strip_443)
+    if domain:
+        domains.add(domain)
+    else:
+        # 可能是裸域名，直接添加
+        domains.add(line)
+
+def add_extracted_domains(domains, values, strip_443=True, keep_unparsed=True):
+    """
+    批量从URL或主机名中提取域名并加入集合
+    
+    结果与逐个调用extract_domain_from_url一致，只是把最常见的形式在循环内直接处理，
+    回退到urlparse的结果会被缓存。
+    
+    参数:
+        domains: 域名集合
+        values: 非空的URL或主机名列表
+        strip_443: 是否去除443端口，默认为True
+        keep_unparsed: 解析失败时是否保留原值（文本文件中可能是裸域名）
+    """
+    add = domains.add
+    match_host = HOST_PATTERN.fullmatch
+    for value in values:
+        match = match_host(value)
+        if match is not None:
+            host, port = match.group(1, 2)
+            if port is None:
+                add(host)
+                continue
+            domain = join_host_port(host, port, strip_443)
+            if domain is not None:
+                add(domain)
+                continue
+        
+        # 快速匹配无法处理的值回退到urlparse
+        domain = extract_domain_cached(value, strip_443)
+        if domain:
+            add(domain)
+        elif keep_unparsed:
+            add(value)
+
+def find_line_start(buffer, offset):
+    """
+    查找offset处（含）之后第一个完整行的起始字节位置
+    
+    参数:
+        buffer: 文件内容，可以是bytes或mmap对象
+        offset: 字节偏移量
+    
+    返回:
+        行起始位置，没有更多行时返回内容末尾位置
+    """
+    if offset <= 0:
+        return 0
+    
+    # 从offset前一个字节开始查找行结束符，保证恰好位于行首的offset保持不变
+    match = NEWLINE_PATTERN.search(buffer, offset - 1)
+    return match.end() if match else len(buffer)
+
+def iter_txt_chunks(buffer, start, end):
+    """
+    将[start, end)范围按行边界切成较大的字节块
+    
+    参数:
+        buffer: 文件内容，可以是bytes或mmap对象
+        start: 起始字节位置
+        end: 结束字节位置
+    
+    返回:
+        字节块的生成器，每块只包含完整的行
+    """
+    # 将范围对齐到行首
+    pos = find_line_start(buffer, start)
+    end = find_line_start(buffer, end)
+    while pos < end:
+        chunk_end = min(pos + SCAN_CHUNK_SIZE, end)
+        if chunk_end < end:
+            # 块末尾退回到最后一个行结束符之后，块内没有行结束符时向后扩展到下一行
+            last_newline = max(buffer.rfind(b'\n', pos, chunk_end), buffer.rfind(b'\r', pos, chunk_end))
+            chunk_end = last_newline + 1 if last_newline >= 0 else find_line_start(buffer, chunk_end)
+        yield buffer[pos:chunk_end]
+        pos = chunk_end
+
+def process_txt_range(file_path, start=0, end=None, strip_443=True):
+    """
+    处理纯文本文件中的一段字节范围，提取域名
+    
+    文件通过内存映射按大块扫描，空行、表头和块内重复的行在字节层面直接跳过，
+    只有剩下的行才会解码并提取主机名。范围的起止位置会对齐到行首，
+    相邻范围拼接后恰好覆盖整个文件，因此大文件可以切分给多个进程分别处理。
     
     参数:
         file_path: 文件路径
+        start: 起始字节位置，默认为文件开头
+        end: 结束字节位置，默认为文件末尾
         strip_443: 是否去除443端口，默认为True
     
     返回:
         提取的域名集合
     """
-    domains = set()
+    domains = DomainStore()
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line == "子域名":  # 跳过空行和表头
-                    continue
-                
-                # 提取域名（处理可能存在的URL）
-                domain = extract_domain_from_url(line, strip_443)
-                if domain:
-                    domains.add(domain)
-                else:
-                    # 可能是裸域名，直接添加
-                    domains.add(line)
+        with open(file_path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size == 0:
+                return domains
+            if end is None:
+                end = file_size
+            
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                for chunk in iter_txt_chunks(buffer, start, end):
+                    extract_txt_chunk(chunk, domains, strip_443)
     except Exception as e:
         logger.error(f"处理文本文件错误: {file_path}, 错误信息: {e}")
     
     return domains
 
+def extract_txt_chunk(chunk, domains, strip_443=True):
+    """
+    从只包含完整行的字节块中提取域名
+    
+    参数:
+        chunk: 字节块
+        domains: 域名集合
+        strip_443: 是否去除443端口，默认为True
+    """
+    # 先在字节层面去除首尾空白并去重，跳过空行和表头，重复的行只解码一次
+    raw_lines = {raw_line.strip() for raw_line in chunk.splitlines()}
+    raw_lines.discard(b'')
+    raw_lines.discard(TXT_HEADER_BYTES)
+    if not raw_lines:
+        return
+    
+    # 整块一次解码，行内不含\n，解码后按\n拆分即可还原各行
+    joined = b'\n'.join(raw_lines)
+    lines = joined.decode('utf-8', errors='ignore').split('\n')
+    if not joined.isascii() or any(char in joined for char in STR_ONLY_WHITESPACE_BYTES):
+        # 含有非ASCII等字符时，按文本方式再处理一遍空白和表头
+        lines = [line.strip() for line in lines]
+        lines = [line for line in lines if line and line != "子域名"]
+    
+    found = set()
+    add_extracted_domains(found, lines, strip_443)
+    domains.update(found)
+
+def iter_stream_chunks(stream):
+    """
+    从二进制流中按大块读取数据，每块只包含完整的行
+    
+    参数:
+        stream: 二进制流
+    
+    返回:
+        字节块的生成器
+    """
+    pending = b''
+    while True:
+        block = stream.read(SCAN_CHUNK_SIZE)
+        if not block:
+            break
+        
+        block = pending + block
+        # 块末尾可能是不完整的行，留到下一块处理
+        last_newline = max(block.rfind(b'\n'), block.rfind(b'\r'))
+        if last_newline < 0:
+            pending = block
+            continue
+        pending = block[last_newline + 1:]
+        yield block[:last_newline + 1]
+    
+    if pending:
+        yield pending
+
+def process_txt_stream(stream, domains, strip_443=True):
+    """
+    处理二进制流形式的纯文本数据（如解压流），提取域名
+    
+    参数:
+        stream: 二进制流
+        domains: 域名集合
+        strip_443: 是否去除443端口，默认为True
+    """
+    for chunk in iter_stream_chunks(stream):
+        extract_txt_chunk(chunk, domains, strip_443)
+
+def process_txt_file(file_path, strip_443=True):
+    """
+    处理纯文本文件，提取域名
+    
+    参数:
+        file_path: 文件路径
+        strip_443: 是否去除443端口，默认为True
+    
+    返回:
+        提取的域名集合
+    """
+    return process_txt_range(file_path, 0, None, strip_443)
+
+class CsvExtractPlan:
+    """
+    根据CSV表头编译出的提取计划，记录各类列的索引，按批处理数据行
+    """
+    
+    def __init__(self, header):
+        """
+        参数:
+            header: CSV表头
+        """
+        # 确定包含域名的列索引
+        self.domain_indices = []
+        self.url_indices = []
+        self.host_indices = []
+        
+        for i, col in enumerate(header):
+            if col.lower() in ['域名', 'domain']:
+                self.domain_indices.append(i)
+            elif col.lower() in ['url', 'link']:
+                self.url_indices.append(i)
+            elif col.lower() in ['host']:
+                self.host_indices.append(i)
+        
+        # 特殊处理：如果有IP和端口列，但没有域名
+        self.ip_index = -1
+        self.port_index = -1
+        if not self.domain_indices and not self.url_indices and not self.host_indices:
+            for i, col in enumerate(header):
+                if col.lower() == 'ip':
+                    self.ip_index = i
+                elif col.lower() == '端口' or col.lower() == 'port':
+                    self.port_index = i
+    
+    def has_columns(self):
+        """
+        表头中是否有可以提取域名的列
+        """
+        return bool(self.domain_indices or self.url_indices or self.host_indices
+                    or (self.ip_index >= 0 and self.port_index >= 0))
+    
+    def extract(self, rows, domains, strip_443=True):
+        """
+        从一批数据行中提取域名
+        
+        参数:
+            rows: 数据行列表
+            domains: 域名集合
+            strip_443: 是否去除443端口，默认为True
+        """
+        found = set()
+        
+        # 从域名列提取
+        for idx in self.domain_indices:
+            found.update({row[idx] for row in rows if idx < len(row)})
+        found.discard('')
+        
+        # 从URL列和Host列提取，同一批中的重复值只解析一次
+        cells = set()
+        for idx in self.url_indices + self.host_indices:
+            cells.update({row[idx] for row in rows if idx < len(row)})
+        cells.discard('')
+        add_extracted_domains(found, cells, strip_443, keep_unparsed=False)
+        
+        # 如果找到IP和端口列，组合成域名格式
+        ip_idx = self.ip_index
+        port_idx = self.port_index
+        if ip_idx >= 0 and port_idx >= 0:
+            found.update({f"{row[ip_idx]}:{row[port_idx]}" for row in rows
+                          if ip_idx < len(row) and port_idx < len(row) and row[ip_idx] and row[port_idx]})
+        
+        domains.update(found)
+
+# 按表头缓存的提取计划，同一工具导出的多个文件共用一个计划
+_csv_plans = {}
+
+def get_csv_plan(header):
+    """
+    获取表头对应的提取计划，没有时编译并缓存
+    
+    参数:
+        header: CSV表头
+    
+    返回:
+        CsvExtractPlan对象
+    """
+    key = tuple(header)
+    plan = _csv_plans.get(key)
+    if plan is None:
+        plan = CsvExtractPlan(header)
+        _csv_plans[key] = plan
+    return plan
+
 def process_csv_file(file_path, strip_443=True):
     """
     处理CSV文件，从不同列中提取域名
@@ -88,73 +447,599 @@ def process_csv_file(file_path, strip_443=True):
     返回:
         提取的域名集合
     """
-    domains = set()
+    domains = DomainStore()
     try:
         with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            # 尝试读取CSV
-            reader = csv.reader(f)
-            header = next(reader, None)
-            
-            if not header:
+            process_csv_stream(f, domains, strip_443)
+    except Exception as e:
+        logger.error(f"处理CSV文件错误: {file_path}, 错误信息: {e}")
+    
+    return domains
+
+def process_csv_stream(f, domains, strip_443=True):
+    """
+    从文本流中读取CSV并提取域名
+    
+    参数:
+        f: 文本流
+        domains: 域名集合
+        strip_443: 是否去除443端口，默认为True
+    """
+    # 尝试读取CSV
+    reader = csv.reader(f)
+    header = next(reader, None)
+    
+    if not header:
+        return
+    
+    plan = get_csv_plan(header)
+    
+    # 按批读取数据行并提取域名
+    batch = []
+    try:
+        while True:
+            batch.extend(islice(reader, CSV_BATCH_SIZE))
+            if not batch:
+                break
+            plan.extract(batch, domains, strip_443)
+            batch = []
+    finally:
+        # 读取出错时先处理已读到的行，再由调用方记录错误
+        if batch:
+            plan.extract(batch, domains, strip_443)
+
+def process_csv_binary_stream(stream, domains, strip_443=True):
+    """
+    从二进制流（如解压流）中读取CSV并提取域名
+    
+    参数:
+        stream: 二进制流
+        domains: 域名集合
+        strip_443: 是否去除443端口，默认为True
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='ignore')
+    try:
+        process_csv_stream(text, domains, strip_443)
+    finally:
+        # 只解除包装，底层流由调用方关闭
+        text.detach()
+
+def sniff_csv(name, head):
+    """
+    判断文件是否为CSV：扩展名为.csv，或第一行是包含可识别列名的逗号分隔表头
+    
+    参数:
+        name: 文件名或路径
+        head: 文件开头的字节
+    
+    返回:
+        是CSV时返回True
+    """
+    if name.lower().endswith('.csv'):
+        return True
+    
+    first_line = NEWLINE_PATTERN.split(head, 1)[0]
+    if b',' not in first_line:
+        return False
+    header = next(csv.reader([first_line.decode('utf-8', errors='ignore')]), [])
+    return get_csv_plan(header).has_columns()
+
+def extract_jsonl_chunk(chunk, domains, strip_443=True):
+    """
+    从只包含完整行的JSON Lines字节块中提取域名
+    
+    参数:
+        chunk: 字节块
+        domains: 域名集合
+        strip_443: 是否去除443端口，默认为True
+    
+    返回:
+        无法解析的行数
+    """
+    values = set()
+    invalid = 0
+    for line in chunk.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json_loads(line)
+        except ValueError:
+            invalid += 1
+            continue
+        if not isinstance(record, dict):
+            invalid += 1
+            continue
+        
+        # 取第一个存在的主机名字段
+        for field in JSONL_HOST_FIELDS:
+            value = record.get(field)
+            if value:
+                if isinstance(value, str):
+                    values.add(value.strip())
+                break
+    
+    values.discard('')
+    found = set()
+    add_extracted_domains(found, values, strip_443, keep_unparsed=False)
+    domains.update(found)
+    return invalid
+
+def process_jsonl_stream(stream, domains, strip_443=True):
+    """
+    从二进制流中读取JSON Lines并提取域名
+    
+    参数:
+        stream: 二进制流
+        domains: 域名集合
+        strip_443: 是否去除443端口，默认为True
+    """
+    invalid = 0
+    for chunk in iter_stream_chunks(stream):
+        invalid += extract_jsonl_chunk(chunk, domains, strip_443)
+    if invalid:
+        logger.warning(f"跳过 {invalid} 行无法解析的JSON")
+
+def process_jsonl_file(file_path, strip_443=True):
+    """
+    处理JSON Lines文件（如subfinder -oJ、amass -json的输出），只读取主机名字段
+    
+    参数:
+        file_path: 文件路径
+        strip_443: 是否去除443端口，默认为True
+    
+    返回:
+        提取的域名集合
+    """
+    domains = DomainStore()
+    invalid = 0
+    try:
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
                 return domains
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                for chunk in iter_txt_chunks(buffer, 0, len(buffer)):
+                    invalid += extract_jsonl_chunk(chunk, domains, strip_443)
+    except Exception as e:
+        logger.error(f"处理JSON文件错误: {file_path}, 错误信息: {e}")
+    
+    if invalid:
+        logger.warning(f"跳过 {invalid} 行无法解析的JSON: {file_path}")
+    return domains
+
+def sniff_jsonl(name, head):
+    """
+    判断文件是否为JSON Lines：第一个非空行是一个完整的JSON对象
+    
+    参数:
+        name: 文件名或路径
+        head: 文件开头的字节
+    
+    返回:
+        是JSON Lines时返回True
+    """
+    lines = head.lstrip().splitlines()
+    if not lines or not lines[0].startswith(b'{'):
+        return False
+    # 文件头中只有一行且未读完时，无法确认该行是否完整，按扩展名判断
+    if len(lines) == 1 and len(head) >= SNIFF_BYTES:
+        return name.lower().endswith(JSONL_SUFFIXES)
+    try:
+        return isinstance(json_loads(lines[0]), dict)
+    except ValueError:
+        return False
+
+def process_xlsx_file(file_path, strip_443=True):
+    """
+    处理xlsx工作簿，按与CSV相同的表头规则从各个工作表中提取域名
+    
+    参数:
+        file_path: 文件路径
+        strip_443: 是否去除443端口，默认为True
+    
+    返回:
+        提取的域名集合
+    """
+    domains = DomainStore()
+    try:
+        for sheet, rows in iter_xlsx_sheets(file_path):
+            # 每个工作表的第一行作为表头
+            header = next(rows, None)
+            if not header:
+                continue
             
-            # 确定包含域名的列索引
-            domain_indices = []
-            url_indices = []
-            host_indices = []
-            
-            for i, col in enumerate(header):
-                if col.lower() in ['域名', 'domain']:
-                    domain_indices.append(i)
-                elif col.lower() in ['url', 'link']:
-                    url_indices.append(i)
-                elif col.lower() in ['host']:
-                    host_indices.append(i)
-            
-            # 从每行数据中提取域名
-            for row in reader:
-                # 从域名列提取
-                for idx in domain_indices:
-                    if idx < len(row) and row[idx]:
-                        domains.add(row[idx])
-                
-                # 从URL列提取
-                for idx in url_indices:
-                    if idx < len(row) and row[idx]:
-                        domain = extract_domain_from_url(row[idx], strip_443)
-                        if domain:
-                            domains.add(domain)
-                
-                # 从Host列提取
-                for idx in host_indices:
-                    if idx < len(row) and row[idx]:
-                        domain = extract_domain_from_url(row[idx], strip_443)
-                        if domain:
-                            domains.add(domain)
-                        
-                # 特殊处理：如果有IP和端口列，但没有域名
-                if len(domain_indices) == 0 and len(url_indices) == 0 and len(host_indices) == 0:
-                    # 寻找IP和端口列
-                    ip_idx = -1
-                    port_idx = -1
-                    for i, col in enumerate(header):
-                        if col.lower() == 'ip':
-                            ip_idx = i
-                        elif col.lower() == '端口' or col.lower() == 'port':
-                            port_idx = i
-                    
-                    # 如果找到IP和端口列，组合成域名格式
-                    if ip_idx >= 0 and port_idx >= 0 and ip_idx < len(row) and port_idx < len(row):
-                        if row[ip_idx] and row[port_idx]:
-                            domain = f"{row[ip_idx]}:{row[port_idx]}"
-                            domains.add(domain)
+            plan = get_csv_plan(header)
+            while True:
+                batch = list(islice(rows, CSV_BATCH_SIZE))
+                if not batch:
+                    break
+                plan.extract(batch, domains, strip_443)
+    except Exception as e:
+        logger.error(f"处理xlsx文件错误: {file_path}, 错误信息: {e}")
+    
+    return domains
+
+def process_compressed_file(file_path, strip_443=True):
+    """
+    处理压缩文件（gzip/bz2/xz/zip），边解压边解析，不解压到磁盘
+    
+    压缩包内的文件按去掉压缩扩展名后的文件名和解压后的内容选择解析方式。
+    
+    参数:
+        file_path: 文件路径
+        strip_443: 是否去除443端口，默认为True
     
+    返回:
+        提取的域名集合
+    """
+    domains = DomainStore()
+    try:
+        kind = detect_compression(file_path)
+        for inner_name, stream in open_compressed_members(file_path, kind):
+            parse_stream = get_stream_parser(inner_name, stream.peek(SNIFF_BYTES)[:SNIFF_BYTES])
+            parse_stream(stream, domains, strip_443)
     except Exception as e:
-        logger.error(f"处理CSV文件错误: {file_path}, 错误信息: {e}")
+        logger.error(f"处理压缩文件错误: {file_path}, 错误信息: {e}")
     
     return domains
 
-def main(dir_path="domain", output_file="domains.txt", strip_443=True):
+class InputParser:
+    """
+    已注册的输入格式解析器
+    """
+    
+    def __init__(self, name, sniff, parse, parse_stream=None):
+        """
+        参数:
+            name: 格式名称
+            sniff: 识别函数，sniff(文件名或路径, 文件开头的字节)，是该格式时返回True
+            parse: 解析函数，parse(文件路径, strip_443)，返回域名集合
+            parse_stream: 流解析函数，parse_stream(二进制流, 域名集合, strip_443)，
+                提供时压缩包内的文件也可以按该格式解析
+        """
+        self.name = name
+        self.sniff = sniff
+        self.parse = parse
+        self.parse_stream = parse_stream
+
+# 已注册的解析器，按优先级从高到低排列；都不匹配时按纯文本处理
+_parsers = []
+
+def register_parser(name, sniff, parse, parse_stream=None):
+    """
+    注册输入格式解析器，后注册的解析器优先于先注册的，同名解析器会被替换
+    
+    并行模式下任务在子进程中按名称查找解析器，因此自定义解析器应在模块导入时注册
+    （子进程会重新加载本脚本，运行时才注册的解析器在spawn方式启动的子进程中不可见）。
+    
+    参数:
+        name: 格式名称，txt保留给默认的纯文本解析
+        sniff: 识别函数，sniff(文件名或路径, 文件开头的字节)，是该格式时返回True
+        parse: 解析函数，parse(文件路径, strip_443)，返回域名集合
+        parse_stream: 流解析函数，parse_stream(二进制流, 域名集合, strip_443)，可选
+    """
+    if name == "txt":
+        raise ValueError("txt为默认的纯文本解析方式，不能注册")
+    _parsers[:] = [parser for parser in _parsers if parser.name != name]
+    _parsers.insert(0, InputParser(name, sniff, parse, parse_stream))
+
+def get_parser(name):
+    """
+    按名称查找已注册的解析器，不存在时返回None
+    """
+    for parser in _parsers:
+        if parser.name == name:
+            return parser
+    return None
+
+def get_stream_parser(name, head):
+    """
+    为流数据（如压缩包内的文件）选择流解析函数，都不匹配时按纯文本处理
+    
+    参数:
+        name: 文件名
+        head: 流开头的字节
+    
+    返回:
+        流解析函数
+    """
+    for parser in _parsers:
+        if parser.parse_stream is not None and parser.sniff(name, head):
+            return parser.parse_stream
+    return process_txt_stream
+
+def sniff_xlsx(name, head):
+    # xlsx本身也是zip包，需要先于压缩文件识别
+    return head.startswith(b'PK\x03\x04') and is_xlsx_file(name)
+
+def sniff_compressed(name, head):
+    # 压缩文件按文件头识别，不依赖扩展名
+    return detect_compression(head=head) is not None
+
+# 内置解析器，越靠后注册优先级越高
+register_parser("csv", sniff_csv, process_csv_file, process_csv_binary_stream)
+register_parser("jsonl", sniff_jsonl, process_jsonl_file, process_jsonl_stream)
+register_parser("compressed", sniff_compressed, process_compressed_file)
+register_parser("xlsx", sniff_xlsx, process_xlsx_file)
+
+def list_input_files(dir_path):
+    """
+    列出目录下需要处理的文件
+    
+    参数:
+        dir_path: 要处理的目录路径
+    
+    返回:
+        文件名列表
+    """
+    # 只处理文本和CSV文件，跳过子目录
+    return [filename for filename in os.listdir(dir_path)
+            if os.path.isfile(os.path.join(dir_path, filename))]
+
+def detect_file_parser(filename, file_path):
+    """
+    确定文件的解析方式
+    
+    参数:
+        filename: 文件名
+        file_path: 文件路径
+    
+    返回:
+        已注册的解析器名称，都不匹配时为txt
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+    
+    for parser in _parsers:
+        try:
+            if parser.sniff(file_path, head):
+                return parser.name
+        except Exception as e:
+            logger.warning(f"识别文件格式出错: {filename}, 解析器: {parser.name}, 错误信息: {e}")
+    return "txt"  # 默认作为文本文件处理
+
+def build_extract_tasks(dir_path, filenames, chunk_size):
+    """
+    为文件生成提取任务，超过chunk_size的文本文件按字节范围切分
+    
+    参数:
+        dir_path: 要处理的目录路径
+        filenames: 要处理的文件名列表
+        chunk_size: 单个任务的最大字节数
+    
+    返回:
+        任务列表，每个任务为(文件名, 文件路径, 解析方式, 起始位置, 结束位置)
+    """
+    tasks = []
+    for filename in filenames:
+        file_path = os.path.join(dir_path, filename)
+        parser = detect_file_parser(filename, file_path)
+        
+        # 只有纯文本可以按字节切分，CSV字段中可能包含换行，其余格式只能顺序解析
+        if parser != "txt":
+            tasks.append((filename, file_path, parser, None, None))
+            continue
+        
+        file_size = os.path.getsize(file_path)
+        if chunk_size <= 0 or file_size <= chunk_size:
+            tasks.append((filename, file_path, parser, 0, file_size))
+            continue
+        
+        for start in range(0, file_size, chunk_size):
+            tasks.append((filename, file_path, parser, start, min(start + chunk_size, file_size)))
+    
+    return tasks
+
+def run_extract_task(task, strip_443=True):
+    """
+    执行单个提取任务，在进程池的子进程中运行
+    
+    参数:
+        task: build_extract_tasks生成的任务
+        strip_443: 是否去除443端口，默认为True
+    
+    返回:
+        提取的域名集合
+    """
+    filename, file_path, parser, start, end = task
+    if parser == "txt":
+        return process_txt_range(file_path, start, end, strip_443)
+    return get_parser(parser).parse(file_path, strip_443)
+
+def extract_parallel(dir_path, filenames, strip_443=True, workers=0, chunk_size_mb=64):
+    """
+    使用进程池并行提取文件中的域名
+    
+    参数:
+        dir_path: 要处理的目录路径
+        filenames: 要处理的文件名列表
+        strip_443: 是否去除443端口，默认为True
+        workers: 进程数，0表示使用CPU核心数
+        chunk_size_mb: 文本文件按字节范围切分的大小（MB）
+    
+    返回:
+        (文件名, 域名集合)的生成器，每个文件的所有分段处理完成后产出一次
+    """
+    tasks = build_extract_tasks(dir_path, filenames, int(chunk_size_mb * 1024 * 1024))
+    if not tasks:
+        return
+    
+    workers = min(resolve_worker_count(workers), len(tasks))
+    logger.info(f"并行提取: {len(tasks)} 个任务，{workers} 个进程")
+    
+    # 记录每个文件尚未完成的分段数，以及已完成分段的合并结果
+    pending_counts = {}
+    file_domains = {}
+    for task in tasks:
+        pending_counts[task[0]] = pending_counts.get(task[0], 0) + 1
+    
+    script_path = os.path.abspath(__file__)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 同时提交的任务数有上限，消费者暂停读取结果时不再提交新任务，已完成的结果不会无限积压
+        pending_tasks = iter(tasks)
+        futures = {}
+        
+        def submit_tasks():
+            for task in islice(pending_tasks, workers * MAX_PENDING_TASKS_PER_WORKER - len(futures)):
+                future = executor.submit(call_script_function, script_path, "run_extract_task", task, strip_443)
+                futures[future] = task
+        
+        submit_tasks()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                filename, file_path = futures.pop(future)[:2]
+                try:
+                    domains = future.result()
+                except Exception as e:
+                    logger.error(f"并行处理文件错误: {file_path}, 错误信息: {e}")
+                    domains = DomainStore()
+                
+                # 合并同一文件各分段的结果
+                if filename in file_domains:
+                    file_domains[filename].update(domains)
+                else:
+                    file_domains[filename] = domains
+                
+                pending_counts[filename] -= 1
+                if pending_counts[filename] == 0:
+                    logger.info(f"处理文件: {filename}")
+                    yield filename, file_domains.pop(filename)
+            submit_tasks()
+
+def extract_serial(dir_path, filenames, strip_443=True):
+    """
+    串行提取文件中的域名
+    
+    参数:
+        dir_path: 要处理的目录路径
+        filenames: 要处理的文件名列表
+        strip_443: 是否去除443端口，默认为True
+    
+    返回:
+        (文件名, 域名集合)的生成器
+    """
+    for filename in filenames:
+        file_path = os.path.join(dir_path, filename)
+        
+        logger.info(f"处理文件: {filename}")
+        
+        parser = detect_file_parser(filename, file_path)
+        yield filename, run_extract_task((filename, file_path, parser, 0, None), strip_443)
+
+def extract_files(dir_path, filenames, strip_443=True, workers=1, chunk_size_mb=64):
+    """
+    按进程数选择串行或并行方式提取文件中的域名
+    
+    返回:
+        (文件名, 域名集合)的生成器
+    """
+    if workers == 1:
+        return extract_serial(dir_path, filenames, strip_443)
+    return extract_parallel(dir_path, filenames, strip_443, workers, chunk_size_mb)
+
+def extract_incremental(dir_path, filenames, all_domains, temp_dir, strip_443=True, workers=1, chunk_size_mb=64):
+    """
+    增量提取：只解析新增或变化的文件，未变化的文件直接读取上次的缓存结果
+    
+    参数:
+        dir_path: 要处理的目录路径
+        filenames: 要处理的文件名列表
+        all_domains: 用于汇总域名的集合
+        temp_dir: 存放清单和缓存的临时目录
+        strip_443: 是否去除443端口，默认为True
+        workers: 并行提取的进程数
+        chunk_size_mb: 大文本文件按字节范围切分的大小（MB）
+    """
+    cache = ExtractCache(temp_dir, {"strip_443": strip_443})
+    
+    cached_files = []
+    changed_files = []
+    content_hashes = {}
+    for filename in filenames:
+        cache_file, content_hash = cache.lookup(filename, os.path.join(dir_path, filename))
+        if cache_file:
+            cached_files.append(cache_file)
+        else:
+            changed_files.append(filename)
+            content_hashes[filename] = content_hash
+    
+    # 已删除的文件从清单中移除，其域名不再参与汇总
+    removed_count = cache.prune(set(filenames))
+    
+    logger.info(f"增量提取: 复用 {len(cached_files)} 个文件的缓存，"
+                f"解析 {len(changed_files)} 个新增或变化的文件，移除 {removed_count} 个已删除的文件")
+    
+    for filename, domains in extract_files(dir_path, changed_files, strip_443, workers, chunk_size_mb):
+        cache.store(filename, os.path.join(dir_path, filename), content_hashes[filename], domains)
+        all_domains.update(domains)
+    
+    for cache_file in cached_files:
+        all_domains.update(read_run(cache_file))
+    
+    cache.save()
+
+def stream_domains(dir_path="domain", output_file=None, strip_443=True, workers=1, chunk_size_mb=64,
+                   scope_config=None, canonicalize=True):
+    """
+    流水线模式：边提取边输出去重后的主机，供httpx从标准输入读取
+    
+    每个文件解析完成后立即输出其中新出现的主机，主机按发现的顺序输出，不排序。
+    生成器由消费者驱动，消费者阻塞（如httpx的标准输入管道已满）时提取也随之暂停。
+    
+    参数:
+        dir_path: 要处理的目录路径，默认为domain
+        output_file: 同时写入主机列表的文件，为None时不保存
+        strip_443: 是否去除443端口，默认为True
+        workers: 并行提取的进程数，1表示串行处理，0表示使用CPU核心数
+        chunk_size_mb: 大文本文件按字节范围切分的大小（MB），仅并行模式使用
+        scope_config: 测试范围配置（允许和排除列表），不在范围内的主机不输出
+        canonicalize: 是否将等价的主机名合并为规范形式
+    
+    返回:
+        主机名的生成器
+    """
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    dir_path = os.path.join(script_dir, dir_path)
+    
+    if not os.path.exists(dir_path):
+        logger.error(f"目录不存在: {dir_path}")
+        return
+    
+    filenames = list_input_files(dir_path)
+    scope = ScopeFilter.from_config(scope_config)
+    
+    # 已输出和已排除的主机，用紧凑存储判断是否已经出现过
+    seen = DomainStore()
+    count = 0
+    out_of_scope = 0
+    out = open(os.path.join(script_dir, output_file), 'w', encoding='utf-8') if output_file else None
+    try:
+        for filename, domains in extract_files(dir_path, filenames, strip_443, workers, chunk_size_mb):
+            for domain in domains:
+                if canonicalize:
+                    domain = canonicalize_host(domain)
+                if domain in seen:
+                    continue
+                seen.add(domain)
+                if scope is not None and domain not in scope:
+                    out_of_scope += 1
+                    continue
+                if out:
+                    out.write(domain + '\n')
+                count += 1
+                yield domain
+    finally:
+        if out:
+            out.close()
+    
+    if scope is not None:
+        logger.info(f"范围过滤: 排除 {out_of_scope} 个不在测试范围内的主机")
+    logger.info(f"提取完成！共找到 {count} 个唯一域名")
+    print(f"提取完成！共找到 {count} 个唯一域名" + (f"，已保存至 {out.name}" if out else ""))
+
+def main(dir_path="domain", output_file="domains.txt", strip_443=True, workers=1, chunk_size_mb=64,
+         temp_dir="temp", max_memory_mb=0, incremental=False, scope_config=None, canonicalize=True,
+         order="sorted", psl_file=None):
     """
     主函数
     
@@ -162,6 +1047,15 @@ def main(dir_path="domain", output_file="domains.txt", strip_443=True):
         dir_path: 要处理的目录路径，默认为domain
         output_file: 输出文件名，默认为domains.txt
         strip_443: 是否去除443端口，默认为True
+        workers: 并行提取的进程数，1表示串行处理，0表示使用CPU核心数
+        chunk_size_mb: 大文本文件按字节范围切分的大小（MB），仅并行模式使用
+        temp_dir: 临时文件目录，默认为temp
+        max_memory_mb: 去重排序的内存预算（MB），超出后写入临时目录做外部排序，0表示不限制
+        incremental: 是否启用增量提取，只解析新增或变化的文件
+        scope_config: 测试范围配置（允许和排除列表），不在范围内的主机不写入输出文件
+        canonicalize: 是否将等价的主机名（大小写、末尾的点、*.前缀、IDN、:80端口）合并为规范形式
+        order: 输出顺序，sorted按主机名排序，interleave按可注册域名分组后在各组之间轮流输出
+        psl_file: 公共后缀列表文件，交错排序时用于确定可注册域名，为空时只使用内置的后缀
     """
     # 获取当前脚本所在目录
     script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -169,40 +1063,83 @@ def main(dir_path="domain", output_file="domains.txt", strip_443=True):
     # 构建完整路径
     dir_path = os.path.join(script_dir, dir_path)
     output_file = os.path.join(script_dir, output_file)
-    
-    all_domains = set()
+    temp_dir = os.path.join(script_dir, temp_dir)
     
     # 检查目录是否存在
     if not os.path.exists(dir_path):
         logger.error(f"目录不存在: {dir_path}")
         return
     
-    # 处理目录下所有文件
-    for filename in os.listdir(dir_path):
-        file_path = os.path.join(dir_path, filename)
+    filenames = list_input_files(dir_path)
+    scope = ScopeFilter.from_config(scope_config)
+    
+    # 设置了内存预算时使用外部排序，否则在内存中用紧凑存储去重
+    def new_container(prefix):
+        if max_memory_mb and max_memory_mb > 0:
+            return ExternalSorter(temp_dir, max_memory_mb, prefix=prefix)
+        return DomainStore()
+    
+    all_domains = new_container("domains_run_")
+    canonical_domains = None
+    
+    try:
+        if incremental:
+            extract_incremental(dir_path, filenames, all_domains, temp_dir, strip_443, workers, chunk_size_mb)
+        else:
+            for filename, domains in extract_files(dir_path, filenames, strip_443, workers, chunk_size_mb):
+                # 添加到总集合
+                all_domains.update(domains)
         
-        # 只处理文本和CSV文件
-        if not os.path.isfile(file_path):
-            continue
+        # 规范化后的主机名不再有序，需要重新去重排序
+        saved_count = 0
+        if canonicalize:
+            raw_count = 0
+            canonical_domains = new_container("canonical_run_")
+            for domain in all_domains:
+                canonical_domains.add(canonicalize_host(domain))
+                raw_count += 1
+            if isinstance(all_domains, ExternalSorter):
+                all_domains.cleanup()
+            all_domains = canonical_domains
         
-        logger.info(f"处理文件: {filename}")
+        # 保存唯一域名到输出文件，两种容器遍历时均已排序；去重后每个主机只做一次范围判断
+        count = 0
+        out_of_scope = 0
         
-        # 根据文件扩展名选择处理方法
-        if filename.endswith('.csv'):
-            domains = process_csv_file(file_path, strip_443)
-        else:  # 默认作为文本文件处理
-            domains = process_txt_file(file_path, strip_443)
+        def in_scope_domains():
+            nonlocal out_of_scope
+            for domain in all_domains:
+                if scope is not None and domain not in scope:
+                    out_of_scope += 1
+                    continue
+                yield domain
         
-        # 添加到总集合
-        all_domains.update(domains)
-    
-    # 保存唯一域名到输出文件
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for domain in sorted(all_domains):
-            f.write(domain + '\n')
+        domains = in_scope_domains()
+        if order == "interleave":
+            psl = load_public_suffix_list(os.path.join(script_dir, psl_file) if psl_file else None)
+            domains = interleave_hosts(domains, temp_dir, max_memory_mb, psl)
+        
+        with open(output_file, 'w', encoding='utf-8') as f:
+            for domain in domains:
+                f.write(domain + '\n')
+                count += 1
+        
+        if canonicalize:
+            saved_count = raw_count - count - out_of_scope
+    finally:
+        for container in (all_domains, canonical_domains):
+            if isinstance(container, ExternalSorter):
+                container.cleanup()
     
-    logger.info(f"提取完成！共找到 {len(all_domains)} 个唯一域名，已保存至 {output_file}")
-    print(f"提取完成！共找到 {len(all_domains)} 个唯一域名，已保存至 {output_file}")
+    if scope is not None:
+        logger.info(f"范围过滤: 排除 {out_of_scope} 个不在测试范围内的主机")
+    if order == "interleave":
+        logger.info("输出顺序: 按可注册域名分组后在各组之间轮流排列")
+    logger.info(f"提取完成！共找到 {count} 个唯一域名，已保存至 {output_file}")
+    print(f"提取完成！共找到 {count} 个唯一域名，已保存至 {output_file}")
+    if canonicalize:
+        logger.info(f"规范化: 合并 {saved_count} 个等价主机名，减少 {saved_count} 次探测")
+        print(f"规范化合并了 {saved_count} 个等价主机名，减少 {saved_count} 次探测")
 
 if __name__ == "__main__":
     # 设置日志
@@ -6,100 +6,294 @@
 
 import os
 import re
+import sys
 import csv
 import logging
+from urllib.parse import urlsplit
+
+# 将项目根目录加入Python路径，以便导入utils模块
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from utils.history_utils import HostHistory
+
+# 优先使用更快的orjson解析JSON输出，未安装时使用标准库
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # 获取logger
 logger = logging.getLogger("subdatarefine.process")
 
-def process_result_file(input_file, output_file):
+# ANSI转义序列（颜色等）
+ANSI_ESCAPE_PATTERN = re.compile(r'\x1b\[(?:\d+;)*\d+m')
+
+# 输出CSV的基本列，以及httpx -json输出中额外提取的列
+RESULT_HEADERS = ["url", "状态码", "标题", "重定向URL"]
+EXTRA_HEADERS = ["内容长度", "Web服务器", "IP", "CDN", "响应时间"]
+
+def parse_result_line(line):
+    """
+    解析httpx输出的一行探活结果
+    
+    参数:
+        line: httpx输出的一行
+    
+    返回:
+        记录[url, 状态码, 标题, (重定向URL)]，空行或无法提取URL时返回None
+    """
+    # httpx -json 模式的输出每行是一个JSON对象，JSON解析器会忽略首尾空白
+    if line[:1] == '{':
+        return parse_json_result_line(line)
+    
+    line = line.strip()
+    if not line:
+        return None
+    if line[0] == '{':
+        return parse_json_result_line(line)
+    
+    # 删除所有ANSI转义序列
+    clean_line = ANSI_ESCAPE_PATTERN.sub('', line)
+    
+    # 提取URL（第一个空格之前的部分）
+    url_match = re.match(r'^(https?://[^\s]+)', clean_line)
+    if not url_match:
+        logger.warning(f"无法提取URL: {line}")
+        return None
+        
+    url = url_match.group(1)
+    
+    # 查找所有方括号内容
+    brackets = re.findall(r'\[(.*?)\]', clean_line)
+    
+    # 初始化变量
+    status_code = ""
+    title = ""
+    redirect_url = ""
+    
+    # 处理各种可能的情况
+    if not brackets:
+        # 完全没有方括号，但仍然有URL，我们可以保留该记录
+        logger.warning(f"没有方括号内容: {url}")
+        status_code = "Unknown"
+        # 标题保持为空
+    elif len(brackets) == 1:
+        # 只有一个方括号，通常是状态码（这是正常情况，只是没有标题）
+        status_code_raw = brackets[0]
+        status_codes = re.findall(r'\d+', status_code_raw)
+        if status_codes:
+            status_code = ','.join(status_codes)
+            # 标题保持为空字符串
+        else:
+            # 如果方括号中没有数字，内容不明确，设置状态码为Unknown，标题保持为空
+            status_code = "Unknown"
+    else:
+        # 正常情况或有更多方括号
+        # 提取状态码（第一个方括号）
+        status_code_raw = brackets[0]
+        
+        # 处理状态码，可能有多个状态码如 "302,200"
+        # 识别状态码中的数字
+        status_codes = re.findall(r'\d+', status_code_raw)
+        if status_codes:
+            # 使用所有状态码，用逗号连接
+            status_code = ','.join(status_codes)
+        else:
+            # 状态码为空，但继续处理
+            logger.warning(f"无法提取状态码: {url} [{status_code_raw}]")
+            status_code = "Unknown"
+        
+        # 提取标题（第二个方括号）
+        title = brackets[1] if len(brackets) > 1 else ""
+        
+        # 提取重定向URL（如果存在的话，第三个方括号）
+        redirect_url = brackets[2] if len(brackets) > 2 else ""
+    
+    # 构建数据记录
+    record = [url, status_code, title]
+    
+    # 如果有重定向URL，添加到记录中
+    if redirect_url:
+        record.append(redirect_url)
+    
+    return record
+
+def parse_json_result_line(line):
+    """
+    解析httpx -json输出的一行探活结果
+    
+    参数:
+        line: httpx输出的一行JSON
+    
+    返回:
+        记录[url, 状态码, 标题, 重定向URL, 内容长度, Web服务器, IP, CDN, 响应时间]，
+        无法解析或探测失败时返回None
+    """
+    try:
+        result = json_loads(line)
+    except ValueError:
+        logger.warning(f"无法解析JSON结果: {line.strip()}")
+        return None
+    
+    if not isinstance(result, dict):
+        return None
+    get = result.get
+    url = get("url")
+    if not url or get("failed"):
+        return None
+    
+    # 跟随重定向时使用完整的状态码链，与文本输出中的"302,200"一致
+    chain = get("chain_status_codes")
+    if chain:
+        status_code = ','.join(str(code) for code in chain)
+    elif get("status_code") is not None:
+        status_code = str(get("status_code"))
+    else:
+        status_code = "Unknown"
+    
+    final_url = get("final_url") or ""
+    redirect_url = final_url if final_url != url else ""
+    
+    # 解析到的IP地址，优先使用A记录
+    addresses = get("a") or []
+    ip = addresses[0] if addresses else get("host", "")
+    
+    cdn = get("cdn_name") or ("yes" if get("cdn") else "")
+    content_length = get("content_length")
+    
+    return [
+        url,
+        status_code,
+        get("title") or "",
+        redirect_url,
+        "" if content_length is None else str(content_length),
+        get("webserver") or "",
+        ip,
+        cdn,
+        get("time") or ""
+    ]
+
+def parse_result_host(line):
+    """
+    从httpx输出的一行中取出对应的输入主机名，用于断点续探时判断哪些主机已完成
+    
+    参数:
+        line: httpx输出的一行
+    
+    返回:
+        主机名，无法识别时返回None
+    """
+    line = line.strip()
+    if not line:
+        return None
+    
+    if line[0] == '{':
+        try:
+            result = json_loads(line)
+        except ValueError:
+            return None
+        if not isinstance(result, dict):
+            return None
+        # JSON输出中的input字段就是输入的主机名
+        if result.get("input"):
+            return result["input"]
+        url = result.get("url")
+    else:
+        url_match = re.match(r'^(https?://[^\s\[]+)', ANSI_ESCAPE_PATTERN.sub('', line))
+        url = url_match.group(1) if url_match else None
+    
+    return urlsplit(url).netloc if url else None
+
+def parse_failed_host(line):
+    """
+    从httpx -json -probe输出的探测失败记录中取出输入的主机名
+    
+    参数:
+        line: httpx输出的一行
+    
+    返回:
+        主机名，不是探测失败的记录时返回None
+    """
+    line = line.strip()
+    if not line or line[0] != '{':
+        return None
+    try:
+        result = json_loads(line)
+    except ValueError:
+        return None
+    if not isinstance(result, dict) or not result.get("failed"):
+        return None
+    return result.get("input") or None
+
+def result_headers(records):
+    """
+    根据记录的列数确定输出CSV的表头
+    """
+    width = max((len(record) for record in records), default=3)
+    if width > len(RESULT_HEADERS):
+        return RESULT_HEADERS + EXTRA_HEADERS
+    return RESULT_HEADERS[:max(width, 3)]
+
+def merge_history(data, history_file, failed_hosts=(), reused_file=None):
+    """
+    将本次探活结果写入历史库，并补充复用历史结果的主机的记录
+    
+    参数:
+        data: 本次处理得到的记录列表
+        history_file: 历史库文件路径
+        failed_hosts: 本次明确探测失败的主机
+        reused_file: 复用历史结果的主机列表文件
+    
+    返回:
+        从历史库补充的记录数量
+    """
+    with HostHistory(history_file) as history:
+        alive_count, dead_count = history.record_results(data, failed_hosts)
+        logger.info(f"探活历史: 记录 {alive_count} 个存活主机，{dead_count} 个未存活主机")
+        
+        reused_count = 0
+        if reused_file and os.path.exists(reused_file):
+            for record in history.load_records(reused_file):
+                data.append(record)
+                reused_count += 1
+    
+    logger.info(f"探活历史: 复用 {reused_count} 条历史记录")
+    return reused_count
+
+def process_result_file(input_file, output_file, history_file=None, reused_file=None):
     """
     处理httpx探活结果文件，转换为CSV格式
     
     参数:
         input_file: 输入文件路径，包含探活结果
         output_file: 输出CSV文件路径
+        history_file: 探活历史库文件路径，提供时记录本次结果并补充复用的历史结果
+        reused_file: 复用历史结果的主机列表文件
     
     返回:
         处理的记录数量
     """
     # 存储提取的数据
     data = []
+    # 探测失败的主机，只在记录探活历史时收集
+    failed_hosts = []
     
     try:
         # 打开并读取输入文件
         with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
             for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # 删除所有ANSI转义序列
-                ansi_escape = re.compile(r'\x1b\[(?:\d+;)*\d+m')
-                clean_line = ansi_escape.sub('', line)
-                
-                # 提取URL（第一个空格之前的部分）
-                url_match = re.match(r'^(https?://[^\s]+)', clean_line)
-                if not url_match:
-                    logger.warning(f"无法提取URL: {line}")
-                    continue
-                    
-                url = url_match.group(1)
-                
-                # 查找所有方括号内容
-                brackets = re.findall(r'\[(.*?)\]', clean_line)
-                
-                # 初始化变量
-                status_code = ""
-                title = ""
-                redirect_url = ""
-                
-                # 处理各种可能的情况
-                if not brackets:
-                    # 完全没有方括号，但仍然有URL，我们可以保留该记录
-                    logger.warning(f"没有方括号内容: {url}")
-                    status_code = "Unknown"
-                    # 标题保持为空
-                elif len(brackets) == 1:
-                    # 只有一个方括号，通常是状态码（这是正常情况，只是没有标题）
-                    status_code_raw = brackets[0]
-                    status_codes = re.findall(r'\d+', status_code_raw)
-                    if status_codes:
-                        status_code = ','.join(status_codes)
-                        # 标题保持为空字符串
-                    else:
-                        # 如果方括号中没有数字，内容不明确，设置状态码为Unknown，标题保持为空
-                        status_code = "Unknown"
-                else:
-                    # 正常情况或有更多方括号
-                    # 提取状态码（第一个方括号）
-                    status_code_raw = brackets[0]
-                    
-                    # 处理状态码，可能有多个状态码如 "302,200"
-                    # 识别状态码中的数字
-                    status_codes = re.findall(r'\d+', status_code_raw)
-                    if status_codes:
-                        # 使用所有状态码，用逗号连接
-                        status_code = ','.join(status_codes)
-                    else:
-                        # 状态码为空，但继续处理
-                        logger.warning(f"无法提取状态码: {url} [{status_code_raw}]")
-                        status_code = "Unknown"
-                    
-                    # 提取标题（第二个方括号）
-                    title = brackets[1] if len(brackets) > 1 else ""
-                    
-                    # 提取重定向URL（如果存在的话，第三个方括号）
-                    redirect_url = brackets[2] if len(brackets) > 2 else ""
-                
-                # 构建数据记录
-                record = [url, status_code, title]
-                
-                # 如果有重定向URL，添加到记录中
-                if redirect_url:
-                    record.append(redirect_url)
-                
-                data.append(record)
+                record = parse_result_line(line)
+                if record is not None:
+                    data.append(record)
+                elif history_file:
+                    host = parse_failed_host(line)
+                    if host:
+                        failed_hosts.append(host)
+        
+        if history_file:
+            merge_history(data, history_file, failed_hosts, reused_file)
         
         # 确保输出目录存在
         output_dir = os.path.dirname(output_file)
@@ -111,9 +305,7 @@ def process_result_file(input_file, output_file):
             writer = csv.writer(f)
             
             # 构建表头
-            headers = ["url", "状态码", "标题"]
-            if any(len(record) > 3 for record in data):
-                headers.append("重定向URL")
+            headers = result_headers(data)
                 
             # 写入表头
             writer.writerow(headers)
@@ -127,13 +319,16 @@ def process_result_file(input_file, output_file):
         logger.error(f"处理结果文件出错: {e}")
         return 0
 
-def main(input_file="result.txt", output_file="result_processed.csv"):
+def main(input_file="result.txt", output_file="result_processed.csv", history_file=None,
+         reused_file=None):
     """
     主函数
     
     参数:
         input_file: 输入文件路径，默认为result.txt
         output_file: 输出文件路径，默认为result_processed.csv
+        history_file: 探活历史库文件路径，默认为None（不使用历史）
+        reused_file: 复用历史结果的主机列表文件
     """
     # 获取当前脚本所在目录
     script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -143,7 +338,7 @@ def main(input_file="result.txt", output_file="result_processed.csv"):
     output_file_path = os.path.join(script_dir, output_file)
     
     # 处理结果文件
-    count = process_result_file(input_file_path, output_file_path)
+    count = process_result_file(input_file_path, output_file_path, history_file, reused_file)
     
     logger.info(f"处理完成！共转换 {count} 条记录，已保存至 {output_file_path}")
     print(f"处理完成！共转换 {count} 条记录，已保存至 {output_file_path}")
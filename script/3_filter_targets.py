@@ -13,6 +13,88 @@ from pathlib import Path
 # 获取logger
 logger = logging.getLogger("subdatarefine.filter")
 
+def build_filter_predicate(filter_config):
+    """
+    根据配置生成筛选判断函数
+    
+    参数:
+        filter_config: 过滤配置字典
+        
+    返回:
+        判断函数predicate(url, status, title, redirect)，满足条件时返回输出行，否则返回None
+    """
+    # 解析过滤条件
+    status_codes = [code.strip() for code in filter_config.get("status_codes", "").split(",") if code.strip()]
+    title_keywords = [keyword.strip() for keyword in filter_config.get("title_keywords", "").split(",") if keyword.strip()]
+    logic_and = filter_config.get("logic_and", True)
+    include_redirect = filter_config.get("include_redirect", True)
+    
+    def predicate(url, status, title, redirect):
+        # 应用过滤条件
+        status_match = not status_codes or any(code in status for code in status_codes)
+        title_match = not title_keywords or any(keyword.lower() in title.lower() for keyword in title_keywords)
+        
+        # 基于逻辑条件决定是否保留：与逻辑需要同时满足状态码和标题条件，或逻辑满足任一条件即可
+        if (status_match and title_match) if logic_and else (status_match or title_match):
+            filtered_row = [url, status, title]
+            if include_redirect and redirect:
+                filtered_row.append(redirect)
+            return filtered_row
+        return None
+    
+    return predicate
+
+class StreamingFilter:
+    """
+    边探活边筛选：逐条接收处理后的探活记录，满足条件的立即追加到输出CSV
+    """
+    
+    def __init__(self, output_file, filter_config):
+        """
+        参数:
+            output_file: 输出CSV文件路径
+            filter_config: 过滤配置字典
+        """
+        self.predicate = build_filter_predicate(filter_config)
+        self.total_count = 0
+        self.match_count = 0
+        
+        # 确保输出目录存在
+        output_dir = os.path.dirname(output_file)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+        
+        # 此时还不知道是否会出现重定向URL，启用时总是写出该列
+        self.file = open(output_file, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        headers = ["url", "状态码", "标题"]
+        if filter_config.get("include_redirect", True):
+            headers.append("重定向URL")
+        self.writer.writerow(headers)
+        self.file.flush()
+    
+    def add(self, record):
+        """
+        筛选一条记录[url, 状态码, 标题, (重定向URL)]
+        
+        返回:
+            满足条件时返回True
+        """
+        self.total_count += 1
+        redirect = record[3] if len(record) > 3 else ""
+        filtered_row = self.predicate(record[0], record[1], record[2], redirect)
+        if filtered_row is None:
+            return False
+        
+        self.writer.writerow(filtered_row)
+        # 每条命中立即落盘，探活过程中即可查看
+        self.file.flush()
+        self.match_count += 1
+        return True
+    
+    def close(self):
+        self.file.close()
+
 def filter_results(input_file, output_file, filter_config):
     """
     根据配置筛选数据
@@ -29,9 +111,7 @@ def filter_results(input_file, output_file, filter_config):
     total_count = 0
     
     # 解析过滤条件
-    status_codes = [code.strip() for code in filter_config.get("status_codes", "").split(",") if code.strip()]
-    title_keywords = [keyword.strip() for keyword in filter_config.get("title_keywords", "").split(",") if keyword.strip()]
-    logic_and = filter_config.get("logic_and", True)
+    predicate = build_filter_predicate(filter_config)
     include_redirect = filter_config.get("include_redirect", True)
     
     try:
@@ -61,24 +141,9 @@ def filter_results(input_file, output_file, filter_config):
                 redirect = row[redirect_idx] if redirect_idx >= 0 and redirect_idx < len(row) else ""
                 
                 # 应用过滤条件
-                status_match = not status_codes or any(code in status for code in status_codes)
-                title_match = not title_keywords or any(keyword.lower() in title.lower() for keyword in title_keywords)
-                
-                # 基于逻辑条件决定是否保留
-                if logic_and:
-                    # 如果逻辑为"与"，需要同时满足状态码和标题条件
-                    if status_match and title_match:
-                        filtered_row = [url, status, title]
-                        if include_redirect and redirect:
-                            filtered_row.append(redirect)
-                        filtered_data.append(filtered_row)
-                else:
-                    # 如果逻辑为"或"，满足任一条件即可
-                    if status_match or title_match:
-                        filtered_row = [url, status, title]
-                        if include_redirect and redirect:
-                            filtered_row.append(redirect)
-                        filtered_data.append(filtered_row)
+                filtered_row = predicate(url, status, title, redirect)
+                if filtered_row is not None:
+                    filtered_data.append(filtered_row)
         
         # 确保输出目录存在
         output_dir = os.path.dirname(output_file)
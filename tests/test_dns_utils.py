@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DNS预解析测试
+
+在本地启动一个UDP的DNS桩服务，校验域名不存在的主机被去掉、命中泛解析的主机被合并。
+
+用法:
+    python -m pytest tests/test_dns_utils.py
+"""
+
+import os
+import sys
+import csv
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from utils.config_utils import get_dns_config
+from utils.dns_utils import resolve_hosts_file
+
+# 桩服务的记录：*.wild.test为泛解析，ok.test下只有这些主机，其余名称均不存在
+WILDCARD_SUFFIX = ".wild.test"
+WILDCARD_IP = "9.9.9.9"
+RECORDS = {"www.ok.test": "1.2.3.4", "api.ok.test": "1.2.3.5"}
+
+SOA_RECORD = b'\xc0\x0c' + struct.pack('>HHIH', 6, 1, 900, 22) + b'\x00\x00' + struct.pack('>IIIII', 1, 2, 3, 4, 60)
+
+def parse_question(data):
+    labels = []
+    offset = 12
+    while data[offset]:
+        labels.append(data[offset + 1:offset + 1 + data[offset]].decode("ascii"))
+        offset += data[offset] + 1
+    qtype = struct.unpack('>H', data[offset + 1:offset + 3])[0]
+    return ".".join(labels).lower(), qtype, data[12:offset + 5]
+
+def build_answer(data):
+    name, qtype, question = parse_question(data)
+    ip = WILDCARD_IP if name.endswith(WILDCARD_SUFFIX) else RECORDS.get(name)
+    if ip is None:
+        # NXDOMAIN，附带SOA记录
+        return data[:2] + struct.pack('>HHHHH', 0x8183, 1, 0, 1, 0) + question + SOA_RECORD
+    if qtype != 1:
+        # 只有A记录，AAAA查询返回NODATA
+        return data[:2] + struct.pack('>HHHHH', 0x8180, 1, 0, 1, 0) + question + SOA_RECORD
+    answer = b'\xc0\x0c' + struct.pack('>HHIH', 1, 1, 60, 4) + socket.inet_aton(ip)
+    return data[:2] + struct.pack('>HHHHH', 0x8180, 1, 1, 0, 0) + question + answer
+
+class StubDnsServer:
+    """
+    在后台线程中运行的UDP的DNS桩服务
+    """
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.running = True
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            self.sock.sendto(build_answer(data), addr)
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.sock.close()
+
+class ResolveHostsFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubDnsServer()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dns_config = get_dns_config(None)
+        self.dns_config.update({"resolvers": f"127.0.0.1:{self.server.port}", "timeout": 1, "retries": 1})
+
+    def tearDown(self):
+        self.server.close()
+        self.temp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def resolve(self, hosts, wildcard=False):
+        with open(self.path("hosts.txt"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(hosts) + "\n")
+        self.dns_config["wildcard"] = wildcard
+        counts = resolve_hosts_file(self.dns_config, self.path("hosts.txt"), self.path("resolved.txt"),
+                                    self.path("records.txt"),
+                                    self.path("wildcard.csv") if wildcard else None)
+        with open(self.path("resolved.txt"), 'r', encoding='utf-8') as f:
+            return counts, f.read().split()
+
+    def test_nxdomain_dropped(self):
+        counts, resolved = self.resolve(["www.ok.test", "nx.ok.test", "api.ok.test:8080", "missing.ok.test:443"])
+        self.assertEqual(resolved, ["www.ok.test", "api.ok.test:8080"])
+        self.assertEqual(counts["nxdomain"], 2)
+        self.assertEqual(counts["resolved"], 2)
+        with open(self.path("records.txt"), 'r', encoding='utf-8') as f:
+            self.assertIn("www.ok.test\t1.2.3.4", f.read().splitlines())
+
+    def test_wildcard_collapse(self):
+        hosts = ["www.ok.test", "a.wild.test", "b.wild.test", "b.wild.test:8080", "c.wild.test", "nx.ok.test"]
+        counts, resolved = self.resolve(hosts, wildcard=True)
+        # 同一泛解析域名、同一端口下只保留第一个主机，不同端口分别保留
+        self.assertEqual(resolved, ["www.ok.test", "a.wild.test", "b.wild.test:8080"])
+        self.assertEqual(counts["wildcard"], 2)
+        self.assertEqual(counts["nxdomain"], 1)
+        with open(self.path("wildcard.csv"), 'r', encoding='utf-8') as f:
+            rows = list(csv.reader(f))[1:]
+        self.assertEqual([row[0] for row in rows], ["b.wild.test", "c.wild.test"])
+        self.assertTrue(all(row[2] == "a.wild.test" for row in rows))
+
+    def test_wildcard_disabled(self):
+        counts, resolved = self.resolve(["a.wild.test", "b.wild.test"])
+        self.assertEqual(resolved, ["a.wild.test", "b.wild.test"])
+        self.assertEqual(counts["wildcard"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
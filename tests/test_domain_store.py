@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑域名存储测试
+
+校验跨数据段去重后的数量和遍历顺序，以及取数量时不改变数据段。
+
+用法:
+    python -m pytest tests/test_domain_store.py
+"""
+
+import os
+import sys
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from utils.domain_store import DomainStore
+
+class DomainStoreTest(unittest.TestCase):
+    def test_len_counts_duplicates_across_runs_once(self):
+        store = DomainStore(["b.com", "a.com"])
+        store.flush()
+        store.update(["c.com", "a.com"])
+        store.flush()
+        store.update(["d.com", "b.com"])
+
+        runs = list(store.runs)
+        self.assertEqual(len(store), 4)
+        # 取数量不会合并数据段或清空缓冲区
+        self.assertEqual(store.runs, runs)
+        self.assertEqual(store.pending, {"d.com", "b.com"})
+        self.assertEqual(list(store), ["a.com", "b.com", "c.com", "d.com"])
+
+    def test_len_without_runs(self):
+        store = DomainStore()
+        self.assertEqual(len(store), 0)
+        store.add("a.com")
+        store.add("a.com")
+        self.assertEqual(len(store), 1)
+        store.flush()
+        self.assertEqual(len(store), 1)
+        self.assertIn("a.com", store)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+探活历史测试
+
+校验历史结果的有效期和过期删除，以及只有明确探测失败的主机才记为未存活。
+
+用法:
+    python -m pytest tests/test_history_utils.py
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import unittest
+import importlib.util
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from utils.history_utils import HostHistory
+
+def load_process_script():
+    spec = importlib.util.spec_from_file_location(
+        "httpx_process", os.path.join(ROOT_DIR, "script", "2_httpx_process.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def write_lines(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("".join(line + "\n" for line in lines))
+
+def read_lines(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+class HostHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp.name, "history.db")
+        self.history = HostHistory(self.db_file)
+
+    def tearDown(self):
+        self.history.close()
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def age(self, host, hours):
+        """将主机的探测时间改为若干小时之前"""
+        with self.history.conn:
+            self.history.conn.execute("UPDATE hosts SET probed_at = ? WHERE host = ?",
+                                      (time.time() - hours * 3600, host))
+
+    def partition(self, hosts, reprobe_after):
+        write_lines(self.path("hosts.txt"), hosts)
+        counts = self.history.partition_hosts(self.path("hosts.txt"), self.path("probe.txt"),
+                                              self.path("reused.txt"), reprobe_after)
+        return counts, read_lines(self.path("probe.txt")), read_lines(self.path("reused.txt"))
+
+    def test_fresh_results_reused_until_expired(self):
+        self.history.record_results([["https://a.example.com", "200", "A"]], ["b.example.com"])
+        self.age("a.example.com", 30)
+
+        counts, probe, reused = self.partition(["A.example.com:443", "b.example.com", "c.example.com"], 24)
+        self.assertEqual(counts, (2, 1))
+        self.assertEqual(probe, ["A.example.com:443", "c.example.com"])
+        self.assertEqual(reused, ["b.example.com"])
+
+    def test_reprobe_after_zero_probes_everything(self):
+        self.history.record_results([["https://a.example.com", "200", "A"]])
+        counts, probe, reused = self.partition(["a.example.com"], 0)
+        self.assertEqual(counts, (1, 0))
+        self.assertEqual(reused, [])
+
+    def test_evict_removes_only_old_entries(self):
+        self.history.record_results([["https://a.example.com", "200", "A"],
+                                     ["http://b.example.com:8080", "200", "B"]])
+        self.age("a.example.com", 800)
+
+        self.assertEqual(self.history.evict(0), 0)
+        self.assertEqual(self.history.evict(720), 1)
+        hosts = [row[0] for row in self.history.conn.execute("SELECT host FROM hosts")]
+        self.assertEqual(hosts, ["b.example.com:8080"])
+
+    def test_only_failed_hosts_recorded_as_dead(self):
+        alive, dead = self.history.record_results(
+            [["https://a.example.com", "200", "A"]], ["a.example.com", "b.example.com"])
+        self.assertEqual((alive, dead), (1, 1))
+
+        rows = dict(self.history.conn.execute("SELECT host, alive FROM hosts"))
+        self.assertEqual(rows, {"a.example.com": 1, "b.example.com": 0})
+
+        write_lines(self.path("reused.txt"), ["a.example.com", "b.example.com"])
+        records = list(self.history.load_records(self.path("reused.txt")))
+        self.assertEqual(records, [["https://a.example.com", "200", "A"]])
+
+class ProcessHistoryTest(unittest.TestCase):
+    def test_unprobed_hosts_not_stored(self):
+        """httpx中途退出时没有结果的主机不写入历史库"""
+        process_script = load_process_script()
+        with tempfile.TemporaryDirectory() as tmp:
+            result_file = os.path.join(tmp, "result.txt")
+            db_file = os.path.join(tmp, "history.db")
+            write_lines(result_file, [
+                json.dumps({"input": "a.example.com", "url": "https://a.example.com", "status_code": 200}),
+                json.dumps({"input": "b.example.com", "error": "connection refused", "failed": True}),
+            ])
+
+            count = process_script.process_result_file(result_file, os.path.join(tmp, "out.csv"), db_file)
+            self.assertEqual(count, 1)
+
+            with HostHistory(db_file) as history:
+                rows = dict(history.conn.execute("SELECT host, alive FROM hosts"))
+            self.assertEqual(rows, {"a.example.com": 1, "b.example.com": 0})
+
+if __name__ == "__main__":
+    unittest.main()
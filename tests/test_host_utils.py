@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+主机名规范化测试
+
+校验等价的主机名（大小写、末尾的点、*.通配前缀、IDN、显式的80端口）规范化后相同。
+
+用法:
+    python -m pytest tests/test_host_utils.py
+"""
+
+import os
+import sys
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from utils.host_utils import canonicalize_host
+
+class CanonicalizeHostTest(unittest.TestCase):
+    def assertCanonical(self, host, expected):
+        self.assertEqual(canonicalize_host(host), expected, host)
+
+    def test_already_canonical(self):
+        for host in ("www.example.com", "example.com:8080", "a_b.example.com", "10.0.0.1:8443"):
+            self.assertCanonical(host, host)
+
+    def test_case_and_trailing_dot(self):
+        self.assertCanonical("WWW.Example.COM", "www.example.com")
+        self.assertCanonical("example.com.", "example.com")
+        self.assertCanonical("Example.com.:8080", "example.com:8080")
+
+    def test_wildcard_prefix(self):
+        self.assertCanonical("*.example.com", "example.com")
+        self.assertCanonical("*.*.example.com:8443", "example.com:8443")
+
+    def test_idn(self):
+        self.assertCanonical("例子.测试", "xn--fsqu00a.xn--0zwm56d")
+        self.assertCanonical("Bücher.example", "xn--bcher-kva.example")
+        self.assertCanonical("xn--bcher-kva.example", "xn--bcher-kva.example")
+
+    def test_default_http_port(self):
+        self.assertCanonical("example.com:80", "example.com")
+        self.assertCanonical("Bücher.example:80", "xn--bcher-kva.example")
+        # 443端口是否去除由提取时的strip_443决定，这里保持不变
+        self.assertCanonical("example.com:443", "example.com:443")
+        self.assertCanonical("example.com:8080", "example.com:8080")
+
+    def test_ipv6(self):
+        self.assertCanonical("[2001:DB8::1]:80", "[2001:db8::1]")
+        self.assertCanonical("[2001:db8::1]:8443", "[2001:db8::1]:8443")
+        self.assertCanonical("2001:DB8::1", "2001:db8::1")
+
+    def test_empty_name_kept(self):
+        self.assertCanonical(".", ".")
+
+if __name__ == "__main__":
+    unittest.main()
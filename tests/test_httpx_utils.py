@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+httpx工具测试
+
+校验additional_args按shell的规则拆分为httpx的参数，以及断点续探时根据被中断的
+输出计算剩余的主机。
+
+用法:
+    python -m pytest tests/test_httpx_utils.py
+"""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+import importlib.util
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from utils.httpx_utils import build_httpx_command, compute_remaining_hosts, trim_incomplete_line
+
+def build_args(additional_args):
+    httpx_config = {"httpx_path": "httpx", "additional_args": additional_args}
+    return build_httpx_command(httpx_config, None, None, ROOT_DIR)[1:]
+
+class BuildHttpxCommandTest(unittest.TestCase):
+    def test_flag_and_value(self):
+        self.assertEqual(build_args("-rl 30,-rlm 1500"), ["-rl", "30", "-rlm", "1500"])
+
+    def test_quoted_header(self):
+        self.assertEqual(build_args('-H "X-Foo: bar",-H \'User-Agent: Mozilla/5.0 (X11)\''),
+                         ["-H", "X-Foo: bar", "-H", "User-Agent: Mozilla/5.0 (X11)"])
+
+    def test_several_flags_in_one_entry(self):
+        self.assertEqual(build_args("-fr -td, -probe"), ["-fr", "-td", "-probe"])
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        spec = importlib.util.spec_from_file_location(
+            "httpx_process", os.path.join(ROOT_DIR, "script", "2_httpx_process.py"))
+        self.process_script = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.process_script)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_trim_incomplete_line(self):
+        with open(self.path("result.txt"), 'wb') as f:
+            f.write(b'{"input": "a.com"}\n{"input": "b.c')
+        self.assertEqual(trim_incomplete_line(self.path("result.txt")), len(b'{"input": "b.c'))
+        with open(self.path("result.txt"), 'rb') as f:
+            self.assertEqual(f.read(), b'{"input": "a.com"}\n')
+
+        # 最后一行完整时不做修改
+        self.assertEqual(trim_incomplete_line(self.path("result.txt")), 0)
+        self.assertEqual(trim_incomplete_line(self.path("missing.txt")), 0)
+
+    def test_remaining_hosts_after_truncated_output(self):
+        hosts = ["z.com", "A.com:443", "dead.com", "m.com", "b.com:8080"]
+        with open(self.path("input.txt"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(hosts) + "\n")
+        with open(self.path("result.txt"), 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"input": "A.com:443", "url": "https://a.com", "status_code": 200}) + "\n")
+            f.write(json.dumps({"input": "dead.com", "error": "no address", "failed": True}) + "\n")
+            f.write('{"input": "m.com", "url": "ht')
+
+        trim_incomplete_line(self.path("result.txt"))
+        counts = compute_remaining_hosts(self.path("input.txt"), self.path("result.txt"),
+                                         self.path("remaining.txt"), self.tmp.name,
+                                         self.process_script.parse_result_host)
+        self.assertEqual(counts, (2, 3))
+        with open(self.path("remaining.txt"), 'r', encoding='utf-8') as f:
+            # 剩余的主机保持输入中的顺序
+            self.assertEqual(f.read().split(), ["z.com", "m.com", "b.com:8080"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多端口展开测试
+
+校验同一主机的不同端口交错输出，以及输入中已有的主机和端口组合只输出一次。
+
+用法:
+    python -m pytest tests/test_port_utils.py
+"""
+
+import os
+import sys
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from utils.port_utils import PortExpander, parse_ports
+
+class PortExpanderTest(unittest.TestCase):
+    def setUp(self):
+        self.expander = PortExpander(parse_ports("80,443,8080,8443"))
+
+    def test_ports_interleaved_across_hosts(self):
+        hosts = list(self.expander.expand(["a.com", "b.com", "c.com"], window=2))
+        self.assertEqual(hosts, ["a.com", "b.com", "a.com:8080", "b.com:8080", "a.com:8443", "b.com:8443",
+                                 "c.com", "c.com:8080", "c.com:8443"])
+
+    def test_existing_combinations_output_once(self):
+        hosts = ["a.com", "b.com", "a.com:8080", "c.com:8443", "c.com", "d.com:9000"]
+        expanded = list(self.expander.expand(hosts, window=2))
+        self.assertEqual(len(expanded), len(set(expanded)))
+        self.assertEqual(set(expanded), {
+            "a.com", "a.com:8080", "a.com:8443", "b.com", "b.com:8080", "b.com:8443",
+            "c.com", "c.com:8080", "c.com:8443", "d.com:9000"})
+
+    def test_ipv6_brackets(self):
+        self.assertEqual(list(self.expander.expand(["::1"])), ["::1", "[::1]:8080", "[::1]:8443"])
+
+if __name__ == "__main__":
+    unittest.main()
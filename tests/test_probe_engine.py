@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内置探活引擎测试
+
+在本地启动HTTP服务，校验响应的读取、标题的字符集识别、超时时连接的关闭，
+以及run_probe的输出能被结果处理脚本解析。
+
+用法:
+    python -m pytest tests/test_probe_engine.py
+"""
+
+import os
+import sys
+import json
+import socket
+import asyncio
+import tempfile
+import threading
+import unittest
+import importlib.util
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from utils.probe_engine import ConnectionPool, ProbeEngine, extract_title, fetch, run_probe
+
+GBK_TITLE = "后台管理系统"
+GBK_PAGE = (f'<html><head><meta charset="gbk"><title>{GBK_TITLE}</title></head>'
+            f'<body>登录</body></html>').encode("gbk")
+
+async def serve_gbk(reader, writer):
+    await reader.readuntil(b"\r\n\r\n")
+    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n"
+                 b"Content-Length: " + str(len(GBK_PAGE)).encode() + b"\r\n\r\n" + GBK_PAGE)
+    await writer.drain()
+    writer.close()
+
+class RedirectHandler(BaseHTTPRequestHandler):
+    """根路径重定向到/home，/home返回GBK编码的页面"""
+
+    def do_GET(self):
+        if self.path == "/":
+            self.send_response(302)
+            self.send_header("Location", "/home")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(GBK_PAGE)))
+        self.end_headers()
+        self.wfile.write(GBK_PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+def closed_port():
+    """返回一个没有服务监听的本地端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def load_process_script():
+    spec = importlib.util.spec_from_file_location(
+        "httpx_process", os.path.join(ROOT_DIR, "script", "2_httpx_process.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class ExtractTitleTest(unittest.TestCase):
+
+    def test_meta_charset(self):
+        self.assertEqual(extract_title(GBK_PAGE, {"content-type": "text/html"}), GBK_TITLE)
+
+    def test_header_charset_first(self):
+        body = f"<title>{GBK_TITLE}</title>".encode("utf-8")
+        headers = {"content-type": "text/html; charset=utf-8"}
+        self.assertEqual(extract_title(b'<meta charset="gbk">' + body, headers), GBK_TITLE)
+
+    def test_default_utf8(self):
+        self.assertEqual(extract_title(f"<title> {GBK_TITLE} </title>".encode("utf-8"), {}), GBK_TITLE)
+
+class FetchTest(unittest.TestCase):
+
+    def test_local_server(self):
+        async def run():
+            server = await asyncio.start_server(serve_gbk, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            pool = ConnectionPool()
+            try:
+                response = await fetch(pool, f"http://127.0.0.1:{port}/", 5)
+            finally:
+                pool.close()
+                server.close()
+                await server.wait_closed()
+            return response
+
+        response = asyncio.run(run())
+        self.assertEqual(response.status, 200)
+        self.assertEqual(extract_title(response.body, response.headers), GBK_TITLE)
+
+    def test_timeout_closes_connection(self):
+        async def run():
+            closed = asyncio.Event()
+
+            async def stall(reader, writer):
+                # 读到请求后不响应，直到客户端关闭连接
+                await reader.readuntil(b"\r\n\r\n")
+                await reader.read()
+                closed.set()
+                writer.close()
+
+            server = await asyncio.start_server(stall, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            pool = ConnectionPool()
+            try:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await fetch(pool, f"http://127.0.0.1:{port}/", 0.5)
+                await asyncio.wait_for(closed.wait(), 2)
+            finally:
+                pool.close()
+                server.close()
+                await server.wait_closed()
+
+        asyncio.run(run())
+
+class RunProbeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RedirectHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def test_output_parsed_by_process_script(self):
+        alive = f"127.0.0.1:{self.server.server_address[1]}"
+        refused = f"127.0.0.1:{closed_port()}"
+        input_file = os.path.join(self.tmp.name, "domains.txt")
+        output_file = os.path.join(self.tmp.name, "result.txt")
+        with open(input_file, 'w', encoding='utf-8') as f:
+            f.write(f"{alive}\n{refused}\n")
+
+        httpx_config = {"threads": 4, "timeout": 2, "additional_args": "-probe"}
+        exitcode, _, _ = run_probe(httpx_config, input_file, output_file, no_process=True)
+        self.assertEqual(exitcode, 0)
+
+        process_script = load_process_script()
+        with open(output_file, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        records = {process_script.parse_result_host(line): process_script.parse_result_line(line)
+                   for line in lines}
+        self.assertEqual(set(records), {alive, refused})
+
+        url, status_code, title, redirect_url = records[alive][:4]
+        self.assertEqual(url, f"http://{alive}")
+        self.assertEqual(status_code, "302,200")
+        self.assertEqual(title, GBK_TITLE)
+        self.assertEqual(redirect_url, f"http://{alive}/home")
+
+        # 端口未开放的主机只有一条failed记录，不产生处理后的记录
+        self.assertIsNone(records[refused])
+        self.assertEqual(process_script.parse_failed_host(
+            next(line for line in lines if refused in line)), refused)
+
+class EngineRunTest(unittest.TestCase):
+
+    def test_unexpected_error_emits_failed_record(self):
+        """单个主机的意外错误记为失败，队列满时不会卡住"""
+        engine = ProbeEngine(1, 1, 0, 1, True, emit_failed=True)
+
+        async def probe(target):
+            if target.startswith("bad"):
+                raise RuntimeError("boom")
+            return {"input": target, "url": f"http://{target}", "failed": False}
+
+        engine.probe = probe
+        hosts = [f"bad{i}.test" if i % 3 == 0 else f"ok{i}.test" for i in range(20)]
+        records = []
+        probed, alive = asyncio.run(asyncio.wait_for(engine.run(hosts, records.append), 5))
+
+        self.assertEqual((probed, alive), (20, 13))
+        failed = [record for record in records if record["failed"]]
+        self.assertEqual(len(failed), 7)
+        self.assertEqual(failed[0]["error"], "boom")
+
+if __name__ == "__main__":
+    unittest.main()
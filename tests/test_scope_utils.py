@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+范围过滤测试
+
+校验根域名按完整标签匹配后缀，以及CIDR、正则表达式和排除列表的判断。
+
+用法:
+    python -m pytest tests/test_scope_utils.py
+"""
+
+import os
+import sys
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from utils.scope_utils import ScopeFilter, parse_scope_entries
+
+class ScopeFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.scope = ScopeFilter(["*.example.com", "10.0.0.0/8", "re:^dev-"], ["admin.example.com"])
+
+    def test_suffix_matches_whole_labels(self):
+        for host in ("example.com", "a.example.com", "A.Example.COM.:8443"):
+            self.assertIn(host, self.scope)
+        for host in ("example.com.evil", "example.com.evil:8080", "evilexample.com", "com"):
+            self.assertNotIn(host, self.scope)
+
+    def test_deny_overrides_allow(self):
+        self.assertNotIn("admin.example.com", self.scope)
+        self.assertNotIn("x.admin.example.com:8080", self.scope)
+
+    def test_cidr_and_regex(self):
+        self.assertIn("10.1.2.3:80", self.scope)
+        self.assertNotIn("11.0.0.1", self.scope)
+        self.assertIn("dev-foo.other", self.scope)
+
+    def test_empty_allow_list(self):
+        scope = ScopeFilter(deny=["example.com"])
+        self.assertIn("example.com.evil", scope)
+        self.assertNotIn("www.example.com", scope)
+
+    def test_parse_entries(self):
+        text = "example.com, *.example.org\n10.0.0.0/8\nre:^(a|b),c$"
+        self.assertEqual(parse_scope_entries(text),
+                         ["example.com", "*.example.org", "10.0.0.0/8", "re:^(a|b),c$"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量提取缓存工具模块
+
+在temp目录中维护一份清单，记录每个输入文件的路径、大小、修改时间和内容哈希，
+并为每个文件保存一份已提取的域名列表。文件未变化时直接复用缓存，无需重新解析。
+"""
+
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger("subdatarefine.cache")
+
+# 清单格式版本，格式或提取逻辑变化时递增以使旧缓存失效
+MANIFEST_VERSION = 2
+
+# 计算内容哈希时的读取块大小
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def hash_file(file_path):
+    """
+    计算文件内容的SHA-1哈希
+
+    参数:
+        file_path: 文件路径
+
+    返回:
+        十六进制哈希字符串
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+class ExtractCache:
+    """
+    按文件缓存提取结果的清单
+    """
+
+    def __init__(self, temp_dir, options, manifest_name="extract_manifest.json", cache_dir_name="extract_cache"):
+        """
+        参数:
+            temp_dir: 临时文件目录
+            options: 影响提取结果的选项（如strip_443），与清单中记录的不一致时缓存全部失效
+            manifest_name: 清单文件名
+            cache_dir_name: 域名缓存目录名
+        """
+        self.manifest_file = os.path.join(temp_dir, manifest_name)
+        self.cache_dir = os.path.join(temp_dir, cache_dir_name)
+        self.options = options
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """
+        读取清单文件，版本或选项不一致时丢弃旧清单
+        """
+        if not os.path.exists(self.manifest_file):
+            return
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取增量清单失败，将重新解析所有文件: {e}")
+            return
+
+        if manifest.get("version") != MANIFEST_VERSION or manifest.get("options") != self.options:
+            logger.info("提取选项已变化，增量缓存失效")
+            return
+        self.entries = manifest.get("files", {})
+
+    def save(self):
+        """
+        写出清单文件
+        """
+        os.makedirs(os.path.dirname(self.manifest_file), exist_ok=True)
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "options": self.options,
+            "files": self.entries
+        }
+        temp_file = self.manifest_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(temp_file, self.manifest_file)
+
+    def cache_file(self, entry):
+        """
+        返回清单条目对应的域名缓存文件路径
+        """
+        return os.path.join(self.cache_dir, entry["cache"])
+
+    def lookup(self, name, file_path):
+        """
+        检查文件是否有可用的缓存
+
+        大小和修改时间都未变化时直接命中；否则计算内容哈希，哈希一致时仍视为命中。
+
+        参数:
+            name: 文件在清单中的键（相对路径）
+            file_path: 文件完整路径
+
+        返回:
+            (缓存文件路径, 内容哈希)，未命中时缓存文件路径为None
+        """
+        stat = os.stat(file_path)
+        entry = self.entries.get(name)
+        if entry and os.path.exists(self.cache_file(entry)):
+            if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+                return self.cache_file(entry), entry["hash"]
+
+        content_hash = hash_file(file_path)
+        if entry and entry["hash"] == content_hash and os.path.exists(self.cache_file(entry)):
+            # 内容未变，只更新修改时间
+            entry["size"] = stat.st_size
+            entry["mtime"] = stat.st_mtime_ns
+            return self.cache_file(entry), content_hash
+        return None, content_hash
+
+    def store(self, name, file_path, content_hash, domains):
+        """
+        保存文件的提取结果并更新清单条目
+
+        参数:
+            name: 文件在清单中的键（相对路径）
+            file_path: 文件完整路径
+            content_hash: 文件内容哈希
+            domains: 提取的域名集合
+
+        返回:
+            缓存文件路径
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        stat = os.stat(file_path)
+        entry = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": content_hash,
+            "cache": hashlib.sha1(name.encode('utf-8')).hexdigest() + ".txt"
+        }
+        with open(self.cache_file(entry), 'w', encoding='utf-8', newline='\n') as f:
+            for domain in sorted(domains):
+                f.write(domain + '\n')
+        self.entries[name] = entry
+        return self.cache_file(entry)
+
+    def prune(self, names):
+        """
+        删除不在names中的文件条目及其缓存，即已从输入目录删除的文件
+
+        参数:
+            names: 当前存在的文件键集合
+
+        返回:
+            删除的条目数量
+        """
+        removed = [name for name in self.entries if name not in names]
+        for name in removed:
+            entry = self.entries.pop(name)
+            try:
+                os.remove(self.cache_file(entry))
+            except OSError:
+                pass
+        return len(removed)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压缩文件工具模块
+
+按文件头的魔数识别gzip、bz2、xz和zip格式，以流的方式解压，不落盘。
+解压在后台线程中进行（zlib/bz2/lzma解压时会释放GIL），与解析同时进行。
+"""
+
+import io
+import os
+import bz2
+import gzip
+import lzma
+import queue
+import zipfile
+import threading
+
+# 魔数与压缩格式的对应关系
+COMPRESSION_MAGIC = [
+    (b'\x1f\x8b', "gzip"),
+    (b'BZh', "bz2"),
+    (b'\xfd7zXZ\x00', "xz"),
+    (b'PK\x03\x04', "zip"),
+]
+
+# 各压缩格式常见的文件扩展名，用于推断压缩包内文件的原始名称
+COMPRESSION_SUFFIXES = {
+    "gzip": (".gz", ".gzip", ".tgz"),
+    "bz2": (".bz2", ".bz"),
+    "xz": (".xz", ".lzma"),
+}
+
+# 后台解压每次读取的字节数和最多缓存的块数
+DECOMPRESS_CHUNK_SIZE = 1024 * 1024
+DECOMPRESS_QUEUE_SIZE = 8
+
+def detect_compression(file_path=None, head=None):
+    """
+    根据文件头的魔数识别压缩格式
+
+    参数:
+        file_path: 文件路径，未提供head时从文件中读取文件头
+        head: 文件开头的若干字节
+
+    返回:
+        压缩格式名称（gzip/bz2/xz/zip），不是压缩文件时返回None
+    """
+    if head is None:
+        with open(file_path, 'rb') as f:
+            head = f.read(8)
+    for magic, kind in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+def strip_compression_suffix(filename, kind):
+    """
+    去除压缩扩展名，得到压缩前的文件名，如 domains.csv.gz -> domains.csv
+    """
+    for suffix in COMPRESSION_SUFFIXES.get(kind, ()):
+        if filename.lower().endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+class BackgroundReader(io.RawIOBase):
+    """
+    在后台线程中读取（解压）数据流，通过有界队列交给调用方
+
+    队列满时后台线程阻塞，内存占用不超过DECOMPRESS_QUEUE_SIZE个块。
+    """
+
+    def __init__(self, stream, chunk_size=DECOMPRESS_CHUNK_SIZE, queue_size=DECOMPRESS_QUEUE_SIZE):
+        """
+        参数:
+            stream: 要读取的二进制流，如gzip.open返回的文件对象
+            chunk_size: 每次读取的字节数
+            queue_size: 最多缓存的块数
+        """
+        super().__init__()
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.chunks = queue.Queue(maxsize=queue_size)
+        self.buffer = b''
+        self.finished = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._produce, daemon=True)
+        self.thread.start()
+
+    def _produce(self):
+        try:
+            while not self.stopped.is_set():
+                chunk = self.stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                self.chunks.put(chunk)
+            self.chunks.put(None)
+        except Exception as e:
+            # 解压出错时把异常交给读取方抛出
+            self.chunks.put(e)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.buffer:
+            if self.finished:
+                return 0
+            chunk = self.chunks.get()
+            if chunk is None:
+                self.finished = True
+                return 0
+            if isinstance(chunk, Exception):
+                self.finished = True
+                raise chunk
+            self.buffer = chunk
+
+        size = min(len(b), len(self.buffer))
+        b[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            # 通知后台线程停止，并清空队列使其不会阻塞在put上
+            self.stopped.set()
+            while self.thread.is_alive():
+                try:
+                    self.chunks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self.stream.close()
+        super().close()
+
+def open_compressed_members(file_path, kind):
+    """
+    打开压缩文件中的各个文件
+
+    参数:
+        file_path: 压缩文件路径
+        kind: detect_compression返回的压缩格式
+
+    返回:
+        (压缩前的文件名, 二进制流)的生成器，流由后台线程解压
+    """
+    filename = os.path.basename(file_path)
+    if kind == "zip":
+        with zipfile.ZipFile(file_path) as archive:
+            for member in archive.infolist():
+                if member.is_dir():
+                    continue
+                with BackgroundReader(archive.open(member)) as reader:
+                    yield member.filename, io.BufferedReader(reader)
+        return
+
+    if kind == "gzip":
+        stream = gzip.open(file_path, 'rb')
+    elif kind == "bz2":
+        stream = bz2.open(file_path, 'rb')
+    elif kind == "xz":
+        stream = lzma.open(file_path, 'rb')
+    else:
+        raise ValueError(f"不支持的压缩格式: {kind}")
+
+    with BackgroundReader(stream) as reader:
+        yield strip_compression_suffix(filename, kind), io.BufferedReader(reader)
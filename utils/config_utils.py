@@ -47,28 +47,48 @@ def get_domain_extract_config(config):
     返回:
         包含域名提取配置的字典
     """
-    if not config:
-        return {
-            "strip_443": True,
-            "output_file": "domains.txt"
-        }
+    # 默认配置
+    default_config = {
+        "strip_443": True,
+        "output_file": "domains.txt",
+        "workers": 1,
+        "chunk_size_mb": 64,
+        "max_memory_mb": 0,
+        "incremental": False,
+        "canonicalize": True,
+        "order": "sorted",
+        "psl_file": ""
+    }
     
-    result = {}
+    # 如果配置对象为空或不包含domain_extract部分，直接返回默认配置
+    if not config or not config.has_section("domain_extract"):
+        return default_config.copy()
     
-    # 域名提取配置
-    if config.has_section("domain_extract"):
-        if config.has_option("domain_extract", "strip_443"):
-            result["strip_443"] = config.getboolean("domain_extract", "strip_443")
-        else:
-            result["strip_443"] = True
-            
-        if config.has_option("domain_extract", "output_file"):
-            result["output_file"] = config.get("domain_extract", "output_file")
-        else:
-            result["output_file"] = "domains.txt"
-    else:
-        result["strip_443"] = True
-        result["output_file"] = "domains.txt"
+    # 配置项类型映射
+    config_types = {
+        "strip_443": "bool",
+        "output_file": "str",
+        "workers": "int",
+        "chunk_size_mb": "int",
+        "max_memory_mb": "int",
+        "incremental": "bool",
+        "canonicalize": "bool",
+        "order": "str",
+        "psl_file": "str"
+    }
+    
+    # 创建结果字典，初始值为默认配置
+    result = default_config.copy()
+    
+    # 从配置对象中读取值，覆盖默认值
+    for key, type_info in config_types.items():
+        if config.has_option("domain_extract", key):
+            if type_info == "str":
+                result[key] = config.get("domain_extract", key)
+            elif type_info == "int":
+                result[key] = config.getint("domain_extract", key)
+            elif type_info == "bool":
+                result[key] = config.getboolean("domain_extract", key)
         
     return result
 
@@ -122,6 +142,233 @@ def get_domain_extract_config(config):
     
     return result
 
+def get_scope_config(config):
+    """
+    获取测试范围相关配置
+    
+    参数:
+        config: 配置对象
+        
+    返回:
+        包含范围配置的字典
+    """
+    # 默认配置，不限制范围
+    default_config = {
+        "allow": "",
+        "deny": ""
+    }
+    
+    # 如果配置对象为空或不包含scope部分，直接返回默认配置
+    if not config or not config.has_section("scope"):
+        return default_config.copy()
+    
+    # 配置项类型映射
+    config_types = {
+        "allow": "str",
+        "deny": "str"
+    }
+    
+    # 创建结果字典，初始值为默认配置
+    result = default_config.copy()
+    
+    # 从配置对象中读取值，覆盖默认值
+    for key, type_info in config_types.items():
+        if config.has_option("scope", key):
+            if type_info == "str":
+                result[key] = config.get("scope", key)
+            elif type_info == "int":
+                result[key] = config.getint("scope", key)
+            elif type_info == "bool":
+                result[key] = config.getboolean("scope", key)
+    
+    return result
+
+def get_history_config(config):
+    """
+    获取探活历史相关配置
+    
+    参数:
+        config: 配置对象
+        
+    返回:
+        包含探活历史配置的字典
+    """
+    # 默认配置
+    default_config = {
+        "enabled": False,
+        "db_file": "history.db",
+        "reprobe_after": 24,
+        "evict_after": 720
+    }
+    
+    # 如果配置对象为空或不包含history部分，直接返回默认配置
+    if not config or not config.has_section("history"):
+        return default_config.copy()
+    
+    # 配置项类型映射
+    config_types = {
+        "enabled": "bool",
+        "db_file": "str",
+        "reprobe_after": "int",
+        "evict_after": "int"
+    }
+    
+    # 创建结果字典，初始值为默认配置
+    result = default_config.copy()
+    
+    # 从配置对象中读取值，覆盖默认值
+    for key, type_info in config_types.items():
+        if config.has_option("history", key):
+            if type_info == "str":
+                result[key] = config.get("history", key)
+            elif type_info == "int":
+                result[key] = config.getint("history", key)
+            elif type_info == "bool":
+                result[key] = config.getboolean("history", key)
+    
+    return result
+
+def get_probe_config(config):
+    """
+    获取多端口探测相关配置
+    
+    参数:
+        config: 配置对象
+        
+    返回:
+        包含多端口探测配置的字典
+    """
+    # 默认配置
+    default_config = {
+        "ports": ""
+    }
+    
+    # 如果配置对象为空或不包含probe部分，直接返回默认配置
+    if not config or not config.has_section("probe"):
+        return default_config.copy()
+    
+    # 配置项类型映射
+    config_types = {
+        "ports": "str"
+    }
+    
+    # 创建结果字典，初始值为默认配置
+    result = default_config.copy()
+    
+    # 从配置对象中读取值，覆盖默认值
+    for key, type_info in config_types.items():
+        if config.has_option("probe", key):
+            if type_info == "str":
+                result[key] = config.get("probe", key)
+            elif type_info == "int":
+                result[key] = config.getint("probe", key)
+            elif type_info == "bool":
+                result[key] = config.getboolean("probe", key)
+    
+    return result
+
+def get_dns_config(config):
+    """
+    获取DNS预解析相关配置
+    
+    参数:
+        config: 配置对象
+        
+    返回:
+        包含DNS预解析配置的字典
+    """
+    # 默认配置
+    default_config = {
+        "enabled": False,
+        "resolvers": "223.5.5.5,119.29.29.29",
+        "concurrency": 200,
+        "timeout": 2,
+        "retries": 2,
+        "records_file": "dns_records.txt",
+        "wildcard": False,
+        "wildcard_probes": 3,
+        "wildcard_file": "wildcard_collapsed.csv"
+    }
+    
+    # 如果配置对象为空或不包含dns部分，直接返回默认配置
+    if not config or not config.has_section("dns"):
+        return default_config.copy()
+    
+    # 配置项类型映射
+    config_types = {
+        "enabled": "bool",
+        "resolvers": "str",
+        "concurrency": "int",
+        "timeout": "int",
+        "retries": "int",
+        "records_file": "str",
+        "wildcard": "bool",
+        "wildcard_probes": "int",
+        "wildcard_file": "str"
+    }
+    
+    # 创建结果字典，初始值为默认配置
+    result = default_config.copy()
+    
+    # 从配置对象中读取值，覆盖默认值
+    for key, type_info in config_types.items():
+        if config.has_option("dns", key):
+            if type_info == "str":
+                result[key] = config.get("dns", key)
+            elif type_info == "int":
+                result[key] = config.getint("dns", key)
+            elif type_info == "bool":
+                result[key] = config.getboolean("dns", key)
+    
+    return result
+
+def get_priority_config(config):
+    """
+    获取探活优先级相关配置
+    
+    参数:
+        config: 配置对象
+        
+    返回:
+        包含探活优先级配置的字典
+    """
+    # 默认配置
+    default_config = {
+        "enabled": False,
+        "keywords": "admin:20,oa:15,vpn:15,sso:15,api:10,test:10,dev:10,uat:10,manage:15,console:15,"
+                    "portal:10,jenkins:15,gitlab:15,jira:10,wiki:5,mail:5,crm:10,erp:10,hr:10,"
+                    "backup:15,internal:10,intranet:10,git:10,db:10",
+        "port_score": 5,
+        "use_title_keywords": True
+    }
+    
+    # 如果配置对象为空或不包含priority部分，直接返回默认配置
+    if not config or not config.has_section("priority"):
+        return default_config.copy()
+    
+    # 配置项类型映射
+    config_types = {
+        "enabled": "bool",
+        "keywords": "str",
+        "port_score": "int",
+        "use_title_keywords": "bool"
+    }
+    
+    # 创建结果字典，初始值为默认配置
+    result = default_config.copy()
+    
+    # 从配置对象中读取值，覆盖默认值
+    for key, type_info in config_types.items():
+        if config.has_option("priority", key):
+            if type_info == "str":
+                result[key] = config.get("priority", key)
+            elif type_info == "int":
+                result[key] = config.getint("priority", key)
+            elif type_info == "bool":
+                result[key] = config.getboolean("priority", key)
+    
+    return result
+
 def get_paths_config(config):
 
     """
@@ -236,7 +483,21 @@ def get_httpx_config(config):
         "input_file": "domains.txt",
         "additional_args": "-rl 60,-rlm 3000",
         "capture_output": True,
-        "output_log_file": "httpx_output.log"
+        "output_log_file": "httpx_output.log",
+        "shards": 1,
+        "streaming": False,
+        "json_output": False,
+        "resume": False,
+        "adaptive_rate": False,
+        "min_rate": 10,
+        "max_rate": 300,
+        "target_error_rate": 5,
+        "wave_size": 1000,
+        "engine": "httpx",
+        "host_concurrency": 2,
+        "group_concurrency": 0,
+        "pipeline": False,
+        "pipeline_save_domains": True
     }
     
     # 如果配置对象为空或不包含httpx部分，直接返回默认配置
@@ -255,7 +516,21 @@ def get_httpx_config(config):
         "input_file": "str",
         "additional_args": "str",
         "capture_output": "bool",
-        "output_log_file": "str"
+        "output_log_file": "str",
+        "shards": "int",
+        "streaming": "bool",
+        "json_output": "bool",
+        "resume": "bool",
+        "adaptive_rate": "bool",
+        "min_rate": "int",
+        "max_rate": "int",
+        "target_error_rate": "int",
+        "wave_size": "int",
+        "engine": "str",
+        "host_concurrency": "int",
+        "group_concurrency": "int",
+        "pipeline": "bool",
+        "pipeline_save_domains": "bool"
     }
     
     # 创建结果字典，初始值为默认配置
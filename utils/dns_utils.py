@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DNS预解析工具模块
+
+在探活之前并发解析所有主机，去掉域名不存在（NXDOMAIN）或没有任何地址记录的主机，
+避免httpx在它们身上各等待一个完整的超时时间；可选地检测泛解析，同一泛解析域名下
+只解析到泛解析地址的主机只保留一个。查询直接通过UDP发送到配置的DNS服务器，
+并发数有上限；解析结果按TTL缓存，同一名称的并发查询只发送一次。
+超时或服务器出错而无法确定结果的主机会保留下来，交给后续步骤探测。
+"""
+
+import csv
+import random
+import struct
+import asyncio
+import logging
+import ipaddress
+from collections import OrderedDict
+from contextlib import nullcontext
+from itertools import islice
+
+from utils.scope_utils import split_host_port
+
+logger = logging.getLogger("subdatarefine.dns")
+
+# 解析结果
+RESOLVED = "resolved"
+NXDOMAIN = "nxdomain"
+NODATA = "nodata"
+FAILED = "failed"
+# 命中泛解析而被合并的主机
+WILDCARD = "wildcard"
+
+TYPE_A = 1
+TYPE_SOA = 6
+TYPE_AAAA = 28
+
+RCODE_NOERROR = 0
+RCODE_NXDOMAIN = 3
+
+DNS_PORT = 53
+# 否定结果（NXDOMAIN、无记录）在响应中没有SOA记录时的缓存时间（秒）
+DEFAULT_NEGATIVE_TTL = 300
+# 缓存的最大条目数，超过后淘汰最久未使用的条目
+CACHE_MAX_ENTRIES = 200000
+# 每批解析的主机数相对于并发数的倍数，批内的结果按输入顺序写出
+BATCH_SIZE_FACTOR = 4
+# 泛解析检测时每个上级域名查询的随机标签数、随机标签的长度和字符
+WILDCARD_PROBES = 3
+WILDCARD_LABEL_LENGTH = 16
+WILDCARD_LABEL_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+class DnsAnswer:
+    """
+    一个名称的解析结果
+    """
+
+    __slots__ = ("status", "ips", "ttl")
+
+    def __init__(self, status, ips=(), ttl=0):
+        self.status = status
+        self.ips = list(ips)
+        self.ttl = ttl
+
+def parse_nameservers(text):
+    """
+    解析配置中的DNS服务器列表，每项为IP或IP:端口，以逗号分隔
+
+    返回:
+        [(IP, 端口), ...]
+    """
+    nameservers = []
+    for entry in (text or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            nameservers.append((str(ipaddress.ip_address(entry)), DNS_PORT))
+            continue
+        except ValueError:
+            pass
+        host = split_host_port(entry)
+        port = entry.rsplit(":", 1)[1] if entry != host and entry.rsplit(":", 1)[1].isdigit() else DNS_PORT
+        nameservers.append((str(ipaddress.ip_address(host)), int(port)))
+    return nameservers
+
+def encode_name(name):
+    """
+    将域名编码为DNS报文中的标签序列
+    """
+    data = bytearray()
+    for label in name.rstrip(".").split("."):
+        encoded = label.encode("idna") if not label.isascii() else label.encode("ascii")
+        if not encoded or len(encoded) > 63:
+            raise ValueError(f"无效的域名标签: {label!r}")
+        data.append(len(encoded))
+        data += encoded
+    data.append(0)
+    return bytes(data)
+
+def build_query(query_id, name, qtype):
+    """
+    构建递归查询报文
+    """
+    header = struct.pack(">HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    return header + encode_name(name) + struct.pack(">HH", qtype, 1)
+
+def skip_name(data, offset):
+    """
+    跳过报文中的一个域名（可能含压缩指针），返回其后的偏移
+    """
+    while True:
+        length = data[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        offset += length + 1
+
+def parse_response(data):
+    """
+    解析DNS响应报文
+
+    返回:
+        (响应码, 是否被截断, [(类型, TTL, rdata起始偏移, rdata长度), ...] 应答记录, 否定缓存TTL)
+    """
+    if len(data) < 12:
+        raise ValueError("DNS响应过短")
+    _, flags, qdcount, ancount, nscount, _ = struct.unpack_from(">HHHHHH", data, 0)
+    rcode = flags & 0x000F
+    truncated = bool(flags & 0x0200)
+
+    offset = 12
+    for _ in range(qdcount):
+        offset = skip_name(data, offset) + 4
+
+    answers = []
+    negative_ttl = None
+    for index in range(ancount + nscount):
+        offset = skip_name(data, offset)
+        rtype, _, ttl, rdlength = struct.unpack_from(">HHIH", data, offset)
+        offset += 10
+        if index < ancount:
+            answers.append((rtype, ttl, offset, rdlength))
+        elif rtype == TYPE_SOA:
+            # SOA记录的最后一个字段是否定缓存时间
+            minimum = struct.unpack_from(">I", data, offset + rdlength - 4)[0]
+            negative_ttl = min(ttl, minimum)
+        offset += rdlength
+    return rcode, truncated, answers, negative_ttl
+
+class DnsCache:
+    """
+    按TTL过期、条目数有上限的解析结果缓存
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+
+    def get(self, name, now):
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        expires, answer = entry
+        if expires < now:
+            del self.entries[name]
+            return None
+        self.entries.move_to_end(name)
+        return answer
+
+    def put(self, name, answer, now):
+        self.entries[name] = (now + answer.ttl, answer)
+        self.entries.move_to_end(name)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+class _ResolverProtocol(asyncio.DatagramProtocol):
+    """
+    一个DNS服务器的UDP连接，按事务ID把响应交给等待中的查询
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < 2:
+            return
+        future = self.pending.pop(struct.unpack_from(">H", data, 0)[0], None)
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        logger.debug(f"DNS连接出错: {exc}")
+
+class AsyncResolver:
+    """
+    基于UDP的异步DNS解析器
+    """
+
+    def __init__(self, nameservers, timeout=2, retries=2, concurrency=200, cache=None):
+        """
+        参数:
+            nameservers: [(IP, 端口), ...] DNS服务器列表，查询轮流发往各服务器
+            timeout: 单次查询的超时时间（秒）
+            retries: 超时后的重试次数
+            concurrency: 同时进行的查询数
+            cache: DnsCache对象，为None时新建
+        """
+        if not nameservers:
+            raise ValueError("没有配置DNS服务器")
+        self.nameservers = nameservers
+        self.timeout = timeout
+        self.retries = retries
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.cache = cache if cache is not None else DnsCache()
+        self.inflight = {}
+        self.protocols = []
+        self.next_server = 0
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        for nameserver in self.nameservers:
+            _, protocol = await loop.create_datagram_endpoint(_ResolverProtocol, remote_addr=nameserver)
+            self.protocols.append(protocol)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        for protocol in self.protocols:
+            protocol.transport.close()
+        self.protocols = []
+
+    async def query(self, name, qtype):
+        """
+        发送一次查询，超时后换下一个服务器重试
+
+        返回:
+            DnsAnswer对象
+        """
+        loop = asyncio.get_running_loop()
+        for _ in range(self.retries + 1):
+            protocol = self.protocols[self.next_server % len(self.protocols)]
+            self.next_server += 1
+            query_id = random.getrandbits(16)
+            while query_id in protocol.pending:
+                query_id = random.getrandbits(16)
+            future = loop.create_future()
+            protocol.pending[query_id] = future
+            protocol.transport.sendto(build_query(query_id, name, qtype))
+            try:
+                data = await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                continue
+            finally:
+                protocol.pending.pop(query_id, None)
+
+            try:
+                rcode, truncated, answers, negative_ttl = parse_response(data)
+            except (ValueError, IndexError, struct.error):
+                return DnsAnswer(FAILED)
+            if rcode == RCODE_NXDOMAIN:
+                return DnsAnswer(NXDOMAIN, ttl=DEFAULT_NEGATIVE_TTL if negative_ttl is None else negative_ttl)
+            if rcode != RCODE_NOERROR:
+                return DnsAnswer(FAILED)
+
+            ips = []
+            ttl = None
+            for rtype, record_ttl, offset, length in answers:
+                if rtype == TYPE_A and length == 4:
+                    ips.append(str(ipaddress.IPv4Address(data[offset:offset + 4])))
+                elif rtype == TYPE_AAAA and length == 16:
+                    ips.append(str(ipaddress.IPv6Address(data[offset:offset + 16])))
+                else:
+                    continue
+                ttl = record_ttl if ttl is None else min(ttl, record_ttl)
+            if ips:
+                return DnsAnswer(RESOLVED, ips, ttl)
+            if truncated:
+                # 响应被截断且没有可用的记录，无法确定结果
+                return DnsAnswer(FAILED)
+            return DnsAnswer(NODATA, ttl=DEFAULT_NEGATIVE_TTL if negative_ttl is None else negative_ttl)
+        return DnsAnswer(FAILED)
+
+    async def resolve(self, name):
+        """
+        解析一个名称的地址，先查A记录，没有时再查AAAA记录；结果按TTL缓存
+
+        返回:
+            DnsAnswer对象
+        """
+        name = name.lower().rstrip(".")
+        loop = asyncio.get_running_loop()
+        answer = self.cache.get(name, loop.time())
+        if answer is not None:
+            return answer
+
+        # 同一名称正在查询时等待同一个结果
+        future = self.inflight.get(name)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = loop.create_future()
+        self.inflight[name] = future
+        try:
+            async with self.semaphore:
+                answer = await self.query(name, TYPE_A)
+                if answer.status == NODATA:
+                    answer_aaaa = await self.query(name, TYPE_AAAA)
+                    if answer_aaaa.status != FAILED:
+                        answer = answer_aaaa
+            # 失败的结果不缓存，下次重新查询
+            if answer.status != FAILED:
+                self.cache.put(name, answer, loop.time())
+            future.set_result(answer)
+            return answer
+        except asyncio.CancelledError:
+            # 查询被取消时取消等待同一结果的查询，不把取消当作查询结果
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他查询等待时避免"异常未被获取"的警告
+            future.exception()
+            raise
+        finally:
+            del self.inflight[name]
+
+    async def resolve_host(self, host):
+        """
+        解析主机（可带端口号），IP地址直接返回，无效的域名视为无法确定
+
+        返回:
+            DnsAnswer对象
+        """
+        name = split_host_port(host)
+        ip = host_ip(name)
+        if ip is not None:
+            return DnsAnswer(RESOLVED, [ip])
+        try:
+            return await self.resolve(name)
+        except (ValueError, UnicodeError):
+            return DnsAnswer(FAILED)
+
+def build_resolver(dns_config, cache=None):
+    """
+    根据get_dns_config返回的配置创建解析器
+    """
+    return AsyncResolver(
+        parse_nameservers(dns_config.get("resolvers")),
+        timeout=dns_config.get("timeout"),
+        retries=dns_config.get("retries"),
+        concurrency=dns_config.get("concurrency"),
+        cache=cache
+    )
+
+class WildcardDetector:
+    """
+    泛解析检测：对主机的上一级域名查询几个随机标签，都能解析时记录它们的IP作为泛解析指纹；
+    主机解析到的IP都在指纹中时认为它只是命中了泛解析
+    """
+
+    def __init__(self, resolver, probes=WILDCARD_PROBES):
+        """
+        参数:
+            resolver: AsyncResolver对象，随机标签的查询结果同样进入它的缓存
+            probes: 每个上级域名查询的随机标签数
+        """
+        self.resolver = resolver
+        self.probes = max(1, probes)
+        self.fingerprints = {}
+        self.inflight = {}
+
+    async def fingerprint(self, parent):
+        """
+        返回上级域名的泛解析指纹（IP集合），没有泛解析时返回None
+        """
+        if parent in self.fingerprints:
+            return self.fingerprints[parent]
+        future = self.inflight.get(parent)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[parent] = future
+        try:
+            labels = ["".join(random.choices(WILDCARD_LABEL_CHARS, k=WILDCARD_LABEL_LENGTH))
+                      for _ in range(self.probes)]
+            answers = await asyncio.gather(*(self.resolver.resolve(f"{label}.{parent}") for label in labels))
+            # 所有随机标签都能解析才认为存在泛解析
+            if all(answer.status == RESOLVED for answer in answers):
+                fingerprint = frozenset(ip for answer in answers for ip in answer.ips)
+            else:
+                fingerprint = None
+            self.fingerprints[parent] = fingerprint
+            future.set_result(fingerprint)
+            return fingerprint
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self.inflight[parent]
+
+    async def match(self, host, answer):
+        """
+        判断已解析的主机是否命中了上级域名的泛解析
+
+        返回:
+            命中时返回上级域名，否则返回None
+        """
+        if answer.status != RESOLVED or not answer.ips:
+            return None
+        name = split_host_port(host).lower().rstrip(".")
+        if host_ip(name) is not None:
+            return None
+        labels = name.split(".")
+        # 上级域名至少要有两级，不检测顶级域名
+        if len(labels) < 3:
+            return None
+        parent = ".".join(labels[1:])
+        try:
+            fingerprint = await self.fingerprint(parent)
+        except (ValueError, UnicodeError):
+            return None
+        if fingerprint and set(answer.ips) <= fingerprint:
+            return parent
+        return None
+
+def host_ip(name):
+    """
+    主机名是IP地址时返回规范形式，否则返回None
+    """
+    try:
+        return str(ipaddress.ip_address(name))
+    except ValueError:
+        return None
+
+async def _resolve_hosts_file(dns_config, hosts_file, output_file, records_file, wildcard_file=None):
+    counts = {RESOLVED: 0, NXDOMAIN: 0, NODATA: 0, FAILED: 0, WILDCARD: 0}
+    batch_size = max(1, dns_config.get("concurrency")) * BATCH_SIZE_FACTOR
+    # 每个泛解析上级域名（按端口区分）保留的代表主机
+    representatives = {}
+    async with build_resolver(dns_config) as resolver:
+        detector = WildcardDetector(resolver, dns_config.get("wildcard_probes")) if wildcard_file else None
+        with open(hosts_file, 'r', encoding='utf-8', errors='ignore') as f, \
+             open(output_file, 'w', encoding='utf-8') as out, \
+             open(records_file, 'w', encoding='utf-8') as records, \
+             (open(wildcard_file, 'w', encoding='utf-8', newline='') if wildcard_file else nullcontext()) as audit:
+            audit_writer = None
+            if audit is not None:
+                audit_writer = csv.writer(audit)
+                audit_writer.writerow(["主机", "泛解析域名", "代表主机", "IP"])
+
+            hosts = (line.strip() for line in f)
+            hosts = (host for host in hosts if host)
+            while True:
+                batch = list(islice(hosts, batch_size))
+                if not batch:
+                    break
+                answers = await asyncio.gather(*(resolver.resolve_host(host) for host in batch))
+                if detector:
+                    parents = await asyncio.gather(*(detector.match(host, answer)
+                                                     for host, answer in zip(batch, answers)))
+                else:
+                    parents = [None] * len(batch)
+
+                for host, answer, parent in zip(batch, answers, parents):
+                    counts[answer.status] += 1
+                    if answer.status in (NXDOMAIN, NODATA):
+                        continue
+                    if parent is not None:
+                        # 同一泛解析域名下、相同端口的主机只保留第一个
+                        key = (parent, host[len(split_host_port(host)):])
+                        representative = representatives.setdefault(key, host)
+                        if representative != host:
+                            counts[WILDCARD] += 1
+                            audit_writer.writerow([host, parent, representative, ",".join(answer.ips)])
+                            continue
+                    out.write(host + '\n')
+                    records.write(f"{host}\t{','.join(answer.ips)}\n")
+    return counts
+
+def resolve_hosts_file(dns_config, hosts_file, output_file, records_file, wildcard_file=None):
+    """
+    解析主机列表，去掉域名不存在或没有地址记录的主机，可选地合并命中泛解析的主机
+
+    参数:
+        dns_config: get_dns_config返回的配置
+        hosts_file: 输入主机列表文件
+        output_file: 保留的主机写入的文件，顺序与输入一致
+        records_file: 保留的主机及其IP写入的文件，每行为"主机\\tIP,IP"，无法确定时IP为空
+        wildcard_file: 泛解析合并记录的CSV文件，为None时不检测泛解析
+
+    返回:
+        各解析结果的主机数 {resolved, nxdomain, nodata, failed, wildcard}，
+        wildcard为因泛解析被合并掉的主机数（它们同时计入resolved）
+    """
+    counts = asyncio.run(_resolve_hosts_file(dns_config, hosts_file, output_file, records_file, wildcard_file))
+    logger.info(f"DNS预解析: 解析成功 {counts[RESOLVED]}，域名不存在 {counts[NXDOMAIN]}，"
+                f"无地址记录 {counts[NODATA]}，无法确定 {counts[FAILED]}，泛解析合并 {counts[WILDCARD]}")
+    return counts
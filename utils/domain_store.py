@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑域名存储模块
+
+Python集合中每个主机名字符串约占100字节以上，而子域名之间大量共享相同的后缀
+（如 *.example.com.cn）。这里将主机名排序后按块压缩保存：同一块内相邻主机名的
+公共后缀会被压缩掉，内存占用只有集合的一小部分。
+
+新加入的主机名先放在一个小集合中，攒满后排序压缩成一个有序数据段；同一层级的数据段
+攒够一定数量后合并为上一层级（类似LSM树），合并时去重。对外提供与集合相同的add/update/in/len接口，
+遍历时按字符串顺序输出。
+"""
+
+import zlib
+import marshal
+from bisect import bisect_right
+
+# 未压缩缓冲区的最大条目数
+PENDING_LIMIT = 65536
+
+# 每个压缩块包含的主机名数量
+BLOCK_SIZE = 256
+
+# 同一层级的数据段达到该数量时合并为上一层级的一个数据段
+MERGE_FANIN = 8
+
+# 压缩级别：新数据段很快会被合并，用最快的级别；合并后的数据段长期保存，用较高的压缩率
+FRESH_COMPRESS_LEVEL = 1
+MERGED_COMPRESS_LEVEL = 6
+
+def _pack(items, compress_level):
+    return zlib.compress(marshal.dumps(items), compress_level)
+
+def _unpack(block):
+    return marshal.loads(zlib.decompress(block))
+
+class _Run:
+    """
+    一个有序且无重复的数据段，由若干压缩块组成
+    """
+
+    __slots__ = ("level", "compress_level", "first_keys", "blocks", "count", "_cached_index", "_cached_block")
+
+    def __init__(self, batches, level=0):
+        """
+        参数:
+            batches: 已排序且无重复的主机名列表序列，各列表首尾相接后整体有序
+            level: 数据段所在的合并层级
+        """
+        self.level = level
+        self.compress_level = MERGED_COMPRESS_LEVEL if level > 0 else FRESH_COMPRESS_LEVEL
+        self.first_keys = []
+        self.blocks = []
+        self.count = 0
+        self._cached_index = -1
+        self._cached_block = None
+        carry = []
+        for batch in batches:
+            if carry:
+                batch = carry + batch
+            full = len(batch) - len(batch) % BLOCK_SIZE
+            for start in range(0, full, BLOCK_SIZE):
+                self._add_block(batch[start:start + BLOCK_SIZE])
+            carry = batch[full:]
+        if carry:
+            self._add_block(carry)
+
+    def _add_block(self, block):
+        self.first_keys.append(block[0])
+        self.blocks.append(_pack(block, self.compress_level))
+        self.count += len(block)
+
+    def block(self, index):
+        """
+        解压第index个块，最近一次解压的块会被缓存
+        """
+        if index != self._cached_index:
+            self._cached_block = _unpack(self.blocks[index])
+            self._cached_index = index
+        return self._cached_block
+
+    def __contains__(self, item):
+        index = bisect_right(self.first_keys, item) - 1
+        if index < 0:
+            return False
+        block = self.block(index)
+        position = bisect_right(block, item) - 1
+        return position >= 0 and block[position] == item
+
+    def iter_blocks(self):
+        """
+        依次返回解压后的块
+        """
+        for block in self.blocks:
+            yield _unpack(block)
+
+def _merge_batches(sources):
+    """
+    归并多个有序且各自无重复的列表序列，按批返回去重后的有序列表
+
+    每批只输出不大于各来源当前缓冲区末尾最小值的部分，批内用集合去重、用内置排序，
+    避免逐个元素比较带来的解释器开销。
+
+    参数:
+        sources: 列表序列的列表，每个序列首尾相接后整体有序
+
+    返回:
+        有序列表的生成器
+    """
+    iterators = [iter(source) for source in sources]
+    buffers = [next(iterator, None) for iterator in iterators]
+    while True:
+        active = [i for i, buffer in enumerate(buffers) if buffer is not None]
+        if not active:
+            return
+
+        # 仍有后续数据的来源中，缓冲区末尾的最小值是本批可以安全输出的上界
+        bound = None
+        for i in active:
+            if bound is None or buffers[i][-1] < bound:
+                bound = buffers[i][-1]
+
+        collected = []
+        for i in active:
+            buffer = buffers[i]
+            cut = bisect_right(buffer, bound)
+            collected.extend(buffer[:cut])
+            buffer = buffer[cut:]
+            if not buffer:
+                buffer = next(iterators[i], None)
+            buffers[i] = buffer
+
+        if collected:
+            yield sorted(set(collected))
+
+class DomainStore:
+    """
+    紧凑的主机名集合，支持添加、成员判断和有序遍历
+    """
+
+    def __init__(self, items=None):
+        """
+        参数:
+            items: 初始主机名，可选
+        """
+        self.pending = set()
+        self.runs = []
+        if items is not None:
+            self.update(items)
+
+    def add(self, item):
+        """
+        添加一个主机名
+        """
+        pending = self.pending
+        pending.add(item)
+        if len(pending) >= PENDING_LIMIT:
+            self.flush()
+
+    def update(self, items):
+        """
+        批量添加主机名，另一个DomainStore的数据段会被直接接管
+        """
+        if isinstance(items, DomainStore):
+            self.runs.extend(items.runs)
+            self.runs.sort(key=lambda run: run.level, reverse=True)
+            self._collapse()
+            items = items.pending
+
+        # 缓冲区可能暂时超过上限，随后整体压缩为一个数据段
+        self.pending.update(items)
+        if len(self.pending) >= PENDING_LIMIT:
+            self.flush()
+
+    def flush(self):
+        """
+        将缓冲区排序压缩为新的数据段
+        """
+        if not self.pending:
+            return
+        self.runs.append(_Run([sorted(self.pending)]))
+        self.pending = set()
+        self._collapse()
+
+    def compact(self):
+        """
+        将所有数据合并为单个数据段
+        """
+        self.flush()
+        if len(self.runs) > 1:
+            level = max(run.level for run in self.runs) + 1
+            self.runs = [_Run(_merge_batches([run.iter_blocks() for run in self.runs]), level)]
+
+    def _collapse(self):
+        # 数据段按层级从高到低排列，末尾同一层级的数据段达到MERGE_FANIN个时合并，
+        # 每个主机名被重新压缩的次数只随数据量对数增长
+        runs = self.runs
+        while len(runs) >= MERGE_FANIN:
+            tail = runs[-MERGE_FANIN:]
+            level = tail[-1].level
+            if any(run.level != level for run in tail):
+                break
+            del runs[-MERGE_FANIN:]
+            runs.append(_Run(_merge_batches([run.iter_blocks() for run in tail]), level + 1))
+
+    def __contains__(self, item):
+        if item in self.pending:
+            return True
+        return any(item in run for run in self.runs)
+
+    def __len__(self):
+        # 单个数据段内没有重复，直接使用计数
+        if not self.runs:
+            return len(self.pending)
+        if len(self.runs) == 1 and not self.pending:
+            return self.runs[0].count
+        # 不同数据段之间可能有重复，归并计数，不改变数据段
+        return sum(len(batch) for batch in self._iter_batches())
+
+    def _iter_batches(self):
+        sources = [run.iter_blocks() for run in self.runs]
+        if self.pending:
+            sources.append([sorted(self.pending)])
+        return _merge_batches(sources)
+
+    def __iter__(self):
+        """
+        按字符串顺序遍历去重后的全部主机名
+        """
+        for batch in self._iter_batches():
+            yield from batch
+
+    def __bool__(self):
+        return bool(self.pending) or any(run.count for run in self.runs)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+主机探活历史工具模块
+
+在temp目录中用SQLite保存每个主机最近一次的探活时间和处理后的结果，
+再次运行时只探测新增或已过期的主机，其余主机直接复用历史结果。
+httpx明确报告探测失败的主机同样会被记录，过期前不会重复探测；httpx中途退出
+时没有结果的主机不会写入历史库，下次运行仍会探测。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+from urllib.parse import urlsplit
+
+logger = logging.getLogger("subdatarefine.history")
+
+# 每次查询的主机数量，不超过SQLite的参数个数上限
+QUERY_BATCH_SIZE = 500
+
+def history_key(host):
+    """
+    将主机名转换为历史记录的键：小写，去除默认的443和80端口
+
+    httpx输出的URL中可能省略默认端口，转换后输入的主机名与结果中的主机名一致。
+    """
+    host = host.strip().lower()
+    for suffix in (":443", ":80"):
+        if host.endswith(suffix):
+            return host[:-len(suffix)]
+    return host
+
+def record_key(record):
+    """
+    返回处理后的探活记录（第一列为URL）对应的历史记录键
+    """
+    return history_key(urlsplit(record[0]).netloc)
+
+def read_hosts(hosts_file):
+    """
+    逐行读取主机列表文件，跳过空行
+    """
+    with open(hosts_file, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            host = line.strip()
+            if host:
+                yield host
+
+def iter_batches(items, size=QUERY_BATCH_SIZE):
+    """
+    将可迭代对象按固定大小分批
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class HostHistory:
+    """
+    按主机名索引的探活历史库
+    """
+
+    def __init__(self, db_file):
+        """
+        参数:
+            db_file: SQLite数据库文件路径
+        """
+        db_dir = os.path.dirname(db_file)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS hosts ("
+            "host TEXT PRIMARY KEY, "
+            "probed_at REAL NOT NULL, "
+            "alive INTEGER NOT NULL, "
+            "record TEXT"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_hosts_probed_at ON hosts (probed_at)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def evict(self, max_age_hours):
+        """
+        删除超过指定时间未探测的条目
+
+        参数:
+            max_age_hours: 最长保留时间（小时），0表示不删除
+
+        返回:
+            删除的条目数量
+        """
+        if not max_age_hours or max_age_hours <= 0:
+            return 0
+        cutoff = time.time() - max_age_hours * 3600
+        with self.conn:
+            cursor = self.conn.execute("DELETE FROM hosts WHERE probed_at < ?", (cutoff,))
+        return cursor.rowcount
+
+    def partition_hosts(self, hosts_file, probe_file, reused_file, reprobe_after_hours):
+        """
+        将主机列表分为需要探测的主机和可以复用历史结果的主机
+
+        参数:
+            hosts_file: 主机列表文件（如domains.txt）
+            probe_file: 需要探测的主机写入的文件，作为httpx的输入
+            reused_file: 复用历史结果的主机写入的文件
+            reprobe_after_hours: 历史结果的有效期（小时），0表示每次都重新探测
+
+        返回:
+            (需要探测的主机数, 复用历史结果的主机数)
+        """
+        cutoff = time.time() - reprobe_after_hours * 3600 if reprobe_after_hours > 0 else None
+        probe_count = 0
+        reused_count = 0
+        with open(probe_file, 'w', encoding='utf-8') as probe_f, \
+             open(reused_file, 'w', encoding='utf-8') as reused_f:
+            for batch in iter_batches(read_hosts(hosts_file)):
+                fresh = set()
+                if cutoff is not None:
+                    keys = list({history_key(host) for host in batch})
+                    placeholders = ",".join("?" * len(keys))
+                    rows = self.conn.execute(
+                        f"SELECT host FROM hosts WHERE probed_at >= ? AND host IN ({placeholders})",
+                        [cutoff] + keys
+                    )
+                    fresh = {row[0] for row in rows}
+
+                for host in batch:
+                    if history_key(host) in fresh:
+                        reused_f.write(host + '\n')
+                        reused_count += 1
+                    else:
+                        probe_f.write(host + '\n')
+                        probe_count += 1
+        return probe_count, reused_count
+
+    def record_results(self, records, failed_hosts=()):
+        """
+        保存本次探测的结果，只有明确探测失败的主机记为未存活
+
+        参数:
+            records: 处理后的探活记录列表，每条记录为[url, 状态码, 标题, (重定向URL)]
+            failed_hosts: httpx -probe输出中探测失败的输入主机
+
+        返回:
+            (存活主机数, 未存活主机数)
+        """
+        now = time.time()
+        alive = {}
+        for record in records:
+            alive[record_key(record)] = record
+
+        dead_count = 0
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO hosts (host, probed_at, alive, record) VALUES (?, ?, 1, ?)",
+                ((key, now, json.dumps(record, ensure_ascii=False)) for key, record in alive.items())
+            )
+            for batch in iter_batches(failed_hosts):
+                # 同一主机既有存活记录又有失败记录时（如多端口展开后）以存活结果为准
+                dead = [(key, now) for key in {history_key(host) for host in batch} if key not in alive]
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO hosts (host, probed_at, alive, record) VALUES (?, ?, 0, NULL)",
+                    dead
+                )
+                dead_count += len(dead)
+        return len(alive), dead_count
+
+    def load_records(self, hosts_file):
+        """
+        读取主机列表中存活主机的历史探活记录
+
+        参数:
+            hosts_file: 主机列表文件（如partition_hosts生成的复用列表）
+
+        返回:
+            探活记录的生成器
+        """
+        seen = set()
+        for batch in iter_batches(read_hosts(hosts_file)):
+            keys = [key for key in {history_key(host) for host in batch} if key not in seen]
+            if not keys:
+                continue
+            seen.update(keys)
+            placeholders = ",".join("?" * len(keys))
+            rows = self.conn.execute(
+                f"SELECT record FROM hosts WHERE alive = 1 AND host IN ({placeholders})", keys
+            )
+            for (record,) in rows:
+                yield json.loads(record)
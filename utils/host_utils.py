@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+主机名提取工具模块
+
+子域名数据中绝大多数行是裸主机名、host:port或简单的http(s) URL，
+这里用预编译的正则一次匹配完成提取，无法识别的输入交给调用方回退到urlparse处理。
+"""
+
+import re
+from functools import lru_cache
+
+# 常见形式: [http(s)://]host[:port][/path|?query|#fragment]
+# 主机名只允许ASCII字母数字和.-_，端口只允许ASCII数字，其余情况一律回退
+HOST_PATTERN = re.compile(
+    r'(?:https?://)?([A-Za-z0-9_.-]+)(?::([0-9]{1,5}))?(?:[/?#].*)?',
+    re.DOTALL
+)
+
+_host_match = HOST_PATTERN.fullmatch
+
+# 已是规范形式的主机名：小写ASCII、不以点结尾、不带*.前缀、不带:80端口
+CANONICAL_HOST_PATTERN = re.compile(r'[a-z0-9_-][a-z0-9_.-]*(?<!\.)(?::(?!80$)[0-9]{1,5})?')
+
+# 规范化结果的缓存条目数
+CANONICALIZE_CACHE_SIZE = 65536
+
+def fast_extract_host(url, strip_443=True):
+    """
+    快速提取URL中的裸主机名（保留端口号），结果与基于urlparse的提取完全一致
+
+    参数:
+        url: 要处理的URL或主机名
+        strip_443: 是否去除443端口，默认为True
+
+    返回:
+        提取的主机名，输入不是常见形式时返回None，由调用方回退到urlparse
+    """
+    match = _host_match(url)
+    if match is None:
+        return None
+
+    host, port = match.group(1, 2)
+    if port is None:
+        return host
+    return join_host_port(host, port, strip_443)
+
+def join_host_port(host, port, strip_443=True):
+    """
+    按urlparse的规则组合HOST_PATTERN匹配出的主机名和端口
+
+    参数:
+        host: 主机名
+        port: 端口字符串（仅含ASCII数字）
+        strip_443: 是否去除443端口，默认为True
+
+    返回:
+        主机名（保留非443端口），端口超出范围时返回None
+    """
+    # 超出范围的端口在urlparse中会报错，交给回退路径处理
+    port_number = int(port)
+    if port_number > 65535:
+        return None
+
+    # 与urlparse的hostname一致，去除443端口时主机名转为小写
+    if port_number == 443 and strip_443:
+        return host.lower()
+    return f"{host}:{port}"
+
+def canonicalize_host(host):
+    """
+    将主机名转换为规范形式，等价的主机名（大小写、末尾的点、*.通配前缀、
+    IDN与punycode、显式的80端口）转换后相同，只需探测一次
+
+    参数:
+        host: 主机名，可带端口号
+
+    返回:
+        规范化后的主机名
+    """
+    # 绝大多数主机名已是规范形式，直接返回，不占用缓存
+    if CANONICAL_HOST_PATTERN.fullmatch(host):
+        return host
+    return _canonicalize_host(host)
+
+@lru_cache(maxsize=CANONICALIZE_CACHE_SIZE)
+def _canonicalize_host(host):
+    name = host.lower()
+    port = ""
+    if name.startswith("["):
+        # IPv6地址只处理端口
+        end = name.find("]")
+        if end > 0 and name[end + 1:end + 2] == ":":
+            name, port = name[:end + 1], name[end + 2:]
+    elif name.count(":") == 1:
+        name, port = name.split(":")
+
+    name = name.rstrip(".")
+    while name.startswith("*."):
+        name = name[2:]
+    if not name.isascii():
+        try:
+            name = name.encode("idna").decode("ascii")
+        except UnicodeError:
+            pass
+
+    # 不带端口的主机名默认按80端口探测http，显式的:80与之等价
+    if port == "80":
+        port = ""
+    if not name:
+        return host
+    return f"{name}:{port}" if port else name
@@ -7,7 +7,40 @@ httpx工具函数
 """
 
 import os
+import re
+import json
+import hashlib
+import shlex
+import shutil
 import subprocess
+import threading
+
+from utils.sort_utils import ExternalSorter, sorted_difference
+from utils.history_utils import history_key
+
+# 断点续探时对主机列表排序使用的内存预算（MB）
+RESUME_SORT_MEMORY_MB = 64
+
+# 输出失败主机（无响应、无法解析等）的httpx参数
+PROBE_ARG = "-probe"
+
+# 计算输入列表指纹时每次读取的字节数
+FINGERPRINT_READ_BYTES = 1024 * 1024
+
+# additional_args中需要按分片拆分的速率限制参数
+RATE_LIMIT_ARG_PATTERN = re.compile(r'^(-rl|-rate-limit|-rlm|-rate-limit-minute|-t|-threads)\s+(\d+)$')
+
+def split_arg(arg):
+    """
+    按shell的规则拆分additional_args中的一项，引号内的空格不拆分
+
+    Windows下不把反斜杠当作转义符，路径（如D:\\recon\\responses）原样保留。
+    """
+    if os.name != "nt":
+        return shlex.split(arg)
+    parts = shlex.split(arg, posix=False)
+    return [part[1:-1] if len(part) >= 2 and part[0] == part[-1] and part[0] in "\"'" else part
+            for part in parts]
 
 def build_httpx_command(httpx_config, input_file, output_file, root_dir):
     """
@@ -15,22 +48,24 @@ def build_httpx_command(httpx_config, input_file, output_file, root_dir):
     
     参数:
         httpx_config: httpx配置字典
-        input_file: 输入文件路径
-        output_file: 输出文件路径
+        input_file: 输入文件路径，为None时httpx从标准输入读取主机
+        output_file: 输出文件路径，为None时只输出到标准输出
         root_dir: 项目根目录
         
     返回:
         构建的httpx命令
     """
-    # 确保输入输出文件是绝对路径
-    input_file_abs = os.path.join(root_dir, input_file) if not os.path.isabs(input_file) else input_file
-    output_file_abs = os.path.join(root_dir, output_file) if not os.path.isabs(output_file) else output_file
-    
     # 获取httpx可执行文件路径
     httpx_path = httpx_config.get("httpx_path", "httpx")
     
-    # 基本命令
-    cmd = [httpx_path, "-l", input_file_abs, "-o", output_file_abs]
+    # 基本命令，确保输入输出文件是绝对路径
+    cmd = [httpx_path]
+    if input_file:
+        input_file_abs = os.path.join(root_dir, input_file) if not os.path.isabs(input_file) else input_file
+        cmd.extend(["-l", input_file_abs])
+    if output_file:
+        output_file_abs = os.path.join(root_dir, output_file) if not os.path.isabs(output_file) else output_file
+        cmd.extend(["-o", output_file_abs])
     
     # 添加其他配置参数
     if httpx_config.get("threads"):
@@ -48,16 +83,29 @@ def build_httpx_command(httpx_config, input_file, output_file, root_dir):
     if httpx_config.get("title", False):
         cmd.append("-title")
     
+    # JSON输出包含状态码、标题以及内容长度、Web服务器、IP、CDN、响应时间等信息
+    if httpx_config.get("json_output", False):
+        cmd.extend(["-json", "-server", "-cl", "-ip", "-cdn", "-rt"])
+    
     # 处理additional_args
     additional_args = httpx_config.get("additional_args", "")
     if additional_args:
         for arg in additional_args.split(","):
             arg = arg.strip()
             if arg:
-                cmd.append(arg)
+                # 每项可能包含多个参数或参数名和参数值（如"-rl 30"），拆分为独立的参数
+                cmd.extend(split_arg(arg))
     
     return cmd
 
+def format_command(cmd):
+    """
+    将命令列表转换为可在shell中执行的命令行字符串，含空格的参数会加上引号
+    """
+    if os.name == "nt":
+        return subprocess.list2cmdline(cmd)
+    return shlex.join(cmd)
+
 def run_httpx(cmd, no_process=False):
     """
     执行httpx命令
@@ -71,7 +119,7 @@ def run_httpx(cmd, no_process=False):
     """
     try:
         # 生成完整的命令行字符串
-        cmd_str = ' '.join(cmd)
+        cmd_str = format_command(cmd)
         
         if no_process:
             # -np 模式: 完全隐藏所有输出
@@ -126,3 +174,407 @@ def run_httpx(cmd, no_process=False):
 
         print(f"执行httpx命令时发生错误: {e}")
         return -1, "", str(e)
+
+def split_share(total, shards, index):
+    """
+    将total尽量平均地分给shards个分片，返回第index个分片的份额（至少为1）
+    """
+    share = total // shards + (1 if index < total % shards else 0)
+    return max(share, 1)
+
+def build_shard_config(httpx_config, shards, index):
+    """
+    生成单个分片的httpx配置，线程数和速率限制按分片数拆分，总量与单进程时一致
+    
+    参数:
+        httpx_config: httpx配置字典
+        shards: 分片数
+        index: 分片序号
+        
+    返回:
+        分片的httpx配置字典
+    """
+    shard_config = dict(httpx_config)
+    if shard_config.get("threads"):
+        shard_config["threads"] = split_share(shard_config["threads"], shards, index)
+    
+    args = []
+    for arg in shard_config.get("additional_args", "").split(","):
+        arg = arg.strip()
+        match = RATE_LIMIT_ARG_PATTERN.match(arg)
+        if match:
+            arg = f"{match.group(1)} {split_share(int(match.group(2)), shards, index)}"
+        args.append(arg)
+    shard_config["additional_args"] = ",".join(args)
+    return shard_config
+
+def split_input_file(input_file, shard_dir, shards):
+    """
+    将输入文件按行轮流分配到多个分片文件中
+    
+    输入文件通常按字母排序，轮流分配使同一根域名下的主机分散到各个分片。
+    
+    参数:
+        input_file: 输入文件路径
+        shard_dir: 分片文件目录
+        shards: 分片数
+        
+    返回:
+        非空分片文件路径列表
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    shard_files = [os.path.join(shard_dir, f"httpx_shard_{i}.txt") for i in range(shards)]
+    counts = [0] * shards
+    handles = [open(shard_file, 'w', encoding='utf-8') for shard_file in shard_files]
+    try:
+        with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
+            index = 0
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                handles[index].write(line + '\n')
+                counts[index] += 1
+                index = (index + 1) % shards
+    finally:
+        for handle in handles:
+            handle.close()
+    
+    result = []
+    for shard_file, count in zip(shard_files, counts):
+        if count:
+            result.append(shard_file)
+        else:
+            os.remove(shard_file)
+    return result
+
+def run_httpx_sharded(httpx_config, input_file, output_file, root_dir, shards, no_process=False):
+    """
+    将输入拆分为多个分片，同时运行多个httpx进程，完成后合并各分片的输出
+    
+    某个分片失败时，其余分片的结果仍会被合并。
+    
+    参数:
+        httpx_config: httpx配置字典
+        input_file: 输入文件路径
+        output_file: 合并后的输出文件路径
+        root_dir: 项目根目录
+        shards: 分片数
+        no_process: 当为True时，隐藏httpx的所有输出
+        
+    返回:
+        (exitcode, stdout, stderr)
+    """
+    try:
+        shard_dir = os.path.dirname(output_file)
+        shard_inputs = split_input_file(input_file, shard_dir, shards)
+        if not shard_inputs:
+            print("输入文件为空，没有需要探测的主机")
+            return 0, "", ""
+        
+        processes = []
+        shard_outputs = []
+        devnull = open(os.devnull, 'w') if no_process else None
+        try:
+            for index, shard_input in enumerate(shard_inputs):
+                shard_output = os.path.join(shard_dir, f"httpx_shard_{index}_result.txt")
+                if os.path.exists(shard_output):
+                    os.remove(shard_output)
+                shard_config = build_shard_config(httpx_config, len(shard_inputs), index)
+                cmd = build_httpx_command(shard_config, shard_input, shard_output, root_dir)
+                if not no_process:
+                    print(f"执行命令（分片 {index + 1}/{len(shard_inputs)}）: {format_command(cmd)}")
+                processes.append(subprocess.Popen(cmd, stdout=devnull, stderr=devnull))
+                shard_outputs.append(shard_output)
+            
+            exitcodes = [process.wait() for process in processes]
+        finally:
+            # 出错时终止仍在运行的分片
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+            if devnull:
+                devnull.close()
+        
+        # 按分片顺序合并输出
+        failed = []
+        with open(output_file, 'w', encoding='utf-8') as out:
+            for index, shard_output in enumerate(shard_outputs):
+                if os.path.exists(shard_output):
+                    with open(shard_output, 'r', encoding='utf-8', errors='ignore') as f:
+                        for line in f:
+                            out.write(line if line.endswith('\n') else line + '\n')
+                    os.remove(shard_output)
+                if exitcodes[index] != 0:
+                    failed.append(index + 1)
+                os.remove(shard_inputs[index])
+        
+        if failed:
+            print(f"警告: 分片 {', '.join(map(str, failed))} 的httpx进程返回错误，已合并其余分片的结果")
+        
+        if os.path.getsize(output_file) > 0:
+            print(f"httpx分片探活完成，{len(shard_outputs)} 个分片的输出已合并")
+            return 0, "", ""
+        exitcode = next((code for code in exitcodes if code != 0), 0)
+        return exitcode, "", ""
+    
+    except Exception as e:
+        print(f"执行httpx分片探活时发生错误: {e}")
+        return -1, "", str(e)
+
+def run_httpx_streaming(cmd, line_handler, no_process=False):
+    """
+    执行httpx命令，通过管道逐行读取标准输出，每读到一行立即交给line_handler处理
+    
+    httpx仍会通过-o参数写出完整的结果文件，供后续步骤使用。
+    
+    参数:
+        cmd: httpx命令列表
+        line_handler: 处理单行输出的函数
+        no_process: 当为True时，不在控制台显示httpx的输出
+        
+    返回:
+        (exitcode, stdout, stderr)
+    """
+    try:
+        if not no_process:
+            print(f"执行命令: {format_command(cmd)}")
+        
+        stderr_target = subprocess.DEVNULL if no_process else None
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_target,
+                                   encoding='utf-8', errors='ignore', bufsize=1)
+        try:
+            for line in process.stdout:
+                if not no_process:
+                    print(line, end='')
+                line_handler(line)
+        except BaseException:
+            # 处理出错或被中断时终止httpx，避免子进程残留
+            process.kill()
+            raise
+        finally:
+            process.stdout.close()
+            exitcode = process.wait()
+        
+        return exitcode, "", ""
+    
+    except Exception as e:
+        print(f"执行httpx命令时发生错误: {e}")
+        return -1, "", str(e)
+
+def feed_hosts(process, hosts, errors):
+    """
+    将主机逐行写入httpx的标准输入，写完后关闭管道
+
+    管道是阻塞的，httpx读取不及时、管道缓冲区写满时写入会等待，主机的生成也随之暂停。
+    httpx提前退出时停止写入；生成主机时出现的异常记录到errors中，由调用方报告。
+    """
+    try:
+        for host in hosts:
+            try:
+                process.stdin.write(host + '\n')
+            except OSError:
+                # httpx已退出，管道被关闭
+                return
+    except BaseException as e:
+        errors.append(e)
+    finally:
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+
+def run_httpx_pipe(cmd, hosts, line_handler=None, no_process=False):
+    """
+    执行httpx命令，主机通过标准输入逐个传入，不需要预先生成主机列表文件
+
+    主机在单独的线程中写入，主线程等待httpx结束，或在流式处理时逐行读取标准输出交给line_handler。
+
+    参数:
+        cmd: 不含-l参数的httpx命令列表
+        hosts: 主机的可迭代对象，如提取脚本的stream_domains生成器
+        line_handler: 处理单行输出的函数，为None时不读取标准输出
+        no_process: 当为True时，不在控制台显示httpx的输出
+
+    返回:
+        (exitcode, stdout, stderr)
+    """
+    try:
+        if not no_process:
+            print(f"执行命令: {format_command(cmd)}")
+
+        output_target = subprocess.DEVNULL if no_process else None
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE if line_handler else output_target,
+                                   stderr=output_target, encoding='utf-8', errors='ignore')
+        feed_errors = []
+        feeder = threading.Thread(target=feed_hosts, args=(process, hosts, feed_errors), daemon=True)
+        feeder.start()
+        try:
+            if line_handler:
+                for line in process.stdout:
+                    if not no_process:
+                        print(line, end='')
+                    line_handler(line)
+            exitcode = process.wait()
+            feeder.join()
+        except BaseException:
+            # 处理出错或被中断时终止httpx，写入线程在下次写入时随管道关闭而结束
+            process.kill()
+            raise
+        finally:
+            if line_handler:
+                process.stdout.close()
+            process.wait()
+
+        if feed_errors:
+            # 生成主机时出错，httpx只收到了部分主机，不能当作探活成功
+            error = feed_errors[0]
+            print(f"生成探活主机时发生错误，httpx只探测了部分主机: {error!r}")
+            return -1, "", f"生成探活主机时发生错误: {error!r}"
+        return exitcode, "", ""
+
+    except Exception as e:
+        print(f"执行httpx命令时发生错误: {e}")
+        return -1, "", str(e)
+
+def has_probe_arg(httpx_config):
+    """
+    additional_args中是否有-probe参数，有时失败的主机也会在结果中留下一条failed记录
+    """
+    return any(arg.strip() == PROBE_ARG for arg in httpx_config.get("additional_args", "").split(","))
+
+def with_probe_output(httpx_config):
+    """
+    返回使用JSON输出并输出失败主机（-json -probe）的httpx配置
+
+    没有响应的主机也有一条failed记录：断点续探时据此判断哪些主机已经探测过，
+    探活历史据此区分未存活的主机和httpx中途退出时还没有探测的主机。
+    """
+    probe_config = dict(httpx_config)
+    probe_config["json_output"] = True
+    if not has_probe_arg(httpx_config):
+        additional_args = httpx_config.get("additional_args", "").strip()
+        probe_config["additional_args"] = f"{additional_args},{PROBE_ARG}" if additional_args else PROBE_ARG
+    return probe_config
+
+def input_fingerprint(input_file):
+    """
+    计算输入主机列表文件内容的SHA-256，用于判断探活检查点是否属于同一份输入
+    """
+    digest = hashlib.sha256()
+    with open(input_file, 'rb') as f:
+        for block in iter(lambda: f.read(FINGERPRINT_READ_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_checkpoint(checkpoint_file):
+    """
+    读取探活检查点
+
+    返回:
+        {"input": 输入列表指纹, "complete": 是否已正常完成}，文件不存在或无法解析时返回None
+    """
+    try:
+        with open(checkpoint_file, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return checkpoint if isinstance(checkpoint, dict) else None
+
+def write_checkpoint(checkpoint_file, fingerprint, complete):
+    """
+    写入探活检查点：开始探活时complete为False，正常完成后改为True
+    """
+    with open(checkpoint_file, 'w', encoding='utf-8') as f:
+        json.dump({"input": fingerprint, "complete": complete}, f)
+
+def compute_remaining_hosts(input_file, result_file, remaining_file, temp_dir, result_host):
+    """
+    根据已有的部分探活结果，计算输入中尚未探测的主机
+    
+    输入主机和结果中的主机分别做外部排序，再按顺序归并求差集，内存占用与主机数量无关；
+    剩余的主机再按输入中的序号排序，保持原来的探测顺序（如交错或优先级顺序）。
+    
+    参数:
+        input_file: 输入主机列表文件
+        result_file: 已有的部分探活结果文件
+        remaining_file: 尚未探测的主机写入的文件
+        temp_dir: 外部排序的临时目录
+        result_host: 从结果行中取出输入主机名的函数，无法识别时返回None
+        
+    返回:
+        (已完成的主机数, 尚未探测的主机数)
+    """
+    done = ExternalSorter(temp_dir, RESUME_SORT_MEMORY_MB, prefix="resume_done_")
+    hosts = ExternalSorter(temp_dir, RESUME_SORT_MEMORY_MB, prefix="resume_input_")
+    remaining = ExternalSorter(temp_dir, RESUME_SORT_MEMORY_MB, prefix="resume_left_")
+    try:
+        with open(result_file, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                host = result_host(line)
+                if host:
+                    done.add(history_key(host))
+        
+        # 按"比较键\t序号\t原始主机名"排序，制表符小于主机名中的任何字符，排序结果与按键排序一致
+        with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
+            index = 0
+            for line in f:
+                host = line.strip()
+                if host:
+                    hosts.add(f"{history_key(host)}\t{index:012d}\t{host}")
+                    index += 1
+        
+        done_count = 0
+        remaining_count = 0
+        for entry in sorted_difference(hosts, done, key=lambda entry: entry.split('\t', 1)[0]):
+            remaining.add(entry.split('\t', 1)[1])
+            remaining_count += 1
+        with open(remaining_file, 'w', encoding='utf-8') as out:
+            for entry in remaining:
+                out.write(entry.split('\t', 1)[1] + '\n')
+        for _ in done:
+            done_count += 1
+        return done_count, remaining_count
+    finally:
+        done.cleanup()
+        hosts.cleanup()
+        remaining.cleanup()
+
+def trim_incomplete_line(file_path):
+    """
+    删除文件末尾不完整的一行（进程中断时可能只写出了半行）
+    
+    返回:
+        删除的字节数
+    """
+    if not os.path.exists(file_path):
+        return 0
+    with open(file_path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return 0
+        # 从末尾向前查找最后一个换行符
+        position = size
+        while position > 0:
+            step = min(65536, position)
+            f.seek(position - step)
+            block = f.read(step)
+            index = max(block.rfind(b'\n'), block.rfind(b'\r'))
+            if index >= 0:
+                end = position - step + index + 1
+                break
+            position -= step
+        else:
+            end = 0
+        f.truncate(end)
+    return size - end
+
+def append_file(source_file, target_file):
+    """
+    将source_file的内容追加到target_file末尾
+    """
+    if not os.path.exists(source_file):
+        return
+    with open(source_file, 'rb') as src, open(target_file, 'ab') as dst:
+        shutil.copyfileobj(src, dst)
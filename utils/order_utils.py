@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+探活顺序工具模块
+
+按可注册域名（公共后缀再加一级，如example.com.cn）将主机分组，再在各组之间轮流
+输出，使同一目标的主机在探活顺序中分散开，避免短时间内集中请求同一目标的基础设施。
+公共后缀表编译为按标签倒序的后缀树，支持公共后缀列表（PSL）的通配和例外规则；
+内置一份常用后缀，也可以加载完整的PSL文件。
+"""
+
+import os
+import logging
+import ipaddress
+from functools import lru_cache
+
+from utils.scope_utils import split_host_port
+from utils.sort_utils import ExternalSorter
+
+logger = logging.getLogger("subdatarefine.order")
+
+# 未设置内存预算时交错排序使用的内存预算（MB）
+ORDER_SORT_MEMORY_MB = 256
+
+# 内置的常用公共后缀，单级顶级域名由默认规则处理，这里只需列出多级后缀
+BUILTIN_PUBLIC_SUFFIXES = """
+com.cn net.cn org.cn gov.cn edu.cn ac.cn mil.cn
+bj.cn sh.cn tj.cn cq.cn he.cn sx.cn nm.cn ln.cn jl.cn hl.cn js.cn zj.cn ah.cn fj.cn jx.cn sd.cn
+ha.cn hb.cn hn.cn gd.cn gx.cn hi.cn sc.cn gz.cn yn.cn xz.cn sn.cn gs.cn qh.cn nx.cn xj.cn
+com.hk net.hk org.hk gov.hk edu.hk idv.hk
+com.tw net.tw org.tw gov.tw edu.tw idv.tw
+com.mo net.mo org.mo gov.mo edu.mo
+co.uk org.uk gov.uk ac.uk ltd.uk plc.uk me.uk net.uk
+co.jp ne.jp or.jp ac.jp go.jp ad.jp ed.jp gr.jp lg.jp
+co.kr or.kr ne.kr go.kr ac.kr re.kr
+com.au net.au org.au gov.au edu.au
+com.sg net.sg org.sg gov.sg edu.sg
+com.my net.my org.my gov.my edu.my
+com.br net.br org.br gov.br
+co.in net.in org.in gov.in ac.in
+co.nz org.nz govt.nz ac.nz
+com.ru com.ua com.tr com.mx com.ar com.vn com.ph com.pk com.eg co.za co.id co.th
+github.io gitlab.io herokuapp.com vercel.app netlify.app pages.dev workers.dev
+appspot.com cloudfront.net azurewebsites.net blogspot.com
+"""
+
+# 后缀树中表示规则结束和例外规则的键（合法的域名标签不会是这两个值）
+_TERMINAL = ""
+_EXCEPTION = "!"
+_WILDCARD = "*"
+
+class PublicSuffixList:
+    """
+    编译后的公共后缀表
+    """
+
+    def __init__(self, rules=()):
+        """
+        参数:
+            rules: PSL格式的规则，如"com.cn"、"*.ck"、"!www.ck"
+        """
+        self.tree = {}
+        self.count = 0
+        for rule in rules:
+            self.add_rule(rule)
+
+    @classmethod
+    def from_file(cls, psl_file=None):
+        """
+        创建包含内置后缀的公共后缀表，指定PSL文件时一并加载其中的规则
+        """
+        psl = cls(BUILTIN_PUBLIC_SUFFIXES.split())
+        if psl_file:
+            with open(psl_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    # 每行的第一个空白之前是规则，//开头的是注释
+                    rule = line.strip().split(None, 1)[0] if line.strip() else ""
+                    if rule and not rule.startswith("//"):
+                        psl.add_rule(rule)
+            logger.info(f"已加载公共后缀列表: {psl_file}，共 {psl.count} 条规则")
+        return psl
+
+    def add_rule(self, rule):
+        rule = rule.strip().lower().rstrip(".")
+        exception = rule.startswith("!")
+        if exception:
+            rule = rule[1:]
+        if not rule:
+            return
+        node = self.tree
+        for label in reversed(rule.split(".")):
+            if label != _WILDCARD and not label.isascii():
+                label = label.encode("idna").decode("ascii")
+            node = node.setdefault(label, {})
+        node[_EXCEPTION if exception else _TERMINAL] = True
+        self.count += 1
+
+    def suffix_length(self, labels):
+        """
+        返回公共后缀的标签数
+
+        参数:
+            labels: 倒序的域名标签列表
+        """
+        # 默认规则"*"：未知的顶级域名本身是公共后缀
+        length = 1
+        node = self.tree
+        for index, label in enumerate(labels):
+            child = node.get(label)
+            if child is not None and _EXCEPTION in child:
+                # 例外规则：该名称本身可以注册，公共后缀是它的上一级
+                return index
+            wildcard = node.get(_WILDCARD)
+            if wildcard is not None and _TERMINAL in wildcard:
+                length = max(length, index + 1)
+            if child is None:
+                break
+            if _TERMINAL in child:
+                length = max(length, index + 1)
+            node = child
+        return length
+
+    def registrable_domain(self, host):
+        """
+        返回主机（可带端口号）的可注册域名；IP地址返回其本身，主机名本身是公共后缀时返回主机名
+        """
+        name = split_host_port(host).lower().rstrip(".")
+        try:
+            return str(ipaddress.ip_address(name))
+        except ValueError:
+            pass
+        labels = name.split(".")[::-1]
+        length = self.suffix_length(labels) + 1
+        if length > len(labels):
+            return name
+        return ".".join(reversed(labels[:length]))
+
+@lru_cache(maxsize=8)
+def load_public_suffix_list(psl_file=None):
+    """
+    加载公共后缀表，同一文件只编译一次
+    """
+    if psl_file and not os.path.exists(psl_file):
+        logger.warning(f"公共后缀列表文件不存在: {psl_file}，只使用内置的后缀")
+        psl_file = None
+    return PublicSuffixList.from_file(psl_file)
+
+def interleave_hosts(hosts, temp_dir, max_memory_mb=0, psl=None):
+    """
+    按可注册域名分组，在各组之间轮流输出主机
+
+    第一轮依次输出每组的第一个主机，第二轮输出每组的第二个主机，依此类推。
+    分组和轮次的计算都通过外部排序完成，内存占用与主机数量无关。
+
+    参数:
+        hosts: 主机的可迭代对象，不能有重复
+        temp_dir: 外部排序的临时目录
+        max_memory_mb: 内存预算（MB），0表示使用默认预算
+        psl: PublicSuffixList对象，为None时使用内置后缀
+
+    返回:
+        交错排列后的主机生成器
+    """
+    psl = psl or load_public_suffix_list()
+    memory_mb = max_memory_mb if max_memory_mb and max_memory_mb > 0 else ORDER_SORT_MEMORY_MB
+    grouped = ExternalSorter(temp_dir, memory_mb, prefix="order_group_")
+    rounds = ExternalSorter(temp_dir, memory_mb, prefix="order_round_")
+    try:
+        # 按"组\t主机"排序，同一组的主机连续出现，据此得到每个主机在组内的序号
+        for host in hosts:
+            grouped.add(f"{psl.registrable_domain(host)}\t{host}")
+
+        current_group = None
+        index = 0
+        for entry in grouped:
+            group, host = entry.split("\t", 1)
+            if group != current_group:
+                current_group = group
+                index = 0
+            rounds.add(f"{index:010d}\t{entry}")
+            index += 1
+        grouped.cleanup()
+
+        # 按"组内序号\t组\t主机"排序即为轮流输出的顺序
+        for entry in rounds:
+            yield entry.split("\t", 2)[2]
+    finally:
+        grouped.cleanup()
+        rounds.cleanup()
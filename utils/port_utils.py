@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多端口探测工具模块
+
+将主机列表按配置的端口列表展开为"主机:端口"，每积累一批主机后按端口依次输出
+这批主机的组合，同一主机的不同端口不会连续探测，也不会在内存中保存主机与端口的
+完整组合。提取结果中已经带有这些端口的主机只输出一次：去重只需要记录输入中出现
+过的主机名，与端口数量无关。
+"""
+
+import logging
+
+from utils.domain_store import DomainStore
+
+logger = logging.getLogger("subdatarefine.port")
+
+MAX_PORT = 65535
+# 每批按端口交错展开的主机数，同一主机相邻两个端口之间隔着这么多个探测目标
+EXPAND_WINDOW_SIZE = 1000
+
+def parse_ports(text):
+    """
+    解析端口列表，以逗号分隔，可以写成范围（如8000-9000），重复的端口只保留一个
+
+    参数:
+        text: 端口列表字符串
+
+    返回:
+        按配置顺序排列的端口号列表
+    """
+    ports = {}
+    for entry in (text or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        start, _, end = entry.partition("-")
+        try:
+            start = int(start)
+            end = int(end) if end else start
+        except ValueError:
+            logger.warning(f"忽略无效的端口: {entry}")
+            continue
+        if not 1 <= start <= end <= MAX_PORT:
+            logger.warning(f"忽略超出范围的端口: {entry}")
+            continue
+        for port in range(start, end + 1):
+            ports[port] = None
+    return list(ports)
+
+def split_port(host):
+    """
+    拆分主机名和端口号
+
+    返回:
+        (不含端口号的主机名, 拼接端口号时使用的主机名, 端口字符串或None)，
+        IPv6地址拼接端口号时加上方括号
+    """
+    if host.startswith("["):
+        end = host.find("]")
+        if end > 0 and host[end + 1:end + 2] == ":":
+            return host[1:end], host[:end + 1], host[end + 2:]
+        return host[1:end] if end > 0 else host, host, None
+    # 只有一个冒号时才是端口号，多个冒号是不带方括号的IPv6地址
+    if host.count(":") == 1:
+        name, port = host.split(":", 1)
+        return name, name, port
+    if ":" in host:
+        return host, f"[{host}]", None
+    return host, host, None
+
+class PortExpander:
+    """
+    将不带端口号的主机按端口列表展开
+    """
+
+    def __init__(self, ports, strip_443=True, canonicalize=True):
+        """
+        参数:
+            ports: 端口号列表
+            strip_443: 与提取时一致，为True时443端口就是不带端口号的主机本身
+            canonicalize: 与提取时一致，为True时80端口就是不带端口号的主机本身
+        """
+        # 与不带端口号的主机等价的端口不再单独展开，与提取时的规则保持一致
+        self.ports = [str(port) for port in ports
+                      if not (port == 443 and strip_443) and not (port == 80 and canonicalize)]
+        self.port_set = set(self.ports)
+
+    def expand(self, hosts, window=EXPAND_WINDOW_SIZE):
+        """
+        输入的主机原样输出，每积累一批不带端口号的主机后按端口依次输出这批主机的组合，
+        展开出的组合在输入中已有时跳过
+
+        参数:
+            hosts: 不重复的主机的可迭代对象，可以是生成器
+            window: 每批展开的不带端口号的主机数
+
+        返回:
+            主机的生成器
+        """
+        # 只记录输入的主机名，不记录展开出的组合
+        seen = DomainStore()
+        prefixes = []
+        for host in hosts:
+            name, prefix, port = split_port(host)
+            if port is None:
+                seen.add(host)
+                yield host
+                prefixes.append(prefix)
+                if len(prefixes) >= window:
+                    yield from self._expand_window(prefixes, seen)
+                    prefixes = []
+            elif port in self.port_set and name in seen:
+                # 不带端口号的主机先出现，该组合已经或将要展开输出，不记录到seen中
+                continue
+            else:
+                seen.add(host)
+                yield host
+        yield from self._expand_window(prefixes, seen)
+
+    def _expand_window(self, prefixes, seen):
+        """
+        按端口依次展开一批主机，同一主机相邻两个端口之间隔着这批中的其他主机
+        """
+        for port in self.ports:
+            for prefix in prefixes:
+                candidate = f"{prefix}:{port}"
+                # 输入中已有带该端口的主机，已经原样输出过
+                if candidate not in seen:
+                    yield candidate
+
+def expand_hosts_file(input_file, output_file, expander):
+    """
+    按端口列表展开主机列表文件
+
+    返回:
+        (输入主机数, 输出主机数)
+    """
+    input_count = 0
+    output_count = 0
+
+    def read_hosts():
+        nonlocal input_count
+        with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                host = line.strip()
+                if host:
+                    input_count += 1
+                    yield host
+
+    with open(output_file, 'w', encoding='utf-8') as out:
+        for host in expander.expand(read_hosts()):
+            out.write(host + '\n')
+            output_count += 1
+
+    logger.info(f"多端口展开: {input_count} 个主机展开为 {output_count} 个主机和端口的组合")
+    return input_count, output_count
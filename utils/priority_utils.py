@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+探活优先级工具模块
+
+在探活之前按主机名给每个主机打分：主机名中含有admin、oa、vpn、api、test等关键词，
+或使用非标准端口的主机更可能是有价值的目标，优先探测。配合流式筛选，
+有价值的结果可以在探活刚开始时就出现，而不必等全部探活结束。
+"""
+
+import re
+import logging
+
+from utils.sort_utils import ExternalSorter
+
+logger = logging.getLogger("subdatarefine.priority")
+
+# 未指定权重的关键词的分数
+DEFAULT_KEYWORD_SCORE = 10
+# 标准端口，其他端口加分
+STANDARD_PORTS = {"80", "443"}
+# 排序使用的内存预算（MB），未设置提取的内存预算时使用
+PRIORITY_SORT_MEMORY_MB = 256
+# 分数上限，排序键按(上限 - 分数)补零，使高分排在前面
+MAX_SCORE = 999999
+
+# 主机名按点、连字符、下划线拆分为词
+TOKEN_SPLIT_PATTERN = re.compile(r'[.\-_]')
+# 词末尾的编号，如vpn2、oa01
+TRAILING_DIGITS_PATTERN = re.compile(r'\d+$')
+# 只有字母和数字的关键词才能在主机名中出现
+KEYWORD_PATTERN = re.compile(r'^[a-z0-9]+$')
+# 短关键词（如oa、hr）只按整词匹配，较长的关键词也匹配包含它的词（如testapi）
+SUBSTRING_MIN_LENGTH = 4
+
+def parse_keywords(text, default_score=DEFAULT_KEYWORD_SCORE):
+    """
+    解析关键词列表，以逗号分隔，每项可以写成"关键词:分数"
+
+    返回:
+        {关键词: 分数}，忽略不可能出现在主机名中的关键词（如中文）
+    """
+    keywords = {}
+    for entry in (text or "").split(","):
+        keyword, _, score = entry.strip().partition(":")
+        keyword = keyword.strip().lower()
+        if not KEYWORD_PATTERN.match(keyword):
+            continue
+        keywords[keyword] = int(score) if score.strip().isdigit() else default_score
+    return keywords
+
+class HostScorer:
+    """
+    按关键词和端口给主机打分
+    """
+
+    def __init__(self, keywords, port_score=0):
+        """
+        参数:
+            keywords: {关键词: 分数}
+            port_score: 使用非标准端口时加的分数
+        """
+        self.keywords = keywords
+        self.port_score = port_score
+        long_keywords = sorted((keyword for keyword in keywords if len(keyword) >= SUBSTRING_MIN_LENGTH),
+                               key=len, reverse=True)
+        self.substring_pattern = (re.compile("|".join(map(re.escape, long_keywords)))
+                                  if long_keywords else None)
+
+    def score(self, host):
+        """
+        返回主机的分数，每个关键词只计一次
+        """
+        host = host.lower()
+        name, port = host, ""
+        # 带端口号的主机名（IPv6地址不打分端口）
+        if host.count(":") == 1:
+            name, port = host.split(":", 1)
+
+        matched = set()
+        keywords = self.keywords
+        for token in TOKEN_SPLIT_PATTERN.split(name):
+            base = TRAILING_DIGITS_PATTERN.sub("", token)
+            if base in keywords:
+                matched.add(base)
+            if self.substring_pattern is not None and len(token) >= SUBSTRING_MIN_LENGTH:
+                matched.update(self.substring_pattern.findall(token))
+
+        score = sum(keywords[keyword] for keyword in matched)
+        if port and port not in STANDARD_PORTS:
+            score += self.port_score
+        return min(score, MAX_SCORE)
+
+def build_scorer(priority_config, title_keywords=""):
+    """
+    根据优先级配置创建HostScorer，启用use_title_keywords时合并筛选配置中的标题关键词
+
+    参数:
+        priority_config: 优先级配置字典
+        title_keywords: [filter]中的title_keywords
+
+    返回:
+        HostScorer对象
+    """
+    keywords = {}
+    if priority_config.get("use_title_keywords"):
+        keywords.update(parse_keywords(title_keywords))
+    # 显式配置的关键词分数优先
+    keywords.update(parse_keywords(priority_config.get("keywords", "")))
+    return HostScorer(keywords, priority_config.get("port_score", 0))
+
+def prioritize_hosts_file(input_file, output_file, scorer, temp_dir, max_memory_mb=0):
+    """
+    按分数从高到低重新排列主机列表，分数相同的主机保持原来的顺序
+
+    参数:
+        input_file: 输入主机列表文件
+        output_file: 排序后的主机列表文件
+        scorer: HostScorer对象
+        temp_dir: 外部排序的临时目录
+        max_memory_mb: 内存预算（MB），0表示使用默认预算
+
+    返回:
+        (主机总数, 分数大于0的主机数)
+    """
+    memory_mb = max_memory_mb if max_memory_mb and max_memory_mb > 0 else PRIORITY_SORT_MEMORY_MB
+    sorter = ExternalSorter(temp_dir, memory_mb, prefix="priority_")
+    total = 0
+    scored = 0
+    try:
+        with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                host = line.strip()
+                if not host:
+                    continue
+                score = scorer.score(host)
+                if score > 0:
+                    scored += 1
+                # 序号保证分数相同时保持输入顺序
+                sorter.add(f"{MAX_SCORE - score:06d}\t{total:012d}\t{host}")
+                total += 1
+
+        with open(output_file, 'w', encoding='utf-8') as out:
+            for entry in sorter:
+                out.write(entry.split("\t", 2)[2] + '\n')
+    finally:
+        sorter.cleanup()
+
+    logger.info(f"优先级排序: 共 {total} 个主机，其中 {scored} 个命中关键词或使用非标准端口")
+    return total, scored
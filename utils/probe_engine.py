@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内置探活引擎
+
+基于asyncio的HTTP/HTTPS探活实现，不依赖外部的httpx程序。每个主机先尝试HTTPS，
+失败后再尝试HTTP，可跟随重定向；响应体只读取前几KB用于提取标题。
+同一站点的连接在响应读完后放回连接池复用，每个主机的并发请求数和全局请求速率
+都受到限制。结果按httpx -json的格式逐行输出，后续的处理、筛选、历史和断点续探
+步骤无需区分结果来自哪个引擎。
+"""
+
+import re
+import ssl
+import json
+import time
+import html
+import codecs
+import asyncio
+import logging
+from datetime import datetime
+from urllib.parse import urlsplit, urljoin
+
+from utils.httpx_utils import RATE_LIMIT_ARG_PATTERN, has_probe_arg
+from utils.order_utils import load_public_suffix_list
+
+logger = logging.getLogger("subdatarefine.probe")
+
+# 读取响应体的最大字节数，标题一般位于页面开头
+BODY_READ_BYTES = 8192
+# 响应头的最大字节数
+HEADER_MAX_BYTES = 65536
+# 最多跟随的重定向次数，与httpx默认值一致
+MAX_REDIRECTS = 10
+# 每个站点保留的空闲连接数
+IDLE_CONNECTIONS_PER_ORIGIN = 4
+# 输入队列长度相对于并发数的倍数，避免一次读入全部主机
+QUEUE_SIZE_FACTOR = 4
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+REDIRECT_STATUS_CODES = {301, 302, 303, 307, 308}
+NO_BODY_STATUS_CODES = {204, 304}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+TITLE_PATTERN = re.compile(rb'<title[^>]*>(.*?)</title', re.IGNORECASE | re.DOTALL)
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+HEADER_CHARSET_PATTERN = re.compile(r'charset=["\']?([\w-]+)', re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+class ProbeError(Exception):
+    """
+    单个请求失败（响应格式错误等）
+    """
+
+class TokenBucket:
+    """
+    全局请求速率限制，令牌桶容量为一秒的请求数
+    """
+
+    def __init__(self, rate):
+        """
+        参数:
+            rate: 每秒请求数，0表示不限制
+        """
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HostLimiter:
+    """
+    限制每个主机（或可注册域名）同时进行的请求数，不再使用时删除对应的信号量
+    """
+
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self.semaphores = {}
+        self.users = {}
+
+    async def acquire(self, host):
+        semaphore = self.semaphores.get(host)
+        if semaphore is None:
+            semaphore = self.semaphores[host] = asyncio.Semaphore(self.limit)
+        self.users[host] = self.users.get(host, 0) + 1
+        try:
+            await semaphore.acquire()
+        except BaseException:
+            self._leave(host)
+            raise
+
+    def release(self, host):
+        self.semaphores[host].release()
+        self._leave(host)
+
+    def _leave(self, host):
+        self.users[host] -= 1
+        if not self.users[host]:
+            del self.users[host]
+            del self.semaphores[host]
+
+class ConnectionPool:
+    """
+    按(协议, 主机, 端口)保存空闲的keep-alive连接
+    """
+
+    def __init__(self):
+        self.idle = {}
+        # 探活不校验证书，与httpx的默认行为一致
+        self.ssl_context = ssl.create_default_context()
+        self.ssl_context.check_hostname = False
+        self.ssl_context.verify_mode = ssl.CERT_NONE
+
+    async def connect(self, scheme, host, port):
+        """
+        取出一个空闲连接，没有时新建连接
+
+        返回:
+            (reader, writer, 是否为复用的连接)
+        """
+        connections = self.idle.get((scheme, host, port))
+        while connections:
+            reader, writer = connections.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(
+            host, port,
+            ssl=self.ssl_context if scheme == "https" else None,
+            server_hostname=host if scheme == "https" else None
+        )
+        return reader, writer, False
+
+    def release(self, scheme, host, port, reader, writer):
+        connections = self.idle.setdefault((scheme, host, port), [])
+        if len(connections) < IDLE_CONNECTIONS_PER_ORIGIN and not writer.is_closing():
+            connections.append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self):
+        for connections in self.idle.values():
+            for _, writer in connections:
+                writer.close()
+        self.idle.clear()
+
+class Response:
+    """
+    一次请求的响应：状态码、小写键的响应头、响应体的开头部分和对端IP
+    """
+
+    def __init__(self, status, headers, body, ip):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.ip = ip
+
+async def read_headers(reader):
+    """
+    读取状态行和响应头
+
+    返回:
+        (HTTP版本, 状态码, 响应头字典)
+    """
+    try:
+        data = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        raise ProbeError("连接在响应头结束前关闭") from e
+    except asyncio.LimitOverrunError as e:
+        raise ProbeError("响应头过长") from e
+    if len(data) > HEADER_MAX_BYTES:
+        raise ProbeError("响应头过长")
+
+    lines = data.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+        raise ProbeError(f"无效的状态行: {lines[0][:100]}")
+
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            name = name.strip().lower()
+            value = value.strip()
+            # 重复的响应头（如Set-Cookie）只保留第一个，探活用不到它们
+            headers.setdefault(name, value)
+    return parts[0], int(parts[1]), headers
+
+async def read_body_head(reader, status, headers, limit):
+    """
+    读取响应体的前limit个字节
+
+    返回:
+        (数据, 响应体是否已完整读取)
+    """
+    if status in NO_BODY_STATUS_CODES or 100 <= status < 200:
+        return b"", True
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        size = 0
+        while size < limit:
+            line = await reader.readline()
+            try:
+                chunk_size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                return b"".join(chunks), False
+            if chunk_size == 0:
+                # 跳过结尾的trailer
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks), True
+            if size + chunk_size > limit:
+                chunks.append(await reader.read(limit - size))
+                return b"".join(chunks), False
+            chunks.append(await reader.readexactly(chunk_size))
+            await reader.readline()
+            size += chunk_size
+        return b"".join(chunks), False
+
+    content_length = headers.get("content-length")
+    if content_length is not None and content_length.isdigit():
+        length = int(content_length)
+        if length <= limit:
+            return await reader.readexactly(length), True
+        return await reader.readexactly(limit), False
+
+    # 没有长度信息时读到连接关闭或达到上限，连接不能再复用
+    data = b""
+    while len(data) < limit:
+        chunk = await reader.read(limit - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data, False
+
+def format_host_header(host, port, scheme):
+    if ":" in host:
+        host = f"[{host}]"
+    return host if port == DEFAULT_PORTS[scheme] else f"{host}:{port}"
+
+async def fetch(pool, url, timeout):
+    """
+    发送GET请求并读取响应头和响应体的开头部分
+
+    参数:
+        pool: 连接池
+        url: 请求的URL
+        timeout: 超时时间（秒）
+
+    返回:
+        Response对象
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme
+    host = parts.hostname
+    port = parts.port or DEFAULT_PORTS[scheme]
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    request = (
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {format_host_header(host, port, scheme)}\r\n"
+        f"User-Agent: {USER_AGENT}\r\n"
+        f"Accept: text/html,application/xhtml+xml,*/*;q=0.8\r\n"
+        f"Accept-Encoding: identity\r\n"
+        f"Connection: keep-alive\r\n\r\n"
+    ).encode("latin-1", errors="ignore")
+
+    async def exchange():
+        for attempt in range(2):
+            reader, writer, reused = await pool.connect(scheme, host, port)
+            released = False
+            try:
+                try:
+                    writer.write(request)
+                    await writer.drain()
+                    version, status, headers = await read_headers(reader)
+                except (ProbeError, OSError):
+                    # 复用的连接可能已被服务器关闭，换新连接重试一次
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                body, complete = await read_body_head(reader, status, headers, BODY_READ_BYTES)
+                peer = writer.get_extra_info("peername")
+                ip = peer[0] if peer else ""
+                keep_alive = (complete and version != "HTTP/1.0" and
+                              headers.get("connection", "").lower() != "close")
+                if keep_alive:
+                    pool.release(scheme, host, port, reader, writer)
+                    released = True
+                return Response(status, headers, body, ip)
+            finally:
+                # 出错、重试以及超时被取消（CancelledError）时都要关闭连接
+                if not released:
+                    writer.close()
+
+    return await asyncio.wait_for(exchange(), timeout)
+
+def detect_charset(body, headers):
+    """
+    按响应头、再按响应体中的meta标签确定字符集，未声明或未知的字符集返回utf-8
+    """
+    match = HEADER_CHARSET_PATTERN.search(headers.get("content-type", ""))
+    charset = match.group(1) if match else None
+    if not charset:
+        match = META_CHARSET_PATTERN.search(body)
+        charset = match.group(1).decode("ascii", errors="ignore") if match else None
+    try:
+        codecs.lookup(charset or "utf-8")
+    except LookupError:
+        charset = None
+    return charset or "utf-8"
+
+def extract_title(body, headers):
+    """
+    从响应体的开头部分提取<title>，字符集从完整的响应体开头中确定
+    """
+    match = TITLE_PATTERN.search(body)
+    if not match:
+        return ""
+    title = match.group(1).decode(detect_charset(body, headers), errors="replace")
+    return WHITESPACE_PATTERN.sub(" ", html.unescape(title)).strip()
+
+def candidate_urls(target):
+    """
+    生成一个输入主机的候选URL：带协议时直接使用，否则先HTTPS后HTTP
+    """
+    if "://" in target:
+        return [target] if urlsplit(target).scheme.lower() in DEFAULT_PORTS else []
+    return [f"https://{target}", f"http://{target}"]
+
+class ProbeEngine:
+    """
+    内置探活引擎
+    """
+
+    def __init__(self, concurrency, timeout, rate, host_concurrency, follow_redirects=True,
+                 group_concurrency=0, psl=None, emit_failed=False):
+        """
+        参数:
+            concurrency: 同时探测的主机数
+            timeout: 单个请求的超时时间（秒）
+            rate: 全局每秒请求数，0表示不限制
+            host_concurrency: 每个主机同时进行的请求数
+            follow_redirects: 是否跟随重定向
+            group_concurrency: 每个可注册域名同时探测的主机数，0表示不限制
+            psl: 确定可注册域名的PublicSuffixList对象，为None时使用内置后缀
+            emit_failed: 是否为探测失败的主机输出failed记录，与httpx的-probe参数一致
+        """
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.rate = rate
+        self.host_concurrency = host_concurrency
+        self.follow_redirects = follow_redirects
+        self.group_concurrency = group_concurrency
+        self.psl = psl
+        self.emit_failed = emit_failed
+
+    @classmethod
+    def from_config(cls, httpx_config, psl=None):
+        """
+        根据httpx配置创建引擎：并发数取threads，速率取additional_args中的-rl/-rlm，
+        additional_args中有-probe时输出失败的主机
+        """
+        rate = 0
+        for arg in httpx_config.get("additional_args", "").split(","):
+            match = RATE_LIMIT_ARG_PATTERN.match(arg.strip())
+            if not match:
+                continue
+            value = int(match.group(2))
+            if match.group(1) in ("-rl", "-rate-limit"):
+                rate = min(rate, value) if rate else value
+            elif match.group(1) in ("-rlm", "-rate-limit-minute"):
+                per_second = max(1, value // 60)
+                rate = min(rate, per_second) if rate else per_second
+        return cls(
+            httpx_config.get("threads") or 20,
+            httpx_config.get("timeout") or 5,
+            rate,
+            httpx_config.get("host_concurrency", 2),
+            httpx_config.get("follow_redirects", True),
+            httpx_config.get("group_concurrency", 0),
+            psl,
+            has_probe_arg(httpx_config)
+        )
+
+    async def request(self, url):
+        """
+        受主机并发数和全局速率限制地请求一个URL
+        """
+        host = urlsplit(url).hostname or ""
+        await self.host_limiter.acquire(host)
+        try:
+            await self.bucket.acquire()
+            return await fetch(self.pool, url, self.timeout)
+        finally:
+            self.host_limiter.release(host)
+
+    async def probe(self, target):
+        """
+        探测一个输入主机
+
+        返回:
+            httpx -json格式的结果字典，所有候选URL都失败时返回None，输出失败的主机时返回failed记录
+        """
+        error = "不支持的协议"
+        for url in candidate_urls(target):
+            start = time.monotonic()
+            try:
+                current = url
+                response = await self.request(current)
+                chain = [response.status]
+                while (self.follow_redirects and response.status in REDIRECT_STATUS_CODES and
+                       response.headers.get("location") and len(chain) <= MAX_REDIRECTS):
+                    current = urljoin(current, response.headers["location"])
+                    if urlsplit(current).scheme not in DEFAULT_PORTS:
+                        break
+                    response = await self.request(current)
+                    chain.append(response.status)
+            except (OSError, asyncio.TimeoutError, ProbeError, ValueError, asyncio.IncompleteReadError) as e:
+                error = e
+                continue
+            return self.build_record(target, url, current, chain, response, time.monotonic() - start)
+
+        logger.debug(f"探测失败: {target}, 错误信息: {error!r}")
+        return self.failed_record(target, error)
+
+    def failed_record(self, target, error):
+        """
+        按httpx -json -probe的字段生成探测失败的结果，不输出失败的主机时返回None
+        """
+        if not self.emit_failed:
+            return None
+        return {
+            "timestamp": datetime.now().astimezone().isoformat(),
+            "input": target,
+            "error": str(error) or type(error).__name__,
+            "failed": True,
+        }
+
+    def build_record(self, target, url, final_url, chain, response, elapsed):
+        """
+        按httpx -json的字段生成结果
+        """
+        parts = urlsplit(url)
+        record = {
+            "timestamp": datetime.now().astimezone().isoformat(),
+            "url": url,
+            "input": target,
+            "scheme": parts.scheme,
+            "port": str(parts.port or DEFAULT_PORTS[parts.scheme]),
+            "title": extract_title(response.body, response.headers),
+            "webserver": response.headers.get("server", ""),
+            "content_type": response.headers.get("content-type", "").split(";", 1)[0].strip(),
+            "host": response.ip,
+            "a": [response.ip] if response.ip else [],
+            "status_code": response.status,
+            "time": f"{elapsed * 1000:.1f}ms",
+            "failed": False,
+        }
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            record["content_length"] = int(content_length)
+        if len(chain) > 1:
+            record["chain_status_codes"] = chain
+            record["final_url"] = final_url
+        return record
+
+    async def run(self, hosts, emit):
+        """
+        探测所有主机
+
+        参数:
+            hosts: 输入主机的可迭代对象
+            emit: 处理每条结果字典的函数
+
+        返回:
+            (探测的主机数, 存活的主机数)
+        """
+        self.pool = ConnectionPool()
+        self.bucket = TokenBucket(self.rate)
+        self.host_limiter = HostLimiter(self.host_concurrency)
+        group_limiter = None
+        if self.group_concurrency > 0:
+            group_limiter = HostLimiter(self.group_concurrency)
+            psl = self.psl or load_public_suffix_list()
+        queue = asyncio.Queue(maxsize=self.concurrency * QUEUE_SIZE_FACTOR)
+        counts = [0, 0]
+
+        async def probe(target):
+            if group_limiter is None:
+                return await self.probe(target)
+            # 同一可注册域名下同时探测的主机数有上限
+            name = urlsplit(target).netloc if "://" in target else target
+            group = psl.registrable_domain(name)
+            await group_limiter.acquire(group)
+            try:
+                return await self.probe(target)
+            finally:
+                group_limiter.release(group)
+
+        async def worker():
+            while True:
+                target = await queue.get()
+                try:
+                    if target is None:
+                        return
+                    try:
+                        record = await probe(target)
+                    except Exception as e:
+                        # 单个主机的意外错误不影响其他主机，记为探测失败
+                        logger.warning(f"探测 {target} 时发生错误: {e!r}")
+                        record = self.failed_record(target, e)
+                    counts[0] += 1
+                    if record is not None:
+                        if not record.get("failed"):
+                            counts[1] += 1
+                        emit(record)
+                finally:
+                    queue.task_done()
+
+        async def produce():
+            for host in hosts:
+                await queue.put(host)
+            for _ in workers:
+                await queue.put(None)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        producer = asyncio.create_task(produce())
+        try:
+            # 工作协程出错（如写出结果失败）时立即结束，不会因队列已满而一直等待
+            await asyncio.gather(producer, *workers)
+        finally:
+            for task in workers + [producer]:
+                task.cancel()
+            self.pool.close()
+        return counts[0], counts[1]
+
+def run_probe(httpx_config, input_file, output_file, line_handler=None, no_process=False, psl_file=None):
+    """
+    使用内置引擎探测主机列表，结果按httpx -json格式写入output_file
+
+    参数:
+        httpx_config: httpx配置字典
+        input_file: 输入主机列表文件
+        output_file: 输出文件路径
+        line_handler: 处理每条结果的函数，流式筛选时使用
+        no_process: 当为True时，不在控制台显示存活的主机
+        psl_file: 公共后缀列表文件，限制每个可注册域名的并发时使用
+
+    返回:
+        (exitcode, stdout, stderr)
+    """
+    psl = load_public_suffix_list(psl_file) if httpx_config.get("group_concurrency") else None
+    engine = ProbeEngine.from_config(httpx_config, psl)
+    logger.info(f"内置探活引擎: 并发 {engine.concurrency}，超时 {engine.timeout} 秒，"
+                f"速率 {engine.rate or '不限'} 次/秒，每个主机并发 {engine.host_concurrency}，"
+                f"每个可注册域名并发 {engine.group_concurrency or '不限'}")
+
+    try:
+        with open(input_file, 'r', encoding='utf-8', errors='ignore') as f, \
+             open(output_file, 'w', encoding='utf-8') as out:
+            hosts = (line.strip() for line in f)
+
+            def emit(record):
+                line = json.dumps(record, ensure_ascii=False) + "\n"
+                out.write(line)
+                out.flush()
+                if not no_process and not record.get("failed"):
+                    status = ",".join(map(str, record.get("chain_status_codes") or [record["status_code"]]))
+                    print(f"{record['url']} [{status}] [{record['title']}]")
+                if line_handler:
+                    line_handler(line)
+
+            start = time.monotonic()
+            probed, alive = asyncio.run(engine.run((host for host in hosts if host), emit))
+
+        print(f"内置引擎探活完成: 探测 {probed} 个主机，{alive} 个存活，耗时 {time.monotonic() - start:.1f} 秒")
+        return 0, "", ""
+    except Exception as e:
+        print(f"内置引擎探活时发生错误: {e}")
+        return -1, "", str(e)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程工具模块
+
+script目录下的脚本是通过文件路径动态加载的，子进程无法按模块名导入其中的函数，
+因此进程池中的任务统一通过这里的函数转发到脚本函数上执行。
+"""
+
+import os
+import importlib.util
+
+# 每个进程中已加载的脚本模块缓存，键为脚本文件的绝对路径
+_script_modules = {}
+
+def load_script_module(script_path):
+    """
+    按文件路径加载脚本模块，同一进程中只加载一次
+
+    参数:
+        script_path: 脚本文件路径
+
+    返回:
+        加载后的模块对象
+    """
+    script_path = os.path.abspath(script_path)
+    module = _script_modules.get(script_path)
+    if module is None:
+        module_name = os.path.splitext(os.path.basename(script_path))[0]
+        spec = importlib.util.spec_from_file_location(module_name, script_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _script_modules[script_path] = module
+    return module
+
+def call_script_function(script_path, func_name, *args):
+    """
+    在当前进程中调用脚本里的函数，供进程池提交任务使用
+
+    参数:
+        script_path: 脚本文件路径
+        func_name: 要调用的函数名
+        args: 传给函数的参数
+
+    返回:
+        函数的返回值
+    """
+    module = load_script_module(script_path)
+    return getattr(module, func_name)(*args)
+
+def resolve_worker_count(workers):
+    """
+    解析配置中的进程数，0或负数表示使用全部CPU核心
+
+    参数:
+        workers: 配置的进程数
+
+    返回:
+        实际使用的进程数
+    """
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return workers
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应速率控制工具模块
+
+将主机列表分成多个批次依次交给httpx探测，每个批次结束后根据超时等错误所占的比例
+按AIMD（加性增、乘性减）调整速率限制和线程数：错误率低于目标时小步提高速率，
+超过目标时将速率减半。批次进行中错误率明显超标时提前终止httpx，剩余的主机
+以降低后的速率重新探测，最终收敛到错误率不超过目标的最高速率。
+"""
+
+import os
+import re
+import time
+import logging
+import subprocess
+from itertools import islice
+
+from utils.httpx_utils import build_httpx_command, format_command, has_probe_arg, RATE_LIMIT_ARG_PATTERN
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+logger = logging.getLogger("subdatarefine.rate")
+
+# 判断错误率前至少需要的结果数，避免少量结果造成误判
+MIN_SAMPLE_SIZE = 50
+# 批次进行中错误率超过目标的倍数时提前终止
+ABORT_ERROR_MULTIPLIER = 2
+# 错误率超标时速率乘以的系数
+DECREASE_FACTOR = 0.5
+# 每次提高速率的步长占速率调整范围的比例
+INCREASE_FRACTION = 20
+
+# 表示目标过载的错误信息（域名无法解析、端口未开放等不计入）
+OVERLOAD_ERROR_PATTERN = re.compile(
+    r'timeout|deadline exceeded|connection reset|unexpected EOF|too many', re.IGNORECASE)
+# 表示目标在限流的状态码
+THROTTLE_STATUS_CODES = {429, 503}
+
+class AdaptiveRateController:
+    """
+    按AIMD调整httpx速率限制（每秒请求数）和线程数的控制器
+    """
+
+    def __init__(self, rate, threads, min_rate, max_rate, target_error_rate):
+        """
+        参数:
+            rate: 初始速率（每秒请求数）
+            threads: 初始速率对应的线程数，线程数随速率等比例调整
+            min_rate: 最低速率
+            max_rate: 最高速率
+            target_error_rate: 目标错误率（百分比）
+        """
+        self.min_rate = max(1, min_rate)
+        self.max_rate = max(self.min_rate, max_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.base_rate = self.rate
+        self.base_threads = max(1, threads)
+        self.target_error_ratio = target_error_rate / 100
+        self.step = max(1, (self.max_rate - self.min_rate) // INCREASE_FRACTION)
+
+    @classmethod
+    def from_config(cls, httpx_config):
+        """
+        根据httpx配置创建控制器，初始速率和线程数取自additional_args中的-rl/-t和threads配置
+        """
+        rate = None
+        threads = httpx_config.get("threads") or 0
+        for arg in httpx_config.get("additional_args", "").split(","):
+            match = RATE_LIMIT_ARG_PATTERN.match(arg.strip())
+            if not match:
+                continue
+            if match.group(1) in ("-rl", "-rate-limit"):
+                rate = int(match.group(2))
+            elif match.group(1) in ("-t", "-threads"):
+                threads = int(match.group(2))
+        min_rate = httpx_config.get("min_rate", 10)
+        return cls(
+            rate if rate else min_rate,
+            threads or 10,
+            min_rate,
+            httpx_config.get("max_rate", 300),
+            httpx_config.get("target_error_rate", 5)
+        )
+
+    @property
+    def threads(self):
+        return max(1, round(self.base_threads * self.rate / self.base_rate))
+
+    def should_abort(self, total, errors):
+        """
+        批次进行中错误率明显超过目标且速率还能降低时返回True
+        """
+        return (total >= MIN_SAMPLE_SIZE and self.rate > self.min_rate and
+                errors > total * self.target_error_ratio * ABORT_ERROR_MULTIPLIER)
+
+    def update(self, total, errors, elapsed):
+        """
+        根据一个批次的结果调整速率
+
+        参数:
+            total: 批次中得到的结果数
+            errors: 其中过载错误的数量
+            elapsed: 批次耗时（秒）
+
+        返回:
+            错误率是否超过目标
+        """
+        if total == 0:
+            return False
+        ratio = errors / total
+        old_rate, old_threads = self.rate, self.threads
+        overloaded = ratio > self.target_error_ratio
+        if overloaded:
+            self.rate = max(self.min_rate, int(self.rate * DECREASE_FACTOR))
+        else:
+            self.rate = min(self.max_rate, self.rate + self.step)
+
+        throughput = total / elapsed if elapsed > 0 else 0
+        if self.rate != old_rate:
+            logger.info(f"速率调整: {old_rate} -> {self.rate} 次/秒，线程 {old_threads} -> {self.threads}，"
+                        f"错误率 {ratio:.1%}（目标 {self.target_error_ratio:.1%}），吞吐 {throughput:.1f} 个/秒")
+        else:
+            logger.info(f"速率保持 {self.rate} 次/秒，错误率 {ratio:.1%}，吞吐 {throughput:.1f} 个/秒")
+        return overloaded
+
+    def wave_config(self, httpx_config):
+        """
+        生成当前速率下的httpx配置：替换速率限制和线程数，使用JSON输出并输出失败的主机
+        """
+        wave_config = dict(httpx_config)
+        wave_config["threads"] = self.threads
+        wave_config["json_output"] = True
+        args = [f"-rl {self.rate}", "-probe"]
+        for arg in httpx_config.get("additional_args", "").split(","):
+            arg = arg.strip()
+            # 速率和线程数由控制器决定，每分钟速率限制会限制提速，一并去掉
+            if arg and not RATE_LIMIT_ARG_PATTERN.match(arg) and arg != "-probe":
+                args.append(arg)
+        wave_config["additional_args"] = ",".join(args)
+        return wave_config
+
+def is_overload_result(result):
+    """
+    判断一条httpx JSON结果是否表示目标过载（超时、连接被重置、限流状态码）
+    """
+    if result.get("failed"):
+        return OVERLOAD_ERROR_PATTERN.search(result.get("error") or "") is not None
+    return result.get("status_code") in THROTTLE_STATUS_CODES
+
+def run_wave(controller, httpx_config, hosts, wave_file, root_dir, out, line_handler=None, no_process=False,
+             keep_failed=False, final=False):
+    """
+    以控制器当前的速率探测一个批次的主机，成功的结果写入out
+    
+    keep_failed为True时，非过载原因（如无法解析、端口未开放）失败的主机也写入out。
+    过载的主机之后会重新探测，结果不写入；final为True时是最后一次探测，过载的结果
+    按普通结果写入，过载失败的主机在keep_failed为True时同样写入failed记录。
+
+    返回:
+        (结果数, 过载错误数, 耗时, 提前终止时未完成的主机列表, 过载的主机列表, 退出码)
+    """
+    with open(wave_file, 'w', encoding='utf-8') as f:
+        for host in hosts:
+            f.write(host + '\n')
+
+    cmd = build_httpx_command(controller.wave_config(httpx_config), wave_file, None, root_dir)
+    if not no_process:
+        print(f"执行命令: {format_command(cmd)}")
+
+    total = 0
+    errors = 0
+    seen = set()
+    aborted = False
+    overloaded_hosts = []
+    start = time.monotonic()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               encoding='utf-8', errors='ignore', bufsize=1)
+    try:
+        for line in process.stdout:
+            try:
+                result = json_loads(line)
+            except ValueError:
+                continue
+            if not isinstance(result, dict):
+                continue
+            total += 1
+            host = result.get("input") or ""
+            seen.add(host)
+            overloaded = is_overload_result(result)
+            if overloaded:
+                errors += 1
+                overloaded_hosts.append(host)
+            if overloaded and not final:
+                # 之后重新探测，以重新探测的结果为准
+                pass
+            elif not result.get("failed"):
+                out.write(line if line.endswith('\n') else line + '\n')
+                if line_handler:
+                    line_handler(line)
+            elif keep_failed:
+                out.write(line if line.endswith('\n') else line + '\n')
+
+            if controller.should_abort(total, errors):
+                logger.info(f"错误率过高（{errors}/{total}），提前终止本批次")
+                process.kill()
+                aborted = True
+                break
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        exitcode = process.wait()
+
+    out.flush()
+    unfinished = [host for host in hosts if host not in seen] if aborted else []
+    return total, errors, time.monotonic() - start, unfinished, overloaded_hosts, exitcode
+
+def iter_waves(hosts_file, wave_size):
+    """
+    按批次读取主机列表文件，跳过空行
+    """
+    with open(hosts_file, 'r', encoding='utf-8', errors='ignore') as f:
+        hosts = (line.strip() for line in f)
+        hosts = (host for host in hosts if host)
+        while True:
+            wave = list(islice(hosts, wave_size))
+            if not wave:
+                return
+            yield wave
+
+def run_hosts(controller, httpx_config, hosts, wave_file, root_dir, out, retry_out, line_handler, no_process,
+              keep_failed=False):
+    """
+    探测一个批次的主机，批次被提前终止时以调整后的速率继续探测剩余主机
+
+    参数:
+        retry_out: 过载主机写入的重试文件，为None时是最后一次探测，不再重试
+
+    返回:
+        (退出码, 结果数, 最后一次探测中仍然过载的主机数)
+    """
+    count = 0
+    exhausted = 0
+    while hosts:
+        total, errors, elapsed, unfinished, overloaded_hosts, exitcode = run_wave(
+            controller, httpx_config, hosts, wave_file, root_dir, out, line_handler, no_process, keep_failed,
+            final=retry_out is None)
+        count += total
+        if total == 0:
+            # httpx没有输出任何结果（如无法启动），不再重试这些主机
+            if exitcode != 0:
+                logger.error(f"httpx进程返回错误（退出码 {exitcode}），未得到任何结果")
+            return exitcode, count, exhausted
+        controller.update(total, errors, elapsed)
+        # 错误率未超标的批次中过载的主机同样需要重试，否则这些主机没有任何结果
+        if retry_out is not None:
+            for host in overloaded_hosts:
+                retry_out.write(host + '\n')
+        else:
+            exhausted += len(overloaded_hosts)
+        hosts = unfinished
+    return 0, count, exhausted
+
+def run_httpx_adaptive(httpx_config, input_file, output_file, root_dir, temp_dir,
+                       line_handler=None, no_process=False):
+    """
+    分批运行httpx并自适应调整速率，成功的结果以JSON格式写入output_file
+
+    过载（超时、限流等）的主机在所有批次完成后以最终速率再探测一次。additional_args中有-probe时，
+    其他原因失败的主机也以failed记录写入output_file，与httpx -json -probe的输出一致。
+
+    参数:
+        httpx_config: httpx配置字典
+        input_file: 输入主机列表文件
+        output_file: 输出文件路径
+        root_dir: 项目根目录
+        temp_dir: 批次文件的存放目录
+        line_handler: 处理每条成功结果的函数，流式筛选时使用
+        no_process: 当为True时，不显示探测进度
+
+    返回:
+        (exitcode, stdout, stderr)
+    """
+    controller = AdaptiveRateController.from_config(httpx_config)
+    keep_failed = has_probe_arg(httpx_config)
+    wave_size = max(1, httpx_config.get("wave_size", 1000))
+    wave_file = os.path.join(temp_dir, "adaptive_wave.txt")
+    retry_file = os.path.join(temp_dir, "adaptive_retry.txt")
+    logger.info(f"自适应速率: 初始 {controller.rate} 次/秒，范围 {controller.min_rate}-{controller.max_rate}，"
+                f"目标错误率 {controller.target_error_ratio:.1%}")
+
+    probed = 0
+    exitcode = 0
+    try:
+        with open(output_file, 'w', encoding='utf-8') as out:
+            with open(retry_file, 'w', encoding='utf-8') as retry_out:
+                for hosts in iter_waves(input_file, wave_size):
+                    exitcode, count, _ = run_hosts(controller, httpx_config, hosts, wave_file, root_dir,
+                                                out, retry_out, line_handler, no_process, keep_failed)
+                    probed += count
+                    if exitcode != 0 and count == 0:
+                        break
+
+            if os.path.getsize(retry_file) > 0 and not (exitcode != 0 and probed == 0):
+                logger.info(f"以 {controller.rate} 次/秒重新探测因过载失败的主机")
+                exhausted = 0
+                for hosts in iter_waves(retry_file, wave_size):
+                    _, _, count = run_hosts(controller, httpx_config, hosts, wave_file, root_dir,
+                                            out, None, line_handler, no_process, keep_failed)
+                    exhausted += count
+                if exhausted:
+                    action = "保留最后一次探测的结果" if keep_failed else "其中超时的主机没有结果"
+                    logger.warning(f"{exhausted} 个主机重新探测后仍然超时或被限流，{action}")
+                    if not no_process:
+                        print(f"警告: {exhausted} 个主机重新探测后仍然超时或被限流，{action}")
+
+        if not no_process:
+            print(f"自适应速率探活完成，共得到 {probed} 条结果，最终速率 {controller.rate} 次/秒")
+        if probed == 0 and exitcode != 0:
+            return exitcode, "", ""
+        return 0, "", ""
+
+    except Exception as e:
+        print(f"执行自适应速率探活时发生错误: {e}")
+        return -1, "", str(e)
+    finally:
+        for file_path in (wave_file, retry_file):
+            if os.path.exists(file_path):
+                os.remove(file_path)
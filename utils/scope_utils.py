@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+范围过滤工具模块
+
+将允许和排除列表中的根域名、CIDR和正则表达式编译为索引：根域名按标签倒序
+建立后缀树，判断一个主机名只需按标签逐级查找，与规则数量无关；IP地址段合并为
+有序区间，用二分查找；正则表达式合并为一个模式只匹配一次。
+"""
+
+import re
+import ipaddress
+from bisect import bisect_right
+
+# 正则表达式规则的前缀
+REGEX_PREFIX = "re:"
+
+# 后缀树中表示根域名结束的键（合法的域名标签不会为空）
+_TERMINAL = ""
+
+def parse_scope_entries(text):
+    """
+    解析配置中的范围规则列表
+
+    规则之间用逗号或换行分隔；以re:开头的正则表达式中可能含有逗号，需单独占一行。
+
+    参数:
+        text: 配置中的规则文本
+
+    返回:
+        规则列表
+    """
+    entries = []
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if line.startswith(REGEX_PREFIX):
+            entries.append(line)
+            continue
+        entries.extend(entry.strip() for entry in line.split(","))
+    return [entry for entry in entries if entry]
+
+def split_host_port(host):
+    """
+    去除主机名中的端口号
+
+    参数:
+        host: 主机名，可能带有端口号，IPv6地址可能带有方括号
+
+    返回:
+        不含端口号的主机名
+    """
+    if host.startswith("["):
+        end = host.find("]")
+        return host[1:end] if end > 0 else host[1:]
+    # 只有一个冒号时才是端口号，多个冒号是不带方括号的IPv6地址
+    if host.count(":") == 1:
+        return host.split(":", 1)[0]
+    return host
+
+class _RuleSet:
+    """
+    一组范围规则（允许列表或排除列表）编译后的索引
+    """
+
+    def __init__(self, entries):
+        """
+        参数:
+            entries: 规则列表，每条规则是根域名、IP/CIDR或re:开头的正则表达式
+        """
+        self.suffixes = {}
+        self.ranges = {4: [], 6: []}
+        patterns = []
+        self.count = 0
+
+        for entry in entries:
+            if entry.startswith(REGEX_PREFIX):
+                pattern = entry[len(REGEX_PREFIX):]
+                re.compile(pattern)  # 提前发现写错的正则
+                patterns.append(f"(?:{pattern})")
+            else:
+                try:
+                    network = ipaddress.ip_network(entry, strict=False)
+                except ValueError:
+                    self._add_suffix(entry)
+                else:
+                    self.ranges[network.version].append(
+                        (int(network.network_address), int(network.broadcast_address)))
+            self.count += 1
+
+        self.starts = {}
+        self.ends = {}
+        for version, ranges in self.ranges.items():
+            self._build_ranges(version, ranges)
+
+        self.pattern = re.compile("|".join(patterns), re.IGNORECASE) if patterns else None
+
+    def _add_suffix(self, domain):
+        # *.example.com 与 example.com 等价，都匹配根域名本身及其所有子域名
+        domain = domain.lower().rstrip(".")
+        if domain.startswith("*."):
+            domain = domain[2:]
+        node = self.suffixes
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        node[_TERMINAL] = True
+
+    def _build_ranges(self, version, ranges):
+        # 合并重叠和相邻的区间，便于二分查找
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts[version] = [start for start, _ in merged]
+        self.ends[version] = [end for _, end in merged]
+
+    def match_domain(self, labels):
+        node = self.suffixes
+        for label in labels:
+            node = node.get(label)
+            if node is None:
+                return False
+            if _TERMINAL in node:
+                return True
+        return False
+
+    def match_ip(self, address):
+        starts = self.starts[address.version]
+        index = bisect_right(starts, int(address)) - 1
+        return index >= 0 and int(address) <= self.ends[address.version][index]
+
+    def match(self, host, address, labels):
+        """
+        判断主机名是否匹配规则
+
+        参数:
+            host: 不含端口号的小写主机名
+            address: 主机名是IP地址时为对应的ipaddress对象，否则为None
+            labels: 倒序的域名标签列表，IP地址时为None
+        """
+        if address is not None:
+            if self.match_ip(address):
+                return True
+        elif self.match_domain(labels):
+            return True
+        return self.pattern is not None and self.pattern.search(host) is not None
+
+class ScopeFilter:
+    """
+    按允许列表和排除列表判断主机名是否在测试范围内
+
+    允许列表为空时不限制范围；排除列表优先于允许列表。
+    """
+
+    def __init__(self, allow=None, deny=None):
+        """
+        参数:
+            allow: 允许的规则列表
+            deny: 排除的规则列表
+        """
+        self.allow = _RuleSet(allow or [])
+        self.deny = _RuleSet(deny or [])
+
+    @classmethod
+    def from_config(cls, scope_config):
+        """
+        根据get_scope_config返回的配置创建过滤器，没有任何规则时返回None
+        """
+        if not scope_config:
+            return None
+        allow = parse_scope_entries(scope_config.get("allow"))
+        deny = parse_scope_entries(scope_config.get("deny"))
+        if not allow and not deny:
+            return None
+        return cls(allow, deny)
+
+    def __contains__(self, host):
+        """
+        判断主机名（可带端口号）是否在范围内
+        """
+        host = split_host_port(host).lower().rstrip(".")
+        try:
+            address = ipaddress.ip_address(host) if _looks_like_ip(host) else None
+        except ValueError:
+            address = None
+        labels = None if address is not None else host.split(".")[::-1]
+
+        if self.deny.count and self.deny.match(host, address, labels):
+            return False
+        if self.allow.count:
+            return self.allow.match(host, address, labels)
+        return True
+
+def _looks_like_ip(host):
+    # 域名的最后一个标签不会是纯数字，只对可能是IP的主机名尝试解析，避免大量异常
+    return ":" in host or host[-1:].isdigit()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+外部排序工具模块
+
+在内存预算内对大量字符串去重排序：超出预算时将已排序的数据段写入临时目录，
+最后对所有数据段做多路归并并去重。
+"""
+
+import os
+import sys
+import heapq
+import logging
+import tempfile
+
+logger = logging.getLogger("subdatarefine.sort")
+
+# 集合中每个元素除字符串本身之外的大致开销（哈希表槽位等），单位字节
+SET_ENTRY_OVERHEAD = 64
+
+# 同时参与归并的数据段上限，超过后先合并成一个数据段，避免打开过多文件
+MAX_MERGE_RUNS = 64
+
+def merge_unique(iterables):
+    """
+    多路归并若干已排序的可迭代对象，并去除重复项
+
+    参数:
+        iterables: 已排序的可迭代对象列表
+
+    返回:
+        排序且去重后的生成器
+    """
+    last = None
+    for item in heapq.merge(*iterables):
+        if item != last:
+            yield item
+            last = item
+
+def sorted_difference(left, right, key=None):
+    """
+    求两个已排序且无重复的可迭代对象的差集，只需顺序遍历一次，不需要把数据读入内存
+
+    参数:
+        left: 已排序的可迭代对象
+        right: 已排序的可迭代对象，元素与left按key比较
+        key: 从left的元素中取出比较键的函数，默认为元素本身
+
+    返回:
+        left中键不在right中的元素的生成器，保持原顺序
+    """
+    right = iter(right)
+    current = next(right, None)
+    for item in left:
+        item_key = key(item) if key else item
+        while current is not None and current < item_key:
+            current = next(right, None)
+        if current is None or current != item_key:
+            yield item
+
+def read_run(run_file):
+    """
+    逐行读取数据段文件
+
+    参数:
+        run_file: 数据段文件路径
+
+    返回:
+        数据段中字符串的生成器
+    """
+    # 只以\n作为行分隔符，保留字符串中可能存在的\r
+    with open(run_file, 'r', encoding='utf-8', newline='\n') as f:
+        for line in f:
+            yield line[:-1] if line.endswith('\n') else line
+
+class ExternalSorter:
+    """
+    带内存预算的外部排序去重容器
+
+    提供与集合相同的add/update接口，遍历时按排序顺序输出去重后的结果。
+    """
+
+    def __init__(self, temp_dir, max_memory_mb, prefix="sort_run_"):
+        """
+        参数:
+            temp_dir: 数据段文件的存放目录
+            max_memory_mb: 内存中缓冲数据的预算（MB）
+            prefix: 数据段文件名前缀
+        """
+        self.temp_dir = temp_dir
+        self.max_memory = int(max_memory_mb * 1024 * 1024)
+        self.prefix = prefix
+        self.buffer = set()
+        self.buffer_size = 0
+        self.runs = []
+
+    def add(self, item):
+        """
+        添加一个字符串
+        """
+        if item in self.buffer:
+            return
+        self.buffer.add(item)
+        self.buffer_size += sys.getsizeof(item) + SET_ENTRY_OVERHEAD
+        if self.buffer_size >= self.max_memory:
+            self.spill()
+
+    def update(self, items):
+        """
+        批量添加字符串
+        """
+        for item in items:
+            self.add(item)
+
+    def spill(self):
+        """
+        将内存缓冲排序后写入新的数据段文件
+        """
+        if not self.buffer:
+            return
+
+        os.makedirs(self.temp_dir, exist_ok=True)
+        self.runs.append(self._write_run(sorted(self.buffer)))
+        logger.info(f"内存缓冲已满，写出第 {len(self.runs)} 个排序数据段（{len(self.buffer)} 项）")
+        self.buffer = set()
+        self.buffer_size = 0
+
+        # 数据段过多时先合并为一个
+        if len(self.runs) >= MAX_MERGE_RUNS:
+            runs = self.runs
+            self.runs = [self._write_run(merge_unique([read_run(run) for run in runs]))]
+            self._remove_files(runs)
+
+    def __iter__(self):
+        """
+        按排序顺序遍历去重后的全部字符串
+        """
+        return merge_unique([read_run(run) for run in self.runs] + [sorted(self.buffer)])
+
+    def cleanup(self):
+        """
+        删除所有数据段文件
+        """
+        self._remove_files(self.runs)
+        self.runs = []
+
+    def _write_run(self, items):
+        """
+        将已排序的字符串写入临时文件，返回文件路径
+        """
+        fd, run_file = tempfile.mkstemp(prefix=self.prefix, suffix=".txt", dir=self.temp_dir)
+        with open(fd, 'w', encoding='utf-8', newline='\n') as f:
+            for item in items:
+                f.write(item + '\n')
+        return run_file
+
+    def _remove_files(self, files):
+        for file_path in files:
+            try:
+                os.remove(file_path)
+            except OSError as e:
+                logger.warning(f"删除临时文件失败: {file_path}, 错误信息: {e}")
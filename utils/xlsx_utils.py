@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+xlsx工作簿读取工具模块
+
+xlsx文件是一个zip包，每个工作表是一个XML文件。这里直接从zip中以流的方式
+增量解析工作表XML，逐行返回单元格文本，已处理的行会立即释放，
+内存占用与行数无关（共享字符串表除外，它必须整体加载才能按索引查找）。
+"""
+
+import io
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+
+from utils.compress_utils import BackgroundReader
+
+# SpreadsheetML命名空间
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+WORKBOOK_FILE = "xl/workbook.xml"
+WORKBOOK_RELS_FILE = "xl/_rels/workbook.xml.rels"
+SHARED_STRINGS_FILE = "xl/sharedStrings.xml"
+
+# 单元格引用中的列字母，如 AB12 -> AB
+CELL_COLUMN_PATTERN = re.compile(r'[A-Z]+')
+WORKSHEET_PATTERN = re.compile(r'xl/worksheets/sheet(\d+)\.xml')
+
+def is_xlsx_file(file_path):
+    """
+    判断zip文件是否为xlsx工作簿
+
+    参数:
+        file_path: 文件路径
+
+    返回:
+        是xlsx工作簿时返回True
+    """
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            archive.getinfo(WORKBOOK_FILE)
+        return True
+    except (KeyError, zipfile.BadZipFile):
+        return False
+
+def column_index(reference):
+    """
+    将单元格引用转换为从0开始的列索引，如 A1 -> 0, AB12 -> 27
+    """
+    match = CELL_COLUMN_PATTERN.match(reference)
+    if match is None:
+        return -1
+    index = 0
+    for char in match.group():
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+def _rich_text(elem):
+    # 共享字符串和内联字符串可能是普通文本<t>，也可能是由多个<r><t>组成的富文本，
+    # 注音<rPh>中的文本不属于单元格内容
+    text = elem.find(MAIN_NS + "t")
+    if text is not None:
+        return text.text or ""
+    return "".join(t.text or "" for t in elem.iterfind(f"{MAIN_NS}r/{MAIN_NS}t"))
+
+def load_shared_strings(archive):
+    """
+    读取共享字符串表
+
+    参数:
+        archive: 打开的zipfile.ZipFile对象
+
+    返回:
+        字符串列表，按索引对应单元格中的共享字符串编号
+    """
+    strings = []
+    try:
+        stream = archive.open(SHARED_STRINGS_FILE)
+    except KeyError:
+        return strings
+
+    with stream:
+        for event, elem in ET.iterparse(stream, events=("end",)):
+            if elem.tag == MAIN_NS + "si":
+                strings.append(_rich_text(elem))
+                elem.clear()
+    return strings
+
+def list_worksheets(archive):
+    """
+    按工作簿中的顺序列出工作表XML文件
+
+    参数:
+        archive: 打开的zipfile.ZipFile对象
+
+    返回:
+        工作表在zip包中的路径列表
+    """
+    try:
+        with archive.open(WORKBOOK_RELS_FILE) as f:
+            rels = ET.parse(f).getroot()
+        with archive.open(WORKBOOK_FILE) as f:
+            workbook = ET.parse(f).getroot()
+    except KeyError:
+        rels = workbook = None
+
+    names = set(archive.namelist())
+    sheets = []
+    if rels is not None and workbook is not None:
+        targets = {}
+        for rel in rels.iter(PACKAGE_REL_NS + "Relationship"):
+            target = rel.get("Target", "")
+            # 目标路径可以是相对xl目录的路径，也可以是以/开头的包内绝对路径
+            if target.startswith("/"):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join("xl", target))
+            targets[rel.get("Id")] = target
+        for sheet in workbook.iter(MAIN_NS + "sheet"):
+            target = targets.get(sheet.get(REL_NS + "id"))
+            if target in names:
+                sheets.append(target)
+
+    if not sheets:
+        # 缺少关系文件时按工作表编号排序
+        matches = [WORKSHEET_PATTERN.fullmatch(name) for name in names]
+        sheets = [match.group() for match in sorted(filter(None, matches), key=lambda m: int(m.group(1)))]
+    return sheets
+
+def iter_sheet_rows(stream, shared_strings):
+    """
+    增量解析工作表XML，逐行返回单元格文本
+
+    参数:
+        stream: 工作表XML的二进制流
+        shared_strings: load_shared_strings返回的共享字符串表
+
+    返回:
+        行的生成器，每行是单元格文本列表，中间缺失的单元格为空字符串
+    """
+    sheet_data = None
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == MAIN_NS + "sheetData":
+                sheet_data = elem
+            continue
+        if tag != MAIN_NS + "row":
+            continue
+
+        row = []
+        for cell in elem.iterfind(MAIN_NS + "c"):
+            reference = cell.get("r")
+            index = column_index(reference) if reference else len(row)
+            if index > len(row):
+                row.extend([""] * (index - len(row)))
+
+            cell_type = cell.get("t")
+            if cell_type == "inlineStr":
+                inline = cell.find(MAIN_NS + "is")
+                value = _rich_text(inline) if inline is not None else ""
+            else:
+                value_elem = cell.find(MAIN_NS + "v")
+                value = value_elem.text or "" if value_elem is not None else ""
+                if cell_type == "s" and value:
+                    value = shared_strings[int(value)]
+
+            if index < len(row):
+                row[index] = value
+            else:
+                row.append(value)
+        yield row
+
+        # 释放已处理的行，保证内存占用不随行数增长
+        elem.clear()
+        if sheet_data is not None:
+            sheet_data.clear()
+
+def iter_xlsx_sheets(file_path):
+    """
+    依次打开工作簿中的各个工作表
+
+    参数:
+        file_path: xlsx文件路径
+
+    返回:
+        (工作表路径, 行生成器)的生成器，工作表XML由后台线程解压
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        shared_strings = load_shared_strings(archive)
+        for sheet in list_worksheets(archive):
+            with BackgroundReader(archive.open(sheet)) as reader:
+                yield sheet, iter_sheet_rows(io.BufferedReader(reader), shared_strings)